@@ -1,14 +1,28 @@
-from flask import Flask
+import os
+from flask import Flask, request
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_cors import CORS
+from app.compression import compress_response
+from app.http_cache import ValidatorResponse
+from app.json_provider import FastJSONProvider
 
 app = Flask(__name__)
 
+# 条件请求返回的304响应同样带有Last-Modified和Cache-Control
+app.response_class = ValidatorResponse
+
+# 接口JSON使用紧凑输出、不转义中文（安装orjson时使用orjson序列化）
+app.json = FastJSONProvider(app)
+
+# 按Accept-Encoding对JSON、HTML等响应进行gzip/brotli压缩
+app.after_request(lambda response: compress_response(request, response))
+
 # 配置CORS支持所有来源
 CORS(app)
 
-# 配置API请求限流
+# 配置API请求限流（压力测试时可设置 RATELIMIT_ENABLED=false 关闭）
+app.config['RATELIMIT_ENABLED'] = os.getenv('RATELIMIT_ENABLED', 'true').lower() != 'false'
 limiter = Limiter(
     get_remote_address,
     app=app,
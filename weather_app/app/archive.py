@@ -0,0 +1,111 @@
+import io
+import os
+import numpy as np
+from app.database import HISTORY_EXPORT_COLUMNS
+
+# 历史天气归档格式版本，保存在每个文件的format_version数组中
+ARCHIVE_FORMAT_VERSION = 1
+
+# 各列在归档文件中的类型：浮点列的缺失值保存为NaN，整数列的缺失值保存为-1
+FLOAT_COLUMNS = {
+    'temperature_c': np.float32,
+    'pressure_hpa': np.float32,
+    'visibility_km': np.float32,
+    'wind_speed_kmh': np.float32,
+    'aqi': np.float32
+}
+INT_COLUMNS = {
+    'record_hour': np.int8,
+    'humidity_pct': np.int16,
+    'wind_level': np.int8,
+    'wind_deg': np.int16,
+    'weather_code': np.int16
+}
+MISSING_INT = -1
+
+
+def archive_filename(city, month):
+    """归档文件名：按城市和月份分区，如 北京/2025-01.npz"""
+    return os.path.join(city, f'{month}.npz')
+
+
+def rows_to_arrays(city, rows):
+    """将historical_weather的行（字段顺序见HISTORY_EXPORT_COLUMNS）按列转换为NumPy数组"""
+    columns = dict(zip(HISTORY_EXPORT_COLUMNS, zip(*rows)))
+    arrays = {
+        'format_version': np.array(ARCHIVE_FORMAT_VERSION, dtype=np.int16),
+        'city': np.array(city),
+        'record_date': np.array(columns['record_date'], dtype='datetime64[D]'),
+        'timestamp': np.array(columns['timestamp'], dtype='datetime64[s]')
+    }
+    for column, dtype in FLOAT_COLUMNS.items():
+        arrays[column] = np.array([np.nan if value is None else value for value in columns[column]], dtype=dtype)
+    for column, dtype in INT_COLUMNS.items():
+        arrays[column] = np.array([MISSING_INT if value is None else value for value in columns[column]], dtype=dtype)
+    return arrays
+
+
+def _with_missing(values, missing):
+    """将缺失值位置替换为None，返回Python列表"""
+    result = values.astype(object)
+    result[missing] = None
+    return result.tolist()
+
+
+def arrays_to_rows(arrays):
+    """将归档文件中的数组还原为historical_weather的行，缺失值还原为None"""
+    city = str(arrays['city'])
+    columns = {
+        'city': [city] * len(arrays['record_date']),
+        'record_date': np.datetime_as_string(arrays['record_date'], unit='D').tolist(),
+        # 与SQLite CURRENT_TIMESTAMP的格式保持一致
+        'timestamp': np.char.replace(np.datetime_as_string(arrays['timestamp'], unit='s'), 'T', ' ').tolist()
+    }
+    for column in FLOAT_COLUMNS:
+        values = arrays[column]
+        # float32转换回float64会带上误差，保留三位小数还原原始数值
+        columns[column] = _with_missing(np.round(values.astype(np.float64), 3), np.isnan(values))
+    for column in INT_COLUMNS:
+        values = arrays[column]
+        columns[column] = _with_missing(values, values == MISSING_INT)
+    return list(zip(*(columns[column] for column in HISTORY_EXPORT_COLUMNS)))
+
+
+def export_partition(db, city, month):
+    """导出一个城市一个月的历史天气，返回压缩后的npz文件内容，没有数据时返回None"""
+    rows = db.get_history_rows(city, month)
+    if not rows:
+        return None
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **rows_to_arrays(city, rows))
+    return buffer.getvalue()
+
+
+def export_history(db, out_dir, city=None):
+    """按城市和月份导出历史天气到out_dir，返回 [(文件路径, 行数)]"""
+    exported = []
+    for partition_city, month in db.get_history_partitions(city):
+        rows = db.get_history_rows(partition_city, month)
+        if not rows:
+            continue
+        path = os.path.join(out_dir, archive_filename(partition_city, month))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez_compressed(path, **rows_to_arrays(partition_city, rows))
+        exported.append((path, len(rows)))
+    return exported
+
+
+def load_archive(source):
+    """读取一个归档文件（路径或文件对象），返回historical_weather的行"""
+    with np.load(source, allow_pickle=False) as data:
+        if int(data['format_version']) != ARCHIVE_FORMAT_VERSION:
+            raise ValueError(f"不支持的归档格式版本: {int(data['format_version'])}")
+        return arrays_to_rows(data)
+
+
+def import_history(db, paths):
+    """读取多个归档文件，在一个事务中批量写入数据库，返回写入的行数"""
+    rows = []
+    for path in paths:
+        rows.extend(load_archive(path))
+    return db.bulk_import_history(rows)
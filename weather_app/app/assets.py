@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import threading
+
+# 指纹长度（内容哈希的十六进制位数）
+FINGERPRINT_LENGTH = 12
+
+# 第三方前端库清单：vendor目录下的路径 -> 固定版本的CDN地址和SRI哈希（vendor_assets.py按清单下载）
+VENDOR_MANIFEST_PATH = os.path.join(os.path.dirname(__file__), 'data', 'vendor_assets.json')
+
+
+def load_vendor_manifest(path=VENDOR_MANIFEST_PATH):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+class StaticAssets:
+    """静态资源指纹：URL中带上文件内容的哈希（?v=...），文件内容变化时URL随之变化，
+    浏览器和nginx可以对静态资源设置长期缓存
+    
+    哈希按文件修改时间缓存，文件更新后下次生成URL时重新计算；文件不存在时返回不带指纹的URL。
+    """
+    
+    def __init__(self, static_folder, static_url_path='/static', vendor_manifest=None):
+        self.static_folder = static_folder
+        self.static_url_path = static_url_path.rstrip('/')
+        self.vendor_manifest = vendor_manifest or {}
+        # 文件名 -> (修改时间, 指纹)
+        self._fingerprints = {}
+        # 生成过URL的文件名，用于判断引用这些文件的页面是否需要重新渲染
+        self._used = set()
+        # 已打印过CDN回退警告的文件
+        self._warned = set()
+        self._lock = threading.Lock()
+    
+    def fingerprint(self, filename):
+        """文件内容的哈希，文件不存在时返回None"""
+        path = os.path.join(self.static_folder, filename)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        
+        cached = self._fingerprints.get(filename)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        
+        digest = hashlib.md5()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(65536), b''):
+                digest.update(block)
+        fingerprint = digest.hexdigest()[:FINGERPRINT_LENGTH]
+        with self._lock:
+            self._fingerprints[filename] = (mtime, fingerprint)
+        return fingerprint
+    
+    def url(self, filename):
+        """带指纹的静态资源URL，在模板中作为asset_url使用"""
+        with self._lock:
+            self._used.add(filename)
+        fingerprint = self.fingerprint(filename)
+        url = f'{self.static_url_path}/{filename}'
+        return f'{url}?v={fingerprint}' if fingerprint else url
+    
+    def vendor(self, filename):
+        """第三方库的(URL, SRI哈希)，在模板中作为vendor_asset使用
+        
+        已通过vendor_assets.py下载到本地时返回带指纹的本地URL（不需要SRI）；否则返回清单中
+        固定版本的CDN地址和SRI哈希（清单中缺少哈希时为None，浏览器不校验内容），并打印警告。
+        清单中没有的文件抛出KeyError，不会静默地省略页面依赖的库。
+        """
+        url = self.url(filename)
+        if self.fingerprint(filename):
+            return url, None
+        entry = self.vendor_manifest.get(filename)
+        if not entry:
+            raise KeyError(f'第三方库清单 app/data/vendor_assets.json 中没有 {filename}')
+        integrity = entry.get('integrity')
+        if filename not in self._warned:
+            self._warned.add(filename)
+            missing = '' if integrity else '（清单中缺少SRI哈希，不校验内容）'
+            print(f"第三方库未下载到本地，使用CDN地址{missing}: {filename}，请运行 python vendor_assets.py")
+        return entry['url'], integrity
+    
+    def version(self):
+        """已生成URL的全部文件的当前指纹，任一文件新增、删除或修改后返回值随之变化"""
+        with self._lock:
+            filenames = sorted(self._used)
+        return tuple((filename, self.fingerprint(filename)) for filename in filenames)
@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+
+
+class Subscription:
+    """一个客户端连接的订阅：只保留每个城市最新的一条待发送记录，慢速客户端不会积压"""
+    
+    def __init__(self, cities):
+        self.cities = tuple(cities)
+        self._pending = {}
+        self._closed = False
+        self._condition = threading.Condition()
+    
+    def put(self, record):
+        with self._condition:
+            self._pending[record['city']] = record
+            self._condition.notify()
+    
+    def wait(self, timeout):
+        """等待新记录，超时或订阅关闭时返回空列表"""
+        with self._condition:
+            if not self._pending and not self._closed:
+                self._condition.wait(timeout)
+            records = list(self._pending.values())
+            self._pending.clear()
+            return records
+    
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+
+
+class WeatherBroadcaster:
+    """当前天气更新推送：缓存刷新后把新记录分发给订阅了该城市的所有连接
+    
+    当前进程写入的记录通过publish立即分发；其他工作进程（如持有预取租约的进程）写入的记录
+    由后台线程每poll_interval秒对所有被订阅城市执行一次数据库查询发现，同一城市的更新
+    只查询、分发一次，与订阅连接数无关。
+    """
+    
+    def __init__(self, load_latest, poll_interval=30):
+        # 读取一批城市数据库中最新记录的函数，返回 {城市: 天气记录}
+        self.load_latest = load_latest
+        self.poll_interval = poll_interval
+        # 城市 -> 订阅集合
+        self._subscribers = {}
+        # 城市 -> 最近一次分发的记录时间
+        self._last_seen = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        
+        self.published = 0
+        self.delivered = 0
+        self.last_poll = None
+    
+    def subscribe(self, cities):
+        """订阅一组城市的更新，连接结束时需调用unsubscribe"""
+        subscription = Subscription(cities)
+        with self._lock:
+            for city in subscription.cities:
+                self._subscribers.setdefault(city, set()).add(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription):
+        subscription.close()
+        with self._lock:
+            for city in subscription.cities:
+                subscribers = self._subscribers.get(city)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    # 没有订阅者的城市不再检查更新
+                    del self._subscribers[city]
+                    self._last_seen.pop(city, None)
+    
+    def publish(self, record):
+        """分发一条天气记录，时间不晚于已分发记录的重复更新会被忽略"""
+        city = record['city']
+        timestamp = record.get('timestamp')
+        with self._lock:
+            subscribers = self._subscribers.get(city)
+            if not subscribers or timestamp is None:
+                return 0
+            if timestamp <= self._last_seen.get(city, ''):
+                return 0
+            self._last_seen[city] = timestamp
+            subscribers = list(subscribers)
+            self.published += 1
+            self.delivered += len(subscribers)
+        
+        for subscription in subscribers:
+            subscription.put(record)
+        return len(subscribers)
+    
+    def poll(self):
+        """检查所有被订阅城市在数据库中的最新记录，分发其中的新记录"""
+        with self._lock:
+            cities = list(self._subscribers)
+        self.last_poll = time.strftime('%Y-%m-%d %H:%M:%S')
+        if not cities:
+            return 0
+        return sum(1 for record in self.load_latest(cities).values() if self.publish(record))
+    
+    def start(self):
+        """启动检查其他进程更新的后台线程，gunicorn fork出的工作进程中会重新启动"""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            # fork前父进程中的订阅不属于当前工作进程
+            self._subscribers = {}
+            self._last_seen = {}
+            self._thread = threading.Thread(target=self._run, name='weather-broadcast', daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"检查天气更新失败: {e}")
+    
+    def stats(self):
+        """返回订阅和分发统计信息"""
+        with self._lock:
+            subscriptions = set()
+            for subscribers in self._subscribers.values():
+                subscriptions.update(subscribers)
+            cities = len(self._subscribers)
+        return {
+            'subscriptions': len(subscriptions),
+            'cities': cities,
+            'published': self.published,
+            'delivered': self.delivered,
+            'poll_interval': self.poll_interval,
+            'last_poll': self.last_poll
+        }
@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """进程内的LRU缓存，每个条目带过期时间，超出容量时淘汰最久未使用的条目
+    
+    通过pin()固定的键（如热门城市）不参与LRU淘汰，只在过期后失效。
+    """
+    
+    def __init__(self, maxsize=512, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._pinned = frozenset()
+        
+        # 命中/未命中/淘汰计数
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key):
+        """获取缓存值，不存在或已过期时返回None"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                # 已过期，直接删除
+                del self._data[key]
+                self.misses += 1
+                return None
+            
+            # 标记为最近使用
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def set(self, key, value, ttl=None):
+        """写入缓存，ttl为空时使用默认有效期"""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            
+            # 超出容量时淘汰最久未使用且未固定的条目
+            while len(self._data) > self.maxsize:
+                victim = next((k for k in self._data if k not in self._pinned), None)
+                if victim is None:
+                    victim = next(iter(self._data))
+                del self._data[victim]
+                self.evictions += 1
+    
+    def pin(self, keys):
+        """设置固定的键集合（替换之前的集合），最多固定一半容量，保证其他条目仍有空间"""
+        with self._lock:
+            self._pinned = frozenset(list(keys)[:self.maxsize // 2])
+    
+    def delete(self, key):
+        """删除缓存条目"""
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+    
+    def stats(self):
+        """返回缓存统计信息"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'pinned': len(self._pinned),
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
@@ -36,11 +36,11 @@ def check_database():
             for city in cities:
                 print(f"  - {city[0]}")
             
-            cursor.execute("SELECT * FROM weather_cache ORDER BY timestamp DESC LIMIT 5;")
+            cursor.execute("SELECT city, temperature_c, weather_code, timestamp FROM weather_cache ORDER BY timestamp DESC LIMIT 5;")
             recent = cursor.fetchall()
             print("\n最近5条缓存数据：")
             for row in recent:
-                print(f"  {row[1]}: {row[2]}, {row[4]}, {row[10]}")
+                print(f"  {row[0]}: {row[1]}°C, 天气代码{row[2]}, {row[3]}")
         
         print("\n--- 检查historical_weather表数据 ---")
         cursor.execute("SELECT COUNT(*) FROM historical_weather;")
@@ -54,11 +54,11 @@ def check_database():
             for city in cities:
                 print(f"  - {city[0]}")
             
-            cursor.execute("SELECT * FROM historical_weather ORDER BY record_date DESC, record_hour DESC LIMIT 5;")
+            cursor.execute("SELECT city, record_date, record_hour, temperature_c, weather_code, aqi FROM historical_weather ORDER BY record_date DESC, record_hour DESC LIMIT 5;")
             recent = cursor.fetchall()
             print("\n最近5条历史数据：")
             for row in recent:
-                print(f"  {row[1]}, {row[9]} {row[10]}时, {row[2]}, {row[4]}, AQI:{row[12]}")
+                print(f"  {row[0]}, {row[1]} {row[2]}时, {row[3]}°C, 天气代码{row[4]}, AQI:{row[5]}")
         
         conn.close()
         print("\n数据库检查完成！")
@@ -0,0 +1,161 @@
+import difflib
+import json
+import os
+
+# 城市数据文件，包括省份、地级行政区（含坐标和拼音）和别名
+CITY_DATA_PATH = os.getenv('CITY_DATA_PATH', os.path.join(os.path.dirname(__file__), 'data', 'cities.json'))
+
+# 输入联想最多返回的城市数量
+SUGGEST_SIZE = 10
+
+# 行政区划后缀，按顺序匹配（长的在前）
+ADMIN_SUFFIXES = ('特别行政区', '自治区', '自治州', '地区', '林区', '省', '市', '盟')
+
+# 模糊匹配的最短输入长度和相似度阈值
+FUZZY_MIN_LENGTH = 2
+FUZZY_CUTOFF = 0.6
+
+
+def _index_key(text):
+    """索引键：小写并去除空白"""
+    return ''.join(text.split()).lower()
+
+
+def strip_admin_suffix(name):
+    """去除名称末尾的行政区划后缀，如'杭州市'、'广西壮族自治区'中的'市'、'自治区'"""
+    for suffix in ADMIN_SUFFIXES:
+        if name.endswith(suffix) and len(name) > len(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+class CityResolver:
+    """城市名称解析：启动时构建名称索引和前缀树，解析和联想都只查询内存
+    
+    精确解析支持简称、全称、带'市'后缀、拼音、别名和省份名称（解析为省会）；
+    输入联想额外支持拼音首字母，每个前缀的候选城市在构建时预先计算，前缀没有匹配时使用模糊匹配。
+    拼音、首字母相同时，主要城市（major）排在前面，其余按数据文件中的顺序。
+    拼音保存在数据文件中，不依赖拼音转换库。
+    """
+    
+    def __init__(self, cities, provinces=(), aliases=None, major=(), suggest_size=SUGGEST_SIZE):
+        self.suggest_size = suggest_size
+        # 城市名称 -> 城市信息，按优先级排序（主要城市在前）
+        self.cities = {}
+        # 索引键 -> 城市名称
+        self._index = {}
+        # 前缀树节点为 [子节点字典, 候选城市列表]
+        self._trie = [{}, []]
+        
+        major = {name: rank for rank, name in enumerate(major)}
+        cities = sorted(cities, key=lambda city: major.get(city[0], len(major)))
+        
+        city_keys = {}
+        for name, full_name, province, pinyin, latitude, longitude in cities:
+            self.cities[name] = {
+                'name': name,
+                'full_name': full_name,
+                'province': province,
+                'pinyin': _index_key(pinyin),
+                'latitude': latitude,
+                'longitude': longitude
+            }
+            city_keys[name] = [name, full_name, name + '市']
+            if full_name.endswith('自治州'):
+                # 自治州常用简称，如'恩施州'
+                city_keys[name].append(name + '州')
+        
+        aliases = aliases or {}
+        for alias, name in aliases.items():
+            city_keys[name].append(alias)
+        
+        # 名称优先于别名和省份（如'吉林'是城市名称），省份优先于拼音
+        for name, keys in city_keys.items():
+            for key in keys:
+                self._index.setdefault(_index_key(key), name)
+        for short_name, full_name, capital in provinces:
+            self._index.setdefault(_index_key(short_name), capital)
+            self._index.setdefault(_index_key(full_name), capital)
+        for name, city in self.cities.items():
+            self._index.setdefault(city['pinyin'], name)
+        
+        # 按优先级顺序插入前缀树，每个节点的候选列表自然保持优先级顺序
+        for name, full_name, province, pinyin, latitude, longitude in cities:
+            initials = ''.join(syllable[0] for syllable in pinyin.split())
+            for key in city_keys[name] + [pinyin, initials]:
+                self._insert(_index_key(key), name)
+    
+    @classmethod
+    def from_file(cls, path=CITY_DATA_PATH, **kwargs):
+        """从数据文件加载"""
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['cities'], data.get('provinces', ()), data.get('aliases'), data.get('major', ()), **kwargs)
+    
+    def _insert(self, key, name):
+        node = self._trie
+        for char in key:
+            node = node[0].setdefault(char, [{}, []])
+            candidates = node[1]
+            if name not in candidates and len(candidates) < self.suggest_size:
+                candidates.append(name)
+    
+    def _find(self, query):
+        """精确解析，返回城市名称，未找到时返回None"""
+        key = _index_key(query)
+        if not key:
+            return None
+        name = self._index.get(key)
+        if name is None:
+            name = self._index.get(strip_admin_suffix(key))
+        return name
+    
+    def normalize(self, query):
+        """标准化城市名称：已知城市返回标准名称，未知城市只去除行政区划后缀"""
+        query = query.strip()
+        name = self._find(query)
+        return name if name is not None else strip_admin_suffix(query)
+    
+    def lookup(self, name):
+        """按标准名称查询城市信息，未找到时返回None"""
+        return self.cities.get(name)
+    
+    def resolve(self, query):
+        """解析任意形式的城市名称，返回城市信息，未找到时返回None"""
+        name = self._find(query)
+        return self.cities[name] if name is not None else None
+    
+    def suggest(self, query, limit=SUGGEST_SIZE):
+        """输入联想：返回名称、拼音或拼音首字母以query开头的城市，没有前缀匹配时返回最相近的城市"""
+        key = _index_key(query)
+        if not key:
+            return []
+        limit = min(limit, self.suggest_size)
+        
+        node = self._trie
+        for char in key:
+            node = node[0].get(char)
+            if node is None:
+                break
+        if node is not None:
+            return [self.cities[name] for name in node[1][:limit]]
+        
+        stripped = strip_admin_suffix(key)
+        if stripped != key:
+            return self.suggest(stripped, limit)
+        
+        if len(key) < FUZZY_MIN_LENGTH:
+            return []
+        names = []
+        for match in difflib.get_close_matches(key, self._index.keys(), n=limit * 2, cutoff=FUZZY_CUTOFF):
+            name = self._index[match]
+            if name not in names:
+                names.append(name)
+        return [self.cities[name] for name in names[:limit]]
+    
+    def stats(self):
+        """返回索引规模"""
+        return {
+            'cities': len(self.cities),
+            'index_keys': len(self._index)
+        }
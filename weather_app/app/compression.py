@@ -0,0 +1,111 @@
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 小于该大小（字节）的响应不压缩，压缩收益低于开销
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 500))
+
+# 压缩级别：gzip 1-9，brotli 0-11；动态内容使用中等级别，兼顾压缩率和CPU开销
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 5))
+
+# 需要压缩的内容类型（已压缩的格式如npz不再压缩）
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/x-ndjson',
+    'application/javascript',
+    'text/html',
+    'text/css',
+    'text/javascript',
+    'text/plain'
+}
+
+
+def _gzip_compressor():
+    # wbits=31：带gzip头和校验的格式
+    return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+
+class _BrotliCompressor:
+    """与zlib压缩对象接口一致的brotli流式压缩"""
+    
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    
+    def compress(self, data):
+        return self._compressor.process(data)
+    
+    def flush(self, mode=zlib.Z_FINISH):
+        if mode == zlib.Z_FINISH:
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def choose_encoding(accept_encodings):
+    """根据Accept-Encoding选择压缩格式，优先brotli（已安装时），客户端都不接受时返回None"""
+    candidates = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best = None
+    best_quality = 0
+    for encoding in candidates:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def _compressor(encoding):
+    return _BrotliCompressor() if encoding == 'br' else _gzip_compressor()
+
+
+def compress_data(data, encoding):
+    """一次性压缩完整内容"""
+    compressor = _compressor(encoding)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _compress_stream(chunks, encoding):
+    """流式压缩：每块数据压缩后立即输出，客户端可以边接收边解析"""
+    compressor = _compressor(encoding)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def compress_response(request, response):
+    """按Accept-Encoding压缩响应，注册为after_request钩子"""
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    
+    if (response.status_code < 200 or response.status_code in (204, 206, 304)
+            or response.direct_passthrough or 'Content-Encoding' in response.headers):
+        return response
+    
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+    
+    if response.is_streamed:
+        # 流式响应（如历史数据）逐块压缩，不缓冲整个响应
+        response.response = _compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        response.set_data(compress_data(data, encoding))
+    
+    response.headers['Content-Encoding'] = encoding
+    # 压缩后的内容与原始内容字节不同，ETag改为弱验证器（条件请求使用弱比较，仍然可以返回304）
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
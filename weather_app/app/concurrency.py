@@ -0,0 +1,67 @@
+import functools
+import os
+import threading
+
+try:
+    from gevent import monkey
+except ImportError:
+    monkey = None
+
+# gevent模式下执行SQLite操作的原生线程数量，同时也是每个工作进程的SQLite连接数量
+SQLITE_THREADS = int(os.getenv('SQLITE_THREADS', 4))
+
+
+def gevent_active():
+    """当前进程是否运行在gevent协程模式下（gunicorn的gevent工作模式会在加载应用前对socket等模块打补丁）"""
+    return monkey is not None and monkey.is_module_patched('socket')
+
+
+def native_thread_local():
+    """按原生线程区分的线程局部存储：gevent打补丁后threading.local按协程区分，这里取补丁前的版本"""
+    if monkey is not None:
+        return monkey.get_original('threading', 'local')()
+    return threading.local()
+
+
+class BlockingExecutor:
+    """在固定数量的原生线程中执行阻塞操作
+    
+    gevent模式下SQLite查询和等待写锁（busy_timeout）都不会让出，直接在协程中执行会阻塞整个工作进程；
+    放到线程池中执行时只有发起调用的协程等待，sqlite3在执行期间释放GIL。其他模式下直接在当前线程执行。
+    在线程池内再次调用时直接执行，避免线程池占满时相互等待。
+    """
+    
+    def __init__(self, size=SQLITE_THREADS):
+        self.size = size
+        self._pool = None
+        self._pid = None
+        self._local = native_thread_local()
+    
+    def _get_pool(self):
+        # gunicorn fork出工作进程后重新创建线程池
+        pid = os.getpid()
+        if self._pool is None or self._pid != pid:
+            from gevent.threadpool import ThreadPool
+            self._pool = ThreadPool(self.size)
+            self._pid = pid
+        return self._pool
+    
+    def _call(self, fn, args, kwargs):
+        self._local.active = True
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._local.active = False
+    
+    def run(self, fn, *args, **kwargs):
+        if not gevent_active() or getattr(self._local, 'active', False):
+            return fn(*args, **kwargs)
+        return self._get_pool().apply(self._call, (fn, args, kwargs))
+
+
+def blocking(method):
+    """方法装饰器：通过实例的executor（BlockingExecutor）执行"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        return self.executor.run(method, self, *args, **kwargs)
+    return wrapper
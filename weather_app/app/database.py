@@ -1,24 +1,256 @@
 import sqlite3
 import datetime
+import json
 import os
+import time
+from app.cache import TTLCache
+from app.concurrency import BlockingExecutor, blocking, native_thread_local
+from app.formatting import parse_number, parse_weather_text, parse_wind_direction
+from app.writer import WriteBehindQueue
 
-# 数据库文件路径
-DB_PATH = os.path.join(os.path.dirname(__file__), 'weather_cache.db')
+# 数据库文件路径（可通过环境变量指定，便于测试时使用独立的数据库文件）
+DB_PATH = os.getenv('WEATHER_DB_PATH', os.path.join(os.path.dirname(__file__), 'weather_cache.db'))
+
+# SQLite连接参数：等待写锁的超时时间（秒）、页缓存大小（KB）、内存映射大小（字节）、语句缓存数量
+SQLITE_BUSY_TIMEOUT = float(os.getenv('SQLITE_BUSY_TIMEOUT', 5))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', 8192))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 64 * 1024 * 1024))
+SQLITE_CACHED_STATEMENTS = 128
+
+# 延迟批量写入：开启后写操作由后台线程每隔一段时间（毫秒）或积累一定条数后合并为一个事务写入
+WRITE_BEHIND_ENABLED = os.getenv('WRITE_BEHIND_ENABLED', 'true').lower() != 'false'
+WRITE_BEHIND_INTERVAL_MS = int(os.getenv('WRITE_BEHIND_INTERVAL_MS', 200))
+WRITE_BEHIND_MAX_BATCH = int(os.getenv('WRITE_BEHIND_MAX_BATCH', 500))
+
+# 数据库表结构版本，保存在PRAGMA user_version中，用于升级旧数据库
+SCHEMA_VERSION = 4
+
+# 天气指标数值列：温度（°C）、湿度（%）、气压（hPa）、能见度（km）、风力等级、风速（km/h）、风向（度）、天气代码、AQI
+WEATHER_METRIC_COLUMNS = ('temperature_c', 'humidity_pct', 'pressure_hpa', 'visibility_km', 'wind_level',
+                          'wind_speed_kmh', 'wind_deg', 'weather_code', 'aqi')
+
+# 天气缓存表，每个城市只保留最新的一条（写入时覆盖），表大小不随时间增长
+WEATHER_CACHE_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS weather_cache (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        city TEXT NOT NULL UNIQUE,
+        temperature_c REAL,
+        humidity_pct INTEGER,
+        pressure_hpa REAL,
+        visibility_km REAL,
+        wind_level INTEGER,
+        wind_speed_kmh REAL,
+        wind_deg INTEGER,
+        weather_code INTEGER,
+        aqi REAL,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+# 历史天气表，每个城市每天每小时一条
+HISTORICAL_WEATHER_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS historical_weather (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        city TEXT NOT NULL,
+        temperature_c REAL,
+        humidity_pct INTEGER,
+        pressure_hpa REAL,
+        visibility_km REAL,
+        wind_level INTEGER,
+        wind_speed_kmh REAL,
+        wind_deg INTEGER,
+        weather_code INTEGER,
+        aqi REAL,
+        record_date DATE NOT NULL,
+        record_hour INTEGER NOT NULL,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(city, record_date, record_hour)
+    )
+'''
+
+# 按日汇总的历史天气统计列（温度、湿度、AQI的最小/最大/平均值）
+ROLLUP_METRIC_COLUMNS = ('temperature_min', 'temperature_max', 'temperature_avg',
+                         'humidity_min', 'humidity_max', 'humidity_avg',
+                         'aqi_min', 'aqi_max', 'aqi_avg')
+
+# 历史天气按日汇总的聚合表达式，FROM historical_weather 按城市和日期分组
+ROLLUP_AGGREGATES_SQL = '''
+    COUNT(*),
+    MIN(temperature_c), MAX(temperature_c), ROUND(AVG(temperature_c), 1),
+    MIN(humidity_pct), MAX(humidity_pct), ROUND(AVG(humidity_pct), 1),
+    MIN(aqi), MAX(aqi), ROUND(AVG(aqi), 1)
+'''
+
+# 每写入一条历史数据，重新计算该城市当天的汇总（最多24条），覆盖同一小时的写入也不会重复计数
+HISTORICAL_DAILY_TRIGGER_SQL = f'''
+    CREATE TRIGGER IF NOT EXISTS historical_daily_rollup
+    AFTER INSERT ON historical_weather
+    BEGIN
+        INSERT OR REPLACE INTO historical_daily
+        (city, record_date, samples, {', '.join(ROLLUP_METRIC_COLUMNS)}, weather_code)
+        SELECT city, record_date, {ROLLUP_AGGREGATES_SQL},
+            (SELECT weather_code FROM historical_weather
+             WHERE city = NEW.city AND record_date = NEW.record_date AND weather_code IS NOT NULL
+             GROUP BY weather_code ORDER BY COUNT(*) DESC, weather_code LIMIT 1)
+        FROM historical_weather
+        WHERE city = NEW.city AND record_date = NEW.record_date
+        GROUP BY city, record_date;
+    END
+'''
+
+# 导出/导入历史天气时的字段顺序
+HISTORY_EXPORT_COLUMNS = ('city', 'record_date', 'record_hour') + WEATHER_METRIC_COLUMNS + ('timestamp',)
+
+# 城市热度的半衰期（秒）：热度分数按请求次数累加，每经过一个半衰期减半
+POPULARITY_HALF_LIFE_SECONDS = int(os.getenv('POPULARITY_HALF_LIFE_SECONDS', 24 * 3600))
+
+# 热度衰减到该分数以下的城市在定期清理时删除（初始化的热门城市不删除）
+POPULARITY_MIN_SCORE = 0.05
+
+# 历史天气数据保留天数，0表示永久保留
+HISTORY_RETENTION_DAYS = int(os.getenv('HISTORY_RETENTION_DAYS', 0))
+
+# 定期清理时每次删除的行数，分批删除避免长时间持有写锁
+PRUNE_CHUNK_SIZE = 1000
+
+# 按日期范围逐行读取历史数据时每页的行数
+HISTORY_PAGE_ROWS = 500
+
+# 天气缓存有效期（秒），与SQL查询中的1小时窗口保持一致；超过后数据视为过期
+CACHE_TTL_SECONDS = 3600
+
+# 过期数据的最长保留时间（秒），在此之前可以先返回过期数据再后台刷新
+CACHE_HARD_TTL_SECONDS = int(os.getenv('CACHE_HARD_TTL_SECONDS', 6 * 3600))
+
+# 进程内热点缓存最多保存的城市数量
+HOT_CACHE_MAX_SIZE = int(os.getenv('HOT_CACHE_MAX_SIZE', 512))
+
+# 地理编码结果的有效期（秒），坐标基本不会变化，默认30天
+GEOCODE_TTL_SECONDS = int(os.getenv('GEOCODE_TTL_SECONDS', 30 * 24 * 3600))
+
+# 未找到城市（负缓存）的有效期（秒），避免拼写错误的城市反复请求上游API
+GEOCODE_NEGATIVE_TTL_SECONDS = int(os.getenv('GEOCODE_NEGATIVE_TTL_SECONDS', 24 * 3600))
+
+# 逐日预报缓存的有效期（秒），与Open-Meteo预报模型的更新周期（数小时一次）对齐
+FORECAST_TTL_SECONDS = int(os.getenv('FORECAST_TTL_SECONDS', 3 * 3600))
+
+# 进程内逐日预报缓存最多保存的条目数量
+FORECAST_CACHE_MAX_SIZE = int(os.getenv('FORECAST_CACHE_MAX_SIZE', 512))
+
+# 进程内地理编码缓存最多保存的条目数量
+GEOCODE_CACHE_MAX_SIZE = int(os.getenv('GEOCODE_CACHE_MAX_SIZE', 4096))
+
+def decay(elapsed, half_life):
+    """经过elapsed秒后的热度衰减系数，注册为SQLite函数在SQL中使用"""
+    return 0.5 ** (elapsed / half_life)
 
 class WeatherDatabase:
     def __init__(self):
+        # 每个线程持有一个长连接，避免每次查询都重新打开数据库文件；按原生线程区分，
+        # gevent模式下数据库操作在固定数量的线程中执行（见app/concurrency.py），连接数不随协程数增长
+        self._local = native_thread_local()
+        self.executor = BlockingExecutor()
+        
+        # 进程内热点缓存，位于SQLite缓存表之前，每个城市一条，保留到硬过期时间
+        self.hot_cache = TTLCache(maxsize=HOT_CACHE_MAX_SIZE, ttl=CACHE_HARD_TTL_SECONDS)
+        
+        # 进程内地理编码缓存，位于geocode_cache表之前
+        self.geocode_cache = TTLCache(maxsize=GEOCODE_CACHE_MAX_SIZE, ttl=GEOCODE_TTL_SECONDS)
+        
+        # 进程内逐日预报缓存，位于forecast_cache表之前，按 (城市, 预报天数) 保存
+        self.forecast_cache = TTLCache(maxsize=FORECAST_CACHE_MAX_SIZE, ttl=FORECAST_TTL_SECONDS)
+        
+        # 延迟批量写入队列，关闭时所有写操作同步执行
+        self.writer = None
+        if WRITE_BEHIND_ENABLED:
+            self.writer = WriteBehindQueue(
+                self.connect,
+                run=self.executor.run,
+                flush_interval=WRITE_BEHIND_INTERVAL_MS / 1000,
+                max_batch=WRITE_BEHIND_MAX_BATCH
+            )
+        
         # 初始化时创建表结构
         self.create_tables()
     
+    def _cache_age(self, timestamp):
+        """根据数据库中的UTC时间戳计算缓存数据的存在时间（秒）"""
+        try:
+            saved_at = datetime.datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S')
+        except (TypeError, ValueError):
+            return float('inf')
+        return (datetime.datetime.utcnow() - saved_at).total_seconds()
+    
+    def _check_freshness(self, data, allow_stale):
+        """根据缓存时间设置stale标记，超出可用期限时返回None"""
+        age = self._cache_age(data.get('timestamp'))
+        if age < CACHE_TTL_SECONDS:
+            data['stale'] = False
+            return data
+        if allow_stale and age < CACHE_HARD_TTL_SECONDS:
+            data['stale'] = True
+            return data
+        return None
+    
     def connect(self):
-        """连接到SQLite数据库"""
+        """获取当前线程的SQLite长连接，首次使用时创建
+        
+        连接使用WAL日志模式，读写互不阻塞，多个工作进程并发写入时等待而不是立即报错；
+        sqlite3模块会按SQL文本缓存预编译语句，长连接下重复查询无需重新解析。
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        
+        # gunicorn fork出工作进程后不能继续使用父进程的连接，重新创建
         try:
-            conn = sqlite3.connect(DB_PATH)
+            conn = sqlite3.connect(
+                DB_PATH,
+                timeout=SQLITE_BUSY_TIMEOUT,
+                cached_statements=SQLITE_CACHED_STATEMENTS
+            )
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}')
+            conn.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}')
+            conn.execute('PRAGMA temp_store=MEMORY')
+            conn.create_function('decay', 2, decay, deterministic=True)
+            
+            self._local.conn = conn
+            self._local.pid = os.getpid()
             return conn
         except sqlite3.Error as e:
             print(f"数据库连接失败: {e}")
             return None
     
+    def execute_write(self, sql, params):
+        """执行一条写操作：开启延迟批量写入时放入队列立即返回，否则同步写入并提交"""
+        if self.writer:
+            self.writer.submit(sql, params)
+            return True
+        return self._write_now(sql, params)
+    
+    @blocking
+    def _write_now(self, sql, params):
+        conn = self.connect()
+        if not conn:
+            return False
+        
+        try:
+            conn.execute(sql, params)
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
+            print(f"写入数据库失败: {e}")
+            conn.rollback()
+            return False
+    
+    def flush_writes(self):
+        """等待队列中的写操作全部写入数据库"""
+        if self.writer:
+            self.writer.flush()
+    
+    @blocking
     def create_tables(self):
         """创建数据库表"""
         conn = self.connect()
@@ -28,58 +260,86 @@ class WeatherDatabase:
         try:
             cursor = conn.cursor()
             
+            # 新建的数据库使用增量清理模式，删除数据后可以逐步归还空闲页
+            cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            
             # 创建天气缓存表
+            cursor.execute(WEATHER_CACHE_TABLE_SQL)
+            
+            # 创建热门城市表，score为updated_at时刻的热度分数，读取时按经过的时间衰减
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS weather_cache (
+                CREATE TABLE IF NOT EXISTS popular_cities (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    city TEXT NOT NULL,
-                    temperature TEXT,
-                    humidity TEXT,
-                    weather TEXT,
-                    wind TEXT,
-                    wind_dir TEXT,
-                    pressure TEXT,
-                    visibility TEXT,
-                    aqi REAL,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                    city TEXT NOT NULL UNIQUE,
+                    score REAL NOT NULL DEFAULT 0,
+                    updated_at REAL
                 )
             ''')
             
-            # 为city和timestamp添加索引，提高查询性能
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_cache_city ON weather_cache (city)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_cache_timestamp ON weather_cache (timestamp)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_cache_city_timestamp ON weather_cache (city, timestamp)')
+            # 创建历史天气表
+            cursor.execute(HISTORICAL_WEATHER_TABLE_SQL)
             
-            # 创建热门城市表
+            # 创建历史天气按日汇总表，由触发器在写入历史数据时更新，查询汇总时无需扫描逐小时数据
+            # weather_code为当天出现次数最多的天气
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS popular_cities (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    city TEXT NOT NULL UNIQUE
+                CREATE TABLE IF NOT EXISTS historical_daily (
+                    city TEXT NOT NULL,
+                    record_date DATE NOT NULL,
+                    samples INTEGER NOT NULL,
+                    temperature_min REAL,
+                    temperature_max REAL,
+                    temperature_avg REAL,
+                    humidity_min REAL,
+                    humidity_max REAL,
+                    humidity_avg REAL,
+                    aqi_min REAL,
+                    aqi_max REAL,
+                    aqi_avg REAL,
+                    weather_code INTEGER,
+                    PRIMARY KEY (city, record_date)
                 )
             ''')
             
-            # 创建历史天气表
+            # 创建地理编码缓存表，found为0表示上游API未找到该城市（负缓存）
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS historical_weather (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                CREATE TABLE IF NOT EXISTS geocode_cache (
+                    query TEXT PRIMARY KEY,
+                    name TEXT,
+                    latitude REAL,
+                    longitude REAL,
+                    found INTEGER NOT NULL,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # 创建逐日预报缓存表，预报数据以JSON格式保存
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS forecast_cache (
                     city TEXT NOT NULL,
-                    temperature TEXT,
-                    humidity TEXT,
-                    weather TEXT,
-                    wind TEXT,
-                    wind_dir TEXT,
-                    pressure TEXT,
-                    visibility TEXT,
-                    aqi REAL,
-                    record_date DATE NOT NULL,
-                    record_hour INTEGER NOT NULL,
+                    forecast_days INTEGER NOT NULL,
+                    data TEXT NOT NULL,
                     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(city, record_date, record_hour)
+                    PRIMARY KEY (city, forecast_days)
+                )
+            ''')
+            
+            # 创建上游请求租约表，用于多个工作进程之间合并同一城市的请求
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS fetch_leases (
+                    key TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
                 )
             ''')
             
             conn.commit()
-            conn.close()
+            
+            # 升级旧版本数据库的表结构
+            self.migrate_schema()
+            
+            # 每写入一条历史数据，重新计算该城市当天的汇总；触发器使用数值列，需在表结构升级之后创建
+            cursor.execute(HISTORICAL_DAILY_TRIGGER_SQL)
+            conn.commit()
             
             # 初始化热门城市数据
             self.init_popular_cities()
@@ -87,8 +347,156 @@ class WeatherDatabase:
         except sqlite3.Error as e:
             print(f"创建表失败: {e}")
             if conn:
-                conn.close()
+                conn.rollback()
     
+    @blocking
+    def migrate_schema(self):
+        """按PRAGMA user_version逐步升级旧数据库的表结构，多个工作进程同时启动时只执行一次"""
+        conn = self.connect()
+        if not conn:
+            return
+        
+        try:
+            cursor = conn.cursor()
+            
+            # 加写锁后再检查版本，避免多个进程重复迁移
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('PRAGMA user_version')
+            version = cursor.fetchone()[0]
+            
+            if version < 2:
+                # 汇总触发器引用数值列，升级失败过的旧数据库中可能已经创建；重命名任何表时SQLite都会
+                # 检查全部触发器，需先删除，升级完成后在create_tables中重新创建
+                cursor.execute('DROP TRIGGER IF EXISTS historical_daily_rollup')
+            
+            if version < 1:
+                # 版本1：weather_cache改为每个城市一条，删除冗余的单列索引
+                cursor.execute('PRAGMA index_list(weather_cache)')
+                has_unique_city = False
+                for index in cursor.fetchall():
+                    if index[2]:
+                        cursor.execute(f'PRAGMA index_info({index[1]})')
+                        if [column[2] for column in cursor.fetchall()] == ['city']:
+                            has_unique_city = True
+                
+                if not has_unique_city:
+                    cursor.execute('''
+                        CREATE TABLE weather_cache_new (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            city TEXT NOT NULL UNIQUE,
+                            temperature TEXT,
+                            humidity TEXT,
+                            weather TEXT,
+                            wind TEXT,
+                            wind_dir TEXT,
+                            pressure TEXT,
+                            visibility TEXT,
+                            aqi REAL,
+                            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                        )
+                    ''')
+                    # 只保留每个城市最新的一条缓存
+                    cursor.execute('''
+                        INSERT INTO weather_cache_new
+                        (city, temperature, humidity, weather, wind, wind_dir, pressure, visibility, aqi, timestamp)
+                        SELECT city, temperature, humidity, weather, wind, wind_dir, pressure, visibility, aqi, timestamp
+                        FROM weather_cache
+                        WHERE id IN (SELECT MAX(id) FROM weather_cache GROUP BY city)
+                    ''')
+                    cursor.execute('DROP TABLE weather_cache')
+                    cursor.execute('ALTER TABLE weather_cache_new RENAME TO weather_cache')
+                
+                cursor.execute('DROP INDEX IF EXISTS idx_cache_city')
+                cursor.execute('DROP INDEX IF EXISTS idx_cache_timestamp')
+                cursor.execute('DROP INDEX IF EXISTS idx_cache_city_timestamp')
+            
+            if version < 2:
+                # 版本2：天气指标由带单位的字符串改为数值列
+                self._migrate_typed_metrics(cursor, 'weather_cache', WEATHER_CACHE_TABLE_SQL,
+                                            ['city', 'timestamp'])
+                self._migrate_typed_metrics(cursor, 'historical_weather', HISTORICAL_WEATHER_TABLE_SQL,
+                                            ['city', 'record_date', 'record_hour', 'timestamp'])
+            
+            if version < 3:
+                # 版本3：根据已有的历史数据生成按日汇总
+                self._rebuild_daily_rollups(cursor)
+            
+            if version < 4:
+                # 版本4：热门城市增加热度分数
+                cursor.execute('PRAGMA table_info(popular_cities)')
+                columns = [column[1] for column in cursor.fetchall()]
+                if 'score' not in columns:
+                    cursor.execute('ALTER TABLE popular_cities ADD COLUMN score REAL NOT NULL DEFAULT 0')
+                if 'updated_at' not in columns:
+                    cursor.execute('ALTER TABLE popular_cities ADD COLUMN updated_at REAL')
+            
+            cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+            conn.commit()
+            
+            # 旧数据库需要执行一次VACUUM才能切换到增量清理模式
+            cursor.execute('PRAGMA auto_vacuum')
+            if cursor.fetchone()[0] != 2:
+                cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
+                cursor.execute('VACUUM')
+        except sqlite3.Error as e:
+            print(f"升级数据库表结构失败: {e}")
+            if conn:
+                conn.rollback()
+    
+    def _migrate_typed_metrics(self, cursor, table, create_sql, key_columns):
+        """将旧版本表中'23.4°C'、'3级'等展示字符串解析为数值列，表已是新结构时跳过"""
+        cursor.execute(f'PRAGMA table_info({table})')
+        if 'temperature_c' in [column[1] for column in cursor.fetchall()]:
+            return
+        
+        cursor.execute(f'ALTER TABLE {table} RENAME TO {table}_legacy')
+        cursor.execute(create_sql)
+        
+        cursor.execute(f'''
+            SELECT {', '.join(key_columns)}, temperature, humidity, pressure, visibility, wind, wind_dir, weather, aqi
+            FROM {table}_legacy
+            ORDER BY id
+        ''')
+        rows = []
+        for row in cursor.fetchall():
+            keys = row[:len(key_columns)]
+            temperature, humidity, pressure, visibility, wind, wind_dir, weather, aqi = row[len(key_columns):]
+            # 旧数据没有保存风速，保留为NULL
+            rows.append(tuple(keys) + (
+                parse_number(temperature),
+                parse_number(humidity),
+                parse_number(pressure),
+                parse_number(visibility),
+                parse_number(wind),
+                None,
+                parse_wind_direction(wind_dir),
+                parse_weather_text(weather),
+                aqi
+            ))
+        
+        columns = list(key_columns) + list(WEATHER_METRIC_COLUMNS)
+        cursor.executemany(f'''
+            INSERT INTO {table} ({', '.join(columns)})
+            VALUES ({', '.join('?' * len(columns))})
+        ''', rows)
+        cursor.execute(f'DROP TABLE {table}_legacy')
+    
+    def _rebuild_daily_rollups(self, cursor, where='1', params=()):
+        """根据逐小时历史数据重新生成按日汇总，where为historical_weather上的过滤条件"""
+        cursor.execute(f'''
+            INSERT OR REPLACE INTO historical_daily
+            (city, record_date, samples, {', '.join(ROLLUP_METRIC_COLUMNS)}, weather_code)
+            SELECT city, record_date, {ROLLUP_AGGREGATES_SQL},
+                (SELECT weather_code FROM historical_weather AS h
+                 WHERE h.city = historical_weather.city AND h.record_date = historical_weather.record_date
+                       AND h.weather_code IS NOT NULL
+                 GROUP BY weather_code ORDER BY COUNT(*) DESC, weather_code LIMIT 1)
+            FROM historical_weather
+            WHERE {where}
+            GROUP BY city, record_date
+        ''', params)
+    
+    @blocking
     def init_popular_cities(self):
         """初始化热门城市数据"""
         popular_cities = ['北京', '上海', '广州', '深圳', '杭州', '成都', '武汉', '西安', '重庆', '南京']
@@ -104,14 +512,35 @@ class WeatherDatabase:
                 cursor.execute('INSERT OR IGNORE INTO popular_cities (city) VALUES (?)', (city,))
             
             conn.commit()
-            conn.close()
         except sqlite3.Error as e:
             print(f"初始化热门城市失败: {e}")
             if conn:
-                conn.close()
+                conn.rollback()
     
-    def get_cached_weather(self, city):
-        """获取缓存的天气数据，有效期1小时"""
+    def _row_to_weather(self, row):
+        """将 (城市, 各项指标..., 时间戳) 查询结果转换为天气记录"""
+        result = {'city': row[0]}
+        result.update(zip(WEATHER_METRIC_COLUMNS, row[1:]))
+        result['timestamp'] = row[len(WEATHER_METRIC_COLUMNS) + 1]
+        return result
+    
+    def get_cached_weather(self, city, allow_stale=False):
+        """获取缓存的天气数据，有效期1小时
+        
+        allow_stale为True时，也返回超过1小时但未超过硬过期时间的数据，
+        并通过stale字段标记，由调用方决定是否在后台刷新。
+        """
+        # 优先读取进程内热点缓存，命中且未过期时不访问数据库
+        # 已过期时继续查询数据库：其他进程（如后台预取）可能已经写入了更新的数据
+        cached = self.hot_cache.get(city)
+        if cached:
+            cached = self._check_freshness(dict(cached), allow_stale=False)
+            if cached:
+                return cached
+        return self._query_cached_weather(city, allow_stale)
+    
+    @blocking
+    def _query_cached_weather(self, city, allow_stale):
         conn = self.connect()
         if not conn:
             return None
@@ -119,132 +548,416 @@ class WeatherDatabase:
         try:
             cursor = conn.cursor()
             
-            # 查询1小时内的缓存数据，明确指定字段顺序
+            # 查询有效期内的缓存数据，明确指定字段顺序
+            max_age = CACHE_HARD_TTL_SECONDS if allow_stale else CACHE_TTL_SECONDS
             cursor.execute('''
-                SELECT city, temperature, humidity, weather, wind, wind_dir, pressure, visibility, aqi, timestamp 
+                SELECT city, temperature_c, humidity_pct, pressure_hpa, visibility_km, wind_level, wind_speed_kmh, wind_deg, weather_code, aqi, timestamp
                 FROM weather_cache 
-                WHERE city = ? AND timestamp >= datetime('now', '-1 hours')
+                WHERE city = ? AND timestamp >= datetime('now', ?)
                 ORDER BY timestamp DESC
                 LIMIT 1
-            ''', (city,))
+            ''', (city, f'-{max_age} seconds'))
             
             row = cursor.fetchone()
             if row:
-                result = {
-                    'city': row[0],
-                    'temperature': row[1],
-                    'humidity': row[2],
-                    'weather': row[3],
-                    'wind': row[4],
-                    'wind_dir': row[5],
-                    'pressure': row[6],
-                    'visibility': row[7],
-                    'aqi': row[8],
-                    'timestamp': row[9]
-                }
+                result = self._row_to_weather(row)
+                # 回填热点缓存，保留到数据库记录的硬过期时间
+                self.hot_cache.set(city, dict(result), ttl=CACHE_HARD_TTL_SECONDS - self._cache_age(result['timestamp']))
+                result = self._check_freshness(result, allow_stale)
             else:
                 result = None
             
-            conn.close()
             return result
         except sqlite3.Error as e:
             print(f"获取缓存数据失败: {e}")
             if conn:
-                conn.close()
+                conn.rollback()
             return None
     
+    def get_cached_weather_batch(self, cities, allow_stale=False):
+        """批量获取多个城市的缓存天气数据（一次查询），返回 {城市: 天气数据}"""
+        result = {}
+        missing = []
+        
+        # 优先读取进程内热点缓存，只查询未命中或已过期的城市
+        for city in dict.fromkeys(cities):
+            cached = self.hot_cache.get(city)
+            if cached:
+                cached = self._check_freshness(dict(cached), allow_stale=False)
+            if cached:
+                result[city] = cached
+            else:
+                missing.append(city)
+        
+        if not missing:
+            return result
+        result.update(self._query_cached_weather_batch(missing, allow_stale))
+        return result
+    
+    @blocking
+    def _query_cached_weather_batch(self, missing, allow_stale):
+        result = {}
+        conn = self.connect()
+        if not conn:
+            return result
+        
+        try:
+            cursor = conn.cursor()
+            
+            # 使用IN查询一次读取所有城市有效期内的缓存，按时间倒序取每个城市的最新一条
+            max_age = CACHE_HARD_TTL_SECONDS if allow_stale else CACHE_TTL_SECONDS
+            placeholders = ','.join('?' * len(missing))
+            cursor.execute(f'''
+                SELECT city, temperature_c, humidity_pct, pressure_hpa, visibility_km, wind_level, wind_speed_kmh, wind_deg, weather_code, aqi, timestamp
+                FROM weather_cache
+                WHERE city IN ({placeholders}) AND timestamp >= datetime('now', ?)
+                ORDER BY timestamp DESC
+            ''', missing + [f'-{max_age} seconds'])
+            
+            for row in cursor.fetchall():
+                if row[0] in result:
+                    continue
+                data = self._row_to_weather(row)
+                self.hot_cache.set(row[0], dict(data), ttl=CACHE_HARD_TTL_SECONDS - self._cache_age(data['timestamp']))
+                data = self._check_freshness(data, allow_stale)
+                if data:
+                    result[row[0]] = data
+            
+            return result
+        except sqlite3.Error as e:
+            print(f"批量获取缓存数据失败: {e}")
+            if conn:
+                conn.rollback()
+            return result
+    
+    @blocking
+    def get_latest_weather_batch(self, cities):
+        """直接从数据库读取多个城市最新的缓存记录（不经过进程内缓存），用于发现其他进程写入的更新
+        
+        读取到比热点缓存更新的记录时同时更新热点缓存，返回 {城市: 天气数据}。
+        """
+        conn = self.connect()
+        if not conn or not cities:
+            return {}
+        
+        try:
+            cursor = conn.cursor()
+            placeholders = ','.join('?' * len(cities))
+            cursor.execute(f'''
+                SELECT city, temperature_c, humidity_pct, pressure_hpa, visibility_km, wind_level, wind_speed_kmh, wind_deg, weather_code, aqi, timestamp
+                FROM weather_cache
+                WHERE city IN ({placeholders}) AND timestamp >= datetime('now', ?)
+            ''', list(cities) + [f'-{CACHE_HARD_TTL_SECONDS} seconds'])
+            
+            result = {}
+            for row in cursor.fetchall():
+                data = self._row_to_weather(row)
+                cached = self.hot_cache.get(row[0])
+                if not cached or cached['timestamp'] < data['timestamp']:
+                    self.hot_cache.set(row[0], dict(data), ttl=CACHE_HARD_TTL_SECONDS - self._cache_age(data['timestamp']))
+                data = self._check_freshness(data, allow_stale=True)
+                if data:
+                    result[row[0]] = data
+            return result
+        except sqlite3.Error as e:
+            print(f"读取最新缓存数据失败: {e}")
+            if conn:
+                conn.rollback()
+            return {}
+    
     def save_weather(self, weather_data):
-        """保存天气数据到缓存"""
+        """保存天气数据到缓存，进程内热点缓存立即更新，数据库由后台线程批量写入
+        
+        weather_data为数值形式的天气记录，字段见WEATHER_METRIC_COLUMNS，展示格式由视图层转换；
+        记录带有timestamp（获取时间）时按该时间保存，与返回给客户端的缓存验证器保持一致。
+        """
+        timestamp = weather_data.get('timestamp') or datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        
+        # 同步写入进程内热点缓存
+        cached = dict(weather_data)
+        cached.setdefault('aqi', 0)
+        cached['timestamp'] = timestamp
+        self.hot_cache.set(weather_data['city'], cached)
+        
+        # 每个城市只保留一条，已存在时直接覆盖
+        return self.execute_write('''
+            INSERT INTO weather_cache (city, temperature_c, humidity_pct, pressure_hpa, visibility_km, wind_level,
+                                       wind_speed_kmh, wind_deg, weather_code, aqi, timestamp)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(city) DO UPDATE SET
+                temperature_c = excluded.temperature_c,
+                humidity_pct = excluded.humidity_pct,
+                pressure_hpa = excluded.pressure_hpa,
+                visibility_km = excluded.visibility_km,
+                wind_level = excluded.wind_level,
+                wind_speed_kmh = excluded.wind_speed_kmh,
+                wind_deg = excluded.wind_deg,
+                weather_code = excluded.weather_code,
+                aqi = excluded.aqi,
+                timestamp = excluded.timestamp
+        ''', (
+            weather_data['city'],
+            weather_data['temperature_c'],
+            weather_data['humidity_pct'],
+            weather_data['pressure_hpa'],
+            weather_data['visibility_km'],
+            weather_data['wind_level'],
+            weather_data.get('wind_speed_kmh'),
+            weather_data.get('wind_deg'),
+            weather_data.get('weather_code'),
+            weather_data.get('aqi', 0),
+            timestamp
+        ))
+    
+    def get_cached_geocode(self, query):
+        """获取缓存的地理编码结果，返回 {'found', 'name', 'latitude', 'longitude'}，无缓存时返回None"""
+        cached = self.geocode_cache.get(query)
+        if cached:
+            return dict(cached)
+        return self._query_cached_geocode(query)
+    
+    @blocking
+    def _query_cached_geocode(self, query):
         conn = self.connect()
         if not conn:
-            return False
+            return None
         
         try:
             cursor = conn.cursor()
             
+            # 找到的城市长期有效，未找到的城市只在负缓存有效期内有效
             cursor.execute('''
-                INSERT INTO weather_cache (city, temperature, humidity, weather, wind, wind_dir, pressure, visibility, aqi)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                weather_data['city'],
-                weather_data['temperature'],
-                weather_data['humidity'],
-                weather_data['weather'],
-                weather_data['wind'],
-                weather_data['wind_dir'],
-                weather_data['pressure'],
-                weather_data['visibility'],
-                weather_data.get('aqi', 0)
-            ))
+                SELECT found, name, latitude, longitude, timestamp
+                FROM geocode_cache
+                WHERE query = ? AND timestamp >= datetime('now', CASE WHEN found THEN ? ELSE ? END)
+            ''', (query, f'-{GEOCODE_TTL_SECONDS} seconds', f'-{GEOCODE_NEGATIVE_TTL_SECONDS} seconds'))
             
-            conn.commit()
-            conn.close()
-            return True
+            row = cursor.fetchone()
+            if row:
+                result = {
+                    'found': bool(row[0]),
+                    'name': row[1],
+                    'latitude': row[2],
+                    'longitude': row[3]
+                }
+                ttl = GEOCODE_TTL_SECONDS if result['found'] else GEOCODE_NEGATIVE_TTL_SECONDS
+                self.geocode_cache.set(query, dict(result), ttl=ttl - self._cache_age(row[4]))
+            else:
+                result = None
+            
+            return result
         except sqlite3.Error as e:
-            print(f"保存天气数据失败: {e}")
+            print(f"获取地理编码缓存失败: {e}")
             if conn:
-                conn.close()
-            return False
+                conn.rollback()
+            return None
     
-    def get_popular_cities(self):
-        """获取热门城市列表"""
+    @blocking
+    def get_geocoded_locations(self):
+        """获取地理编码缓存中所有有效的城市坐标，返回 [(城市名称, 纬度, 经度)]"""
         conn = self.connect()
         if not conn:
             return []
         
         try:
             cursor = conn.cursor()
-            cursor.execute('SELECT city FROM popular_cities ORDER BY id')
-            result = [row[0] for row in cursor.fetchall()]
-            conn.close()
+            cursor.execute('''
+                SELECT name, latitude, longitude
+                FROM geocode_cache
+                WHERE found AND timestamp >= datetime('now', ?)
+                GROUP BY name
+            ''', (f'-{GEOCODE_TTL_SECONDS} seconds',))
+            result = cursor.fetchall()
             return result
         except sqlite3.Error as e:
-            print(f"获取热门城市失败: {e}")
+            print(f"获取地理编码缓存失败: {e}")
             if conn:
-                conn.close()
+                conn.rollback()
             return []
     
-    def save_historical_weather(self, weather_data):
-        """保存天气数据到历史表（每天每小时只保存一条）"""
+    def save_geocode(self, query, name=None, latitude=None, longitude=None):
+        """保存地理编码结果，name为空表示未找到该城市"""
+        found = name is not None
+        result = {
+            'found': found,
+            'name': name,
+            'latitude': latitude,
+            'longitude': longitude
+        }
+        self.geocode_cache.set(query, result, ttl=GEOCODE_TTL_SECONDS if found else GEOCODE_NEGATIVE_TTL_SECONDS)
+        
+        return self.execute_write('''
+            INSERT OR REPLACE INTO geocode_cache (query, name, latitude, longitude, found)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (query, name, latitude, longitude, int(found)))
+    
+    def get_cached_forecast_entry(self, city, forecast_days):
+        """获取缓存的逐日预报，返回 (预报列表, 写入时间)，无缓存或已过期时返回None"""
+        cached = self.forecast_cache.get((city, forecast_days))
+        if cached is not None:
+            return cached
+        return self._query_cached_forecast(city, forecast_days)
+    
+    @blocking
+    def _query_cached_forecast(self, city, forecast_days):
         conn = self.connect()
         if not conn:
-            return False
+            return None
         
         try:
             cursor = conn.cursor()
+            cursor.execute('''
+                SELECT data, timestamp
+                FROM forecast_cache
+                WHERE city = ? AND forecast_days = ? AND timestamp >= datetime('now', ?)
+            ''', (city, forecast_days, f'-{FORECAST_TTL_SECONDS} seconds'))
             
-            # 获取当前日期和小时
-            now = datetime.datetime.now()
-            record_date = now.strftime('%Y-%m-%d')
-            record_hour = now.hour
+            row = cursor.fetchone()
+            if row:
+                result = (json.loads(row[0]), row[1])
+                self.forecast_cache.set((city, forecast_days), result, ttl=FORECAST_TTL_SECONDS - self._cache_age(row[1]))
+            else:
+                result = None
             
+            return result
+        except (sqlite3.Error, ValueError) as e:
+            print(f"获取预报缓存失败: {e}")
+            if conn:
+                conn.rollback()
+            return None
+    
+    def save_forecast(self, city, forecast_days, forecast_data):
+        """保存逐日预报列表到缓存，每个 (城市, 预报天数) 只保留一条，返回写入时间"""
+        timestamp = datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        self.forecast_cache.set((city, forecast_days), (forecast_data, timestamp))
+        
+        self.execute_write('''
+            INSERT OR REPLACE INTO forecast_cache (city, forecast_days, data, timestamp)
+            VALUES (?, ?, ?, ?)
+        ''', (city, forecast_days, json.dumps(forecast_data, ensure_ascii=False), timestamp))
+        return timestamp
+    
+    @blocking
+    def acquire_fetch_lease(self, key, owner, ttl):
+        """尝试获取上游请求租约，成功返回True；租约过期后可被其他进程重新获取"""
+        conn = self.connect()
+        if not conn:
+            # 数据库不可用时不阻止请求
+            return True
+        
+        try:
+            cursor = conn.cursor()
+            now = time.time()
+            
+            # 清除已过期的租约，再尝试插入新租约
+            cursor.execute('DELETE FROM fetch_leases WHERE key = ? AND expires_at < ?', (key, now))
             cursor.execute('''
-                INSERT OR REPLACE INTO historical_weather 
-                (city, temperature, humidity, weather, wind, wind_dir, pressure, visibility, aqi, record_date, record_hour)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                weather_data['city'],
-                weather_data['temperature'],
-                weather_data['humidity'],
-                weather_data['weather'],
-                weather_data['wind'],
-                weather_data['wind_dir'],
-                weather_data['pressure'],
-                weather_data['visibility'],
-                weather_data.get('aqi', 0),
-                record_date,
-                record_hour
-            ))
+                INSERT OR IGNORE INTO fetch_leases (key, owner, expires_at)
+                VALUES (?, ?, ?)
+            ''', (key, owner, now + ttl))
+            acquired = cursor.rowcount == 1
             
             conn.commit()
-            conn.close()
+            return acquired
+        except sqlite3.Error as e:
+            print(f"获取请求租约失败: {e}")
+            if conn:
+                conn.rollback()
             return True
+    
+    def release_fetch_lease(self, key, owner):
+        """释放自己持有的上游请求租约
+        
+        与天气数据经同一个写入队列提交，保证其他进程看到租约释放时缓存数据已经写入。
+        """
+        return self.execute_write('DELETE FROM fetch_leases WHERE key = ? AND owner = ?', (key, owner))
+    
+    @blocking
+    def is_fetch_lease_active(self, key):
+        """检查是否有其他进程持有未过期的上游请求租约"""
+        conn = self.connect()
+        if not conn:
+            return False
+        
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1 FROM fetch_leases WHERE key = ? AND expires_at >= ?', (key, time.time()))
+            active = cursor.fetchone() is not None
+            return active
         except sqlite3.Error as e:
-            print(f"保存历史天气数据失败: {e}")
+            print(f"查询请求租约失败: {e}")
             if conn:
-                conn.close()
+                conn.rollback()
             return False
     
+    @blocking
+    def get_popular_cities(self, limit=None):
+        """获取按当前热度排序的热门城市列表，热度相同（如初始化的城市）时按添加顺序"""
+        conn = self.connect()
+        if not conn:
+            return []
+        
+        try:
+            cursor = conn.cursor()
+            now = time.time()
+            cursor.execute('''
+                SELECT city FROM popular_cities
+                ORDER BY score * decay(? - COALESCE(updated_at, ?), ?) DESC, id
+                LIMIT ?
+            ''', (now, now, POPULARITY_HALF_LIFE_SECONDS, -1 if limit is None else limit))
+            result = [row[0] for row in cursor.fetchall()]
+            return result
+        except sqlite3.Error as e:
+            print(f"获取热门城市失败: {e}")
+            if conn:
+                conn.rollback()
+            return []
+    
+    def record_city_hits(self, counts):
+        """累加城市的请求次数到热度分数，counts为 {城市: 请求次数}
+        
+        已有分数先按距上次更新经过的时间衰减再累加，写入经由延迟批量写入队列合并。
+        """
+        now = time.time()
+        for city, hits in counts.items():
+            self.execute_write('''
+                INSERT INTO popular_cities (city, score, updated_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(city) DO UPDATE SET
+                    score = popular_cities.score
+                        * decay(excluded.updated_at - COALESCE(popular_cities.updated_at, excluded.updated_at), ?)
+                        + excluded.score,
+                    updated_at = excluded.updated_at
+            ''', (city, hits, now, POPULARITY_HALF_LIFE_SECONDS))
+    
+    def save_historical_weather(self, weather_data):
+        """保存天气数据到历史表（每天每小时只保存一条）"""
+        # 获取当前日期和小时
+        now = datetime.datetime.now()
+        record_date = now.strftime('%Y-%m-%d')
+        record_hour = now.hour
+        
+        return self.execute_write('''
+            INSERT OR REPLACE INTO historical_weather 
+            (city, temperature_c, humidity_pct, pressure_hpa, visibility_km, wind_level, wind_speed_kmh, wind_deg, weather_code, aqi,
+             record_date, record_hour)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            weather_data['city'],
+            weather_data['temperature_c'],
+            weather_data['humidity_pct'],
+            weather_data['pressure_hpa'],
+            weather_data['visibility_km'],
+            weather_data['wind_level'],
+            weather_data.get('wind_speed_kmh'),
+            weather_data.get('wind_deg'),
+            weather_data.get('weather_code'),
+            weather_data.get('aqi', 0),
+            record_date,
+            record_hour
+        ))
+    
+    @blocking
     def get_historical_weather(self, city, days=7):
         """获取指定城市最近几天的历史天气数据"""
         conn = self.connect()
@@ -255,7 +968,8 @@ class WeatherDatabase:
             cursor = conn.cursor()
             
             cursor.execute('''
-                SELECT id, city, temperature, humidity, weather, wind, wind_dir, pressure, visibility, aqi, record_date, record_hour, timestamp 
+                SELECT city, temperature_c, humidity_pct, pressure_hpa, visibility_km, wind_level, wind_speed_kmh, wind_deg, weather_code, aqi,
+                       timestamp, record_date, record_hour
                 FROM historical_weather 
                 WHERE city = ? AND record_date >= datetime('now', '-' || ? || ' days')
                 ORDER BY record_date DESC, record_hour DESC
@@ -264,29 +978,19 @@ class WeatherDatabase:
             rows = cursor.fetchall()
             result = []
             for row in rows:
-                result.append({
-                    'city': row[1],
-                    'temperature': row[2],
-                    'humidity': row[3],
-                    'weather': row[4],
-                    'wind': row[5],
-                    'wind_dir': row[6],
-                    'pressure': row[7],
-                    'visibility': row[8],
-                    'aqi': row[9],
-                    'record_date': row[10],
-                    'record_hour': row[11],
-                    'timestamp': row[12]
-                })
+                record = self._row_to_weather(row)
+                record['record_date'] = row[-2]
+                record['record_hour'] = row[-1]
+                result.append(record)
             
-            conn.close()
             return result
         except sqlite3.Error as e:
             print(f"获取历史天气数据失败: {e}")
             if conn:
-                conn.close()
+                conn.rollback()
             return []
     
+    @blocking
     def get_historical_weather_by_date(self, city, date):
         """根据指定城市和日期获取历史天气数据"""
         conn = self.connect()
@@ -297,7 +1001,8 @@ class WeatherDatabase:
             cursor = conn.cursor()
             
             cursor.execute('''
-                SELECT id, city, temperature, humidity, weather, wind, wind_dir, pressure, visibility, aqi, record_date, record_hour, timestamp 
+                SELECT city, temperature_c, humidity_pct, pressure_hpa, visibility_km, wind_level, wind_speed_kmh, wind_deg, weather_code, aqi,
+                       timestamp, record_date, record_hour
                 FROM historical_weather 
                 WHERE city = ? AND record_date = ?
                 ORDER BY record_hour ASC
@@ -306,30 +1011,331 @@ class WeatherDatabase:
             rows = cursor.fetchall()
             result = []
             for row in rows:
-                result.append({
-                    'city': row[1],
-                    'temperature': row[2],
-                    'humidity': row[3],
-                    'weather': row[4],
-                    'wind': row[5],
-                    'wind_dir': row[6],
-                    'pressure': row[7],
-                    'visibility': row[8],
-                    'aqi': row[9],
-                    'record_date': row[10],
-                    'record_hour': row[11],
-                    'timestamp': row[12]
-                })
+                record = self._row_to_weather(row)
+                record['record_date'] = row[-2]
+                record['record_hour'] = row[-1]
+                result.append(record)
             
-            conn.close()
             return result
         except sqlite3.Error as e:
             print(f"获取指定日期历史天气失败: {e}")
             if conn:
-                conn.close()
+                conn.rollback()
             return []
     
+    @blocking
+    def get_historical_version(self, cities, start_date, end_date):
+        """历史数据的版本：指定城市在日期范围内的记录数和最后写入时间，用于生成缓存验证器"""
+        conn = self.connect()
+        if not conn:
+            return 0, None
+        
+        try:
+            cursor = conn.cursor()
+            placeholders = ','.join('?' * len(cities))
+            cursor.execute(f'''
+                SELECT COUNT(*), MAX(timestamp)
+                FROM historical_weather
+                WHERE city IN ({placeholders}) AND record_date BETWEEN ? AND ?
+            ''', (*cities, start_date, end_date))
+            count, last_modified = cursor.fetchone()
+            return count, last_modified
+        except sqlite3.Error as e:
+            print(f"获取历史天气版本失败: {e}")
+            if conn:
+                conn.rollback()
+            return 0, None
+    
+    def iter_historical_weather(self, city, start_date, end_date):
+        """逐行读取指定城市在日期范围内的历史天气数据（生成器），按日期和小时排序
+        
+        按 (record_date, record_hour) 分页读取，每页HISTORY_PAGE_ROWS行，内存占用与查询范围无关；
+        gevent模式下每页在数据库线程中读取，游标不跨越生成器的暂停。
+        """
+        after = (start_date, -1)
+        while True:
+            rows = self._read_historical_page(city, after, end_date)
+            for row in rows:
+                record = self._row_to_weather(row)
+                record['record_date'] = row[-2]
+                record['record_hour'] = row[-1]
+                yield record
+            if len(rows) < HISTORY_PAGE_ROWS:
+                return
+            after = (rows[-1][-2], rows[-1][-1])
+    
+    @blocking
+    def _read_historical_page(self, city, after, end_date):
+        """读取after（日期, 小时）之后的一页历史天气数据"""
+        conn = self.connect()
+        if not conn:
+            return []
+        
+        try:
+            # 按 (city, record_date, record_hour) 唯一索引顺序读取，无需额外排序
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT city, temperature_c, humidity_pct, pressure_hpa, visibility_km, wind_level, wind_speed_kmh, wind_deg, weather_code, aqi,
+                       timestamp, record_date, record_hour
+                FROM historical_weather
+                WHERE city = ? AND (record_date, record_hour) > (?, ?) AND record_date <= ?
+                ORDER BY record_date ASC, record_hour ASC
+                LIMIT ?
+            ''', (city, after[0], after[1], end_date, HISTORY_PAGE_ROWS))
+            return cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"读取历史天气数据失败: {e}")
+            return []
+    
+    @blocking
+    def get_history_partitions(self, city=None):
+        """列出历史数据中的 (城市, 月份YYYY-MM) 分区，city不为空时只列出该城市"""
+        conn = self.connect()
+        if not conn:
+            return []
+        
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT DISTINCT city, substr(record_date, 1, 7)
+                FROM historical_weather
+                WHERE ? IS NULL OR city = ?
+                ORDER BY city, 2
+            ''', (city, city))
+            return cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"获取历史数据分区失败: {e}")
+            if conn:
+                conn.rollback()
+            return []
+    
+    @blocking
+    def get_history_rows(self, city, month):
+        """读取指定城市某个月（YYYY-MM）的历史天气原始数据，字段顺序见HISTORY_EXPORT_COLUMNS"""
+        conn = self.connect()
+        if not conn:
+            return []
+        
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT {', '.join(HISTORY_EXPORT_COLUMNS)}
+                FROM historical_weather
+                WHERE city = ? AND record_date BETWEEN ? AND ?
+                ORDER BY record_date, record_hour
+            ''', (city, f'{month}-01', f'{month}-31'))
+            return cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"读取历史天气数据失败: {e}")
+            if conn:
+                conn.rollback()
+            return []
+    
+    def bulk_import_history(self, rows):
+        """在一个事务中批量写入历史天气数据（字段顺序见HISTORY_EXPORT_COLUMNS），返回写入行数
+        
+        逐行触发汇总触发器代价较高，导入期间临时删除触发器，写入后按涉及的城市和日期范围
+        一次性重新生成按日汇总。DDL在SQLite中同样是事务性的，失败时触发器随回滚恢复。
+        """
+        if not rows:
+            return 0
+        
+        # 先写入队列中的数据，避免与导入的数据交错（在调用方线程中等待，不占用数据库线程）
+        self.flush_writes()
+        return self._import_history(rows)
+    
+    @blocking
+    def _import_history(self, rows):
+        conn = self.connect()
+        if not conn:
+            return 0
+        
+        try:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('DROP TRIGGER IF EXISTS historical_daily_rollup')
+            cursor.executemany(f'''
+                INSERT OR REPLACE INTO historical_weather ({', '.join(HISTORY_EXPORT_COLUMNS)})
+                VALUES ({', '.join('?' * len(HISTORY_EXPORT_COLUMNS))})
+            ''', rows)
+            
+            # 按城市重新生成导入日期范围内的按日汇总
+            date_ranges = {}
+            for row in rows:
+                start_date, end_date = date_ranges.get(row[0], (row[1], row[1]))
+                date_ranges[row[0]] = (min(start_date, row[1]), max(end_date, row[1]))
+            for city, (start_date, end_date) in date_ranges.items():
+                self._rebuild_daily_rollups(cursor, 'city = ? AND record_date BETWEEN ? AND ?',
+                                            (city, start_date, end_date))
+            
+            cursor.execute(HISTORICAL_DAILY_TRIGGER_SQL)
+            conn.commit()
+            return len(rows)
+        except sqlite3.Error as e:
+            print(f"批量导入历史天气失败: {e}")
+            if conn:
+                conn.rollback()
+            return 0
+    
+    @blocking
+    def get_historical_summary(self, city, start_date, end_date, granularity='day'):
+        """从按日汇总表读取指定日期范围的统计数据，granularity为day或week
+        
+        返回按列组织的数据 {'period': [...], 'samples': [...], 'temperature_min': [...], ...}，
+        按周汇总时period为周一的日期，平均值按每天的数据条数加权。
+        """
+        columns = ['period', 'samples'] + list(ROLLUP_METRIC_COLUMNS) + ['weather_code']
+        empty = {column: [] for column in columns}
+        
+        conn = self.connect()
+        if not conn:
+            return empty
+        
+        try:
+            cursor = conn.cursor()
+            
+            if granularity == 'week':
+                # 周一作为每周的开始：先跳到本周日（当天为周日时不变），再回退6天
+                cursor.execute('''
+                    WITH days AS (
+                        SELECT date(record_date, 'weekday 0', '-6 days') AS period, *
+                        FROM historical_daily
+                        WHERE city = ? AND record_date BETWEEN ? AND ?
+                    )
+                    SELECT period, SUM(samples),
+                        MIN(temperature_min), MAX(temperature_max), ROUND(SUM(temperature_avg * samples) / SUM(samples), 1),
+                        MIN(humidity_min), MAX(humidity_max), ROUND(SUM(humidity_avg * samples) / SUM(samples), 1),
+                        MIN(aqi_min), MAX(aqi_max), ROUND(SUM(aqi_avg * samples) / SUM(samples), 1),
+                        (SELECT weather_code FROM days AS d
+                         WHERE d.period = days.period AND d.weather_code IS NOT NULL
+                         GROUP BY weather_code ORDER BY SUM(samples) DESC, weather_code LIMIT 1)
+                    FROM days
+                    GROUP BY period
+                    ORDER BY period
+                ''', (city, start_date, end_date))
+            else:
+                cursor.execute(f'''
+                    SELECT record_date, samples, {', '.join(ROLLUP_METRIC_COLUMNS)}, weather_code
+                    FROM historical_daily
+                    WHERE city = ? AND record_date BETWEEN ? AND ?
+                    ORDER BY record_date
+                ''', (city, start_date, end_date))
+            
+            rows = cursor.fetchall()
+            if not rows:
+                return empty
+            
+            # 按列转置，不为每一行构造字典
+            return {column: list(values) for column, values in zip(columns, zip(*rows))}
+        except sqlite3.Error as e:
+            print(f"获取历史天气汇总失败: {e}")
+            if conn:
+                conn.rollback()
+            return empty
+    
+    def _delete_in_chunks(self, cursor, table, where, params):
+        """分批删除满足条件的行，每批单独提交，返回删除的总行数"""
+        conn = cursor.connection
+        deleted = 0
+        while True:
+            cursor.execute(f'''
+                DELETE FROM {table} WHERE rowid IN (
+                    SELECT rowid FROM {table} WHERE {where} LIMIT ?
+                )
+            ''', tuple(params) + (PRUNE_CHUNK_SIZE,))
+            conn.commit()
+            deleted += cursor.rowcount
+            if cursor.rowcount < PRUNE_CHUNK_SIZE:
+                return deleted
+    
+    @blocking
+    def prune_expired(self):
+        """删除各缓存表中已过期的数据，并增量归还空闲页，返回每个表删除的行数"""
+        conn = self.connect()
+        if not conn:
+            return {}
+        
+        try:
+            cursor = conn.cursor()
+            deleted = {
+                'weather_cache': self._delete_in_chunks(
+                    cursor, 'weather_cache', "timestamp < datetime('now', ?)",
+                    (f'-{CACHE_HARD_TTL_SECONDS} seconds',)
+                ),
+                'forecast_cache': self._delete_in_chunks(
+                    cursor, 'forecast_cache', "timestamp < datetime('now', ?)",
+                    (f'-{FORECAST_TTL_SECONDS} seconds',)
+                ),
+                'geocode_cache': self._delete_in_chunks(
+                    cursor, 'geocode_cache',
+                    "timestamp < datetime('now', CASE WHEN found THEN ? ELSE ? END)",
+                    (f'-{GEOCODE_TTL_SECONDS} seconds', f'-{GEOCODE_NEGATIVE_TTL_SECONDS} seconds')
+                ),
+                'fetch_leases': self._delete_in_chunks(
+                    cursor, 'fetch_leases', 'expires_at < ?', (time.time(),)
+                )
+            }
+            
+            # 热度已衰减到很低的城市，初始化的热门城市（updated_at为空）保留
+            deleted['popular_cities'] = self._delete_in_chunks(
+                cursor, 'popular_cities', 'updated_at IS NOT NULL AND score * decay(? - updated_at, ?) < ?',
+                (time.time(), POPULARITY_HALF_LIFE_SECONDS, POPULARITY_MIN_SCORE)
+            )
+            
+            # 按日汇总数据量很小，不随逐小时历史数据一起删除
+            if HISTORY_RETENTION_DAYS > 0:
+                deleted['historical_weather'] = self._delete_in_chunks(
+                    cursor, 'historical_weather', "record_date < date('now', ?)",
+                    (f'-{HISTORY_RETENTION_DAYS} days',)
+                )
+            
+            # 归还空闲页，缩小数据库文件；并更新查询优化器的统计信息
+            cursor.execute('PRAGMA incremental_vacuum')
+            cursor.fetchall()
+            cursor.execute('PRAGMA optimize')
+            conn.commit()
+            return deleted
+        except sqlite3.Error as e:
+            print(f"清理过期数据失败: {e}")
+            if conn:
+                conn.rollback()
+            return {}
+    
+    @blocking
+    def get_table_stats(self):
+        """获取各表的行数和数据库文件大小"""
+        conn = self.connect()
+        if not conn:
+            return {}
+        
+        try:
+            cursor = conn.cursor()
+            tables = {}
+            for table in ['weather_cache', 'historical_weather', 'historical_daily', 'forecast_cache', 'geocode_cache', 'popular_cities', 'fetch_leases']:
+                cursor.execute(f'SELECT COUNT(*) FROM {table}')
+                tables[table] = {'rows': cursor.fetchone()[0]}
+            
+            cursor.execute('PRAGMA page_size')
+            page_size = cursor.fetchone()[0]
+            cursor.execute('PRAGMA page_count')
+            page_count = cursor.fetchone()[0]
+            cursor.execute('PRAGMA freelist_count')
+            freelist_count = cursor.fetchone()[0]
+            
+            return {
+                'tables': tables,
+                'file_bytes': page_size * page_count,
+                'free_bytes': page_size * freelist_count
+            }
+        except sqlite3.Error as e:
+            print(f"获取数据库统计信息失败: {e}")
+            if conn:
+                conn.rollback()
+            return {}
+    
     def close(self):
-        """关闭数据库连接"""
-        # 由于我们在每个方法中都创建并关闭自己的连接，所以这个方法不再需要做任何事情
-        pass
+        """关闭当前线程的数据库连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
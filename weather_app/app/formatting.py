@@ -0,0 +1,185 @@
+import bisect
+import math
+import re
+import numpy as np
+
+# 天气代码（WMO）对应的天气状况
+WEATHER_CONDITIONS = {
+    0: '晴朗',
+    1: '晴间多云',
+    2: '多云',
+    3: '阴',
+    45: '雾',
+    48: '霾',
+    51: '小雨',
+    53: '中雨',
+    55: '大雨',
+    56: '冻雨',
+    57: '冻雨',
+    61: '小雨',
+    63: '中雨',
+    65: '大雨',
+    66: '冻雨',
+    67: '冻雨',
+    71: '小雪',
+    73: '中雪',
+    75: '大雪',
+    77: '雪粒',
+    80: '阵雨',
+    81: '阵雨',
+    82: '强阵雨',
+    85: '阵雪',
+    86: '阵雪'
+}
+
+# 风向角度对应的方位
+WIND_DIRECTIONS = {
+    0: '北',
+    45: '东北',
+    90: '东',
+    135: '东南',
+    180: '南',
+    225: '西南',
+    270: '西',
+    315: '西北',
+    360: '北'
+}
+
+# 风力等级的风速上限（米/秒）
+WIND_LEVELS = [(0.3, 0), (1.6, 1), (3.4, 2), (5.5, 3), (8.0, 4),
+               (10.8, 5), (13.9, 6), (17.2, 7), (20.8, 8), (24.5, 9),
+               (28.5, 10), (32.7, 11), (float('inf'), 12)]
+
+# 批量转换使用的查找表：风力等级的风速边界（米/秒）、按45度划分的8个方位、按天气代码索引的天气状况
+WIND_LEVEL_BOUNDS = np.array([speed for speed, _ in WIND_LEVELS[:-1]])
+_WIND_LEVEL_BOUNDS_LIST = WIND_LEVEL_BOUNDS.tolist()
+WIND_DIRECTION_LABELS = np.array([WIND_DIRECTIONS[deg] for deg in range(0, 360, 45)], dtype=object)
+WEATHER_TEXT_TABLE = np.array([WEATHER_CONDITIONS.get(code, '未知') for code in range(max(WEATHER_CONDITIONS) + 1)],
+                              dtype=object)
+
+# 序列化时原样保留的字段
+PASSTHROUGH_FIELDS = ('timestamp', 'stale', 'record_date', 'record_hour')
+
+_NUMBER_PATTERN = re.compile(r'-?\d+(?:\.\d+)?')
+
+
+def weather_text(weather_code):
+    """天气代码转换为天气状况文字"""
+    if weather_code is None:
+        return '未知'
+    return WEATHER_CONDITIONS.get(weather_code, '未知')
+
+
+def _direction_index(wind_deg):
+    # 与最接近的45度方位对应，恰好位于两个方位中间时取角度较小的方位
+    return math.ceil((wind_deg - 22.5) / 45) % 8
+
+
+def wind_direction_text(wind_deg):
+    """风向角度转换为最接近的方位文字"""
+    if wind_deg is None:
+        return None
+    return WIND_DIRECTION_LABELS[_direction_index(wind_deg)]
+
+
+def wind_speed_to_level(wind_speed_kmh):
+    """风速（千米/小时）转换为风力等级"""
+    return bisect.bisect_right(_WIND_LEVEL_BOUNDS_LIST, wind_speed_kmh / 3.6)
+
+
+def _as_float_array(values):
+    """转换为浮点数组，列表中的None转换为NaN"""
+    if isinstance(values, np.ndarray):
+        return values.astype(np.float64, copy=False)
+    return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+
+def wind_speed_to_levels(wind_speeds_kmh):
+    """批量将风速（千米/小时）转换为风力等级数组，缺失值返回-1"""
+    speeds = _as_float_array(wind_speeds_kmh)
+    levels = np.searchsorted(WIND_LEVEL_BOUNDS, speeds / 3.6, side='right')
+    return np.where(np.isnan(speeds), -1, levels)
+
+
+def wind_direction_texts(wind_degs):
+    """批量将风向角度转换为方位文字数组，缺失值返回None"""
+    degs = _as_float_array(wind_degs)
+    missing = np.isnan(degs)
+    indexes = (np.ceil((np.where(missing, 0, degs) - 22.5) / 45).astype(np.int64)) % 8
+    texts = WIND_DIRECTION_LABELS[indexes]
+    texts[missing] = None
+    return texts
+
+
+def weather_texts(weather_codes):
+    """批量将天气代码转换为天气状况文字数组，缺失或未知的代码返回'未知'"""
+    codes = _as_float_array(weather_codes)
+    known = (codes >= 0) & (codes < len(WEATHER_TEXT_TABLE))
+    indexes = np.where(known, codes, 0).astype(np.int64)
+    return np.where(known, WEATHER_TEXT_TABLE[indexes], '未知')
+
+
+def _with_unit(value, unit):
+    return None if value is None else f'{value}{unit}'
+
+
+def _format_record(record, weather, wind_dir):
+    result = {
+        'city': record['city'],
+        'temperature': _with_unit(record.get('temperature_c'), '°C'),
+        'humidity': _with_unit(record.get('humidity_pct'), '%'),
+        'weather': weather,
+        'wind': _with_unit(record.get('wind_level'), '级'),
+        'wind_dir': wind_dir,
+        'pressure': _with_unit(record.get('pressure_hpa'), 'hPa'),
+        'visibility': _with_unit(record.get('visibility_km'), 'km'),
+        'aqi': record.get('aqi')
+    }
+    for field in PASSTHROUGH_FIELDS:
+        if field in record:
+            result[field] = record[field]
+    return result
+
+
+def format_weather(record):
+    """将数值形式的天气记录转换为带单位的展示格式（接口输出格式）"""
+    return _format_record(record, weather_text(record.get('weather_code')), wind_direction_text(record.get('wind_deg')))
+
+
+def format_weather_batch(records):
+    """批量转换天气记录为展示格式，天气状况和风向按列一次转换"""
+    records = list(records)
+    if not records:
+        return []
+    weathers = weather_texts([record.get('weather_code') for record in records]).tolist()
+    wind_dirs = wind_direction_texts([record.get('wind_deg') for record in records]).tolist()
+    return [_format_record(record, weather, wind_dir) for record, weather, wind_dir in zip(records, weathers, wind_dirs)]
+
+
+def parse_number(text):
+    """从旧版本保存的展示字符串（如'23.4°C'、'3级'）中解析数值，无法解析时返回None"""
+    if text is None:
+        return None
+    if isinstance(text, (int, float)):
+        return text
+    match = _NUMBER_PATTERN.search(str(text))
+    if not match:
+        return None
+    value = match.group()
+    return float(value) if '.' in value else int(value)
+
+
+def parse_weather_text(text):
+    """天气状况文字转换回天气代码，多个代码对应同一文字时取最小的代码"""
+    for code, condition in WEATHER_CONDITIONS.items():
+        if condition == text:
+            return code
+    return None
+
+
+def parse_wind_direction(text):
+    """方位文字转换回风向角度"""
+    for deg, direction in WIND_DIRECTIONS.items():
+        if direction == text:
+            return deg
+    return None
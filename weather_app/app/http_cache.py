@@ -0,0 +1,67 @@
+import datetime
+import hashlib
+from flask import Response, jsonify, make_response, request
+
+
+class ValidatorResponse(Response):
+    """304响应保留Last-Modified：Werkzeug生成响应头时会删除304中的实体头（包括Last-Modified），
+    客户端和代理需要用它更新已缓存内容的验证器"""
+    
+    def get_wsgi_headers(self, environ):
+        headers = super().get_wsgi_headers(environ)
+        if self.status_code == 304 and 'Last-Modified' in self.headers and 'Last-Modified' not in headers:
+            headers['Last-Modified'] = self.headers['Last-Modified']
+        return headers
+
+
+def parse_timestamp(timestamp):
+    """数据库中的UTC时间戳（YYYY-MM-DD HH:MM:SS）转换为带时区的datetime，无法解析时返回None"""
+    try:
+        return datetime.datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S').replace(tzinfo=datetime.timezone.utc)
+    except (TypeError, ValueError):
+        return None
+
+
+def remaining_ttl(timestamp, ttl):
+    """按写入时间计算缓存条目的剩余有效期（秒），已过期或时间未知时返回0"""
+    saved_at = parse_timestamp(timestamp)
+    if saved_at is None:
+        return 0
+    age = (datetime.datetime.now(datetime.timezone.utc) - saved_at).total_seconds()
+    return max(0, int(ttl - age))
+
+
+def make_etag(validator):
+    """由缓存条目的时间戳、内容摘要等版本信息计算ETag"""
+    return hashlib.blake2b(repr(validator).encode('utf-8'), digest_size=12).hexdigest()
+
+
+def is_not_modified(etag, last_modified=None):
+    """客户端缓存仍然有效时返回True，If-None-Match优先于If-Modified-Since"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def conditional_response(build, validator, last_modified=None, max_age=0):
+    """带缓存验证器和Cache-Control的响应
+    
+    validator为能标识内容版本的值（如缓存条目的时间戳），客户端缓存仍然有效时直接返回304，
+    不调用build；否则调用build生成响应内容，返回dict/list时转换为JSON。
+    max_age一般为缓存条目的剩余有效期（秒）。
+    """
+    etag = make_etag(validator)
+    if is_not_modified(etag, last_modified):
+        response = make_response('', 304)
+    else:
+        body = build()
+        response = body if isinstance(body, Response) else jsonify(body)
+    
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = max(0, int(max_age))
+    return response
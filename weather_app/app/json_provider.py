@@ -0,0 +1,32 @@
+import json
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """接口JSON序列化：紧凑输出，中文不转义为\\uXXXX；安装了orjson时使用orjson序列化
+    
+    orjson无法处理的类型（如date）交给Flask默认的转换函数，键仍按字母顺序排序，
+    输出与默认实现一致（只是不转义中文和去掉空白）。
+    """
+    
+    ensure_ascii = False
+    compact = True
+    
+    def dumps(self, obj, **kwargs):
+        if orjson is None or set(kwargs) - {'separators', 'indent'}:
+            kwargs.setdefault('default', self.default)
+            kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+            kwargs.setdefault('sort_keys', self.sort_keys)
+            return json.dumps(obj, **kwargs)
+        
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
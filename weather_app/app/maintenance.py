@@ -0,0 +1,67 @@
+import os
+import threading
+import time
+import uuid
+
+
+class MaintenanceScheduler:
+    """定期清理任务：删除过期缓存并归还空闲页
+    
+    每个工作进程都会启动调度线程，但通过数据库租约保证每个周期只有一个进程执行清理。
+    """
+    
+    LEASE_KEY = 'maintenance:prune'
+    
+    def __init__(self, db, interval=3600):
+        self.db = db
+        self.interval = interval
+        self.owner = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        
+        # 最近一次清理的时间和结果
+        self.last_run = None
+        self.last_result = None
+    
+    def start(self):
+        """启动调度线程，gunicorn fork出的工作进程中会重新启动"""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name='weather-maintenance', daemon=True)
+            self._thread.start()
+    
+    def run_once(self):
+        """获取到租约时执行一次清理，返回清理结果；其他进程本周期已执行时返回None"""
+        # 租约略短于清理周期，保证下一个周期可以重新获取
+        if not self.db.acquire_fetch_lease(self.LEASE_KEY, self.owner, self.interval * 0.9):
+            return None
+        
+        # 先写入队列中的数据，再清理
+        self.db.flush_writes()
+        result = self.db.prune_expired()
+        self.last_run = time.strftime('%Y-%m-%d %H:%M:%S')
+        self.last_result = result
+        print(f"清理过期数据完成: {result}")
+        return result
+    
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"定期清理失败: {e}")
+            time.sleep(self.interval)
+    
+    def stats(self):
+        """返回最近一次清理的信息"""
+        return {
+            'interval': self.interval,
+            'last_run': self.last_run,
+            'last_result': self.last_result
+        }
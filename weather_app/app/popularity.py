@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+from collections import Counter
+
+
+class PopularityTracker:
+    """城市热度统计：请求计数先累加在进程内，定期合并写入数据库的衰减热度分数
+    
+    每次写入后从数据库读取前ranking_size个城市的排名缓存在内存中，热门城市列表、
+    后台预取和缓存固定都使用这份排名，读取时不访问数据库。
+    """
+    
+    def __init__(self, db, flush_interval=60, ranking_size=100, on_update=None):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.ranking_size = ranking_size
+        # 排名更新后的回调，参数为最新的排名列表
+        self.on_update = on_update
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self._ranking = None
+        # 排名最近一次更新的时间（Unix时间戳）
+        self.ranking_updated_at = None
+        self._thread = None
+        self._pid = None
+        
+        # 已写入数据库的请求次数和最近一次写入时间
+        self.flushed_hits = 0
+        self.last_flush = None
+    
+    def record(self, city):
+        """记录一次城市请求，只更新进程内计数"""
+        with self._lock:
+            self._counts[city] += 1
+    
+    def flush(self):
+        """将进程内计数写入数据库，并刷新排名缓存"""
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        
+        if counts:
+            self.db.record_city_hits(counts)
+            self.db.flush_writes()
+            self.flushed_hits += sum(counts.values())
+        self.last_flush = time.strftime('%Y-%m-%d %H:%M:%S')
+        return self.refresh_ranking()
+    
+    def refresh_ranking(self):
+        """从数据库读取最新排名"""
+        ranking = self.db.get_popular_cities(limit=self.ranking_size)
+        self._ranking = ranking
+        self.ranking_updated_at = time.time()
+        if self.on_update:
+            self.on_update(ranking)
+        return ranking
+    
+    def top(self, k=None):
+        """返回排名前k的城市，首次调用或排名超过flush_interval未更新时从数据库读取
+        
+        未启动定期写入线程的进程（如单独运行的预取进程）也能读到其他进程写入的最新排名。
+        """
+        ranking = self._ranking
+        if ranking is None or time.time() - self.ranking_updated_at >= self.flush_interval:
+            ranking = self.refresh_ranking()
+        return list(ranking[:k])
+    
+    def start(self):
+        """启动定期写入线程，gunicorn fork出的工作进程中会重新启动"""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            # fork前父进程中的计数不属于当前工作进程
+            self._counts = Counter()
+            self._thread = threading.Thread(target=self._run, name='weather-popularity', daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"写入城市热度失败: {e}")
+    
+    def stats(self):
+        """返回热度统计信息"""
+        with self._lock:
+            pending = sum(self._counts.values())
+        return {
+            'pending_hits': pending,
+            'flushed_hits': self.flushed_hits,
+            'flush_interval': self.flush_interval,
+            'last_flush': self.last_flush,
+            'top': self.top(10)
+        }
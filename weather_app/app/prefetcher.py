@@ -0,0 +1,101 @@
+import os
+import random
+import threading
+import time
+import uuid
+
+
+class PopularCityPrefetcher:
+    """热门城市预取：在缓存过期前主动刷新热门城市的当前天气和逐日预报
+    
+    每个工作进程都会启动调度线程，但通过数据库租约保证每个周期只有一个进程请求上游API。
+    当前天气每个周期刷新一次（周期短于1小时，历史天气每小时都有记录），逐日预报按
+    forecast_interval刷新；城市分批通过多坐标请求获取，批次之间随机等待，避免集中请求上游。
+    """
+    
+    WEATHER_LEASE_KEY = 'prefetch:weather'
+    FORECAST_LEASE_KEY = 'prefetch:forecast'
+    
+    def __init__(self, db, get_cities, refresh_weather, refresh_forecast,
+                 interval=1800, forecast_interval=5400, batch_size=20, jitter=5.0):
+        self.db = db
+        self.get_cities = get_cities
+        self.refresh_weather = refresh_weather
+        self.refresh_forecast = refresh_forecast
+        self.interval = interval
+        self.forecast_interval = forecast_interval
+        self.batch_size = batch_size
+        self.jitter = jitter
+        self.owner = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        
+        # 最近一次预取的时间和结果
+        self.last_run = None
+        self.last_result = None
+    
+    def start(self):
+        """启动调度线程，gunicorn fork出的工作进程中会重新启动"""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            self._thread = threading.Thread(target=self.run_forever, name='weather-prefetch', daemon=True)
+            self._thread.start()
+    
+    def _refresh_in_batches(self, cities, refresh):
+        """分批刷新城市，返回成功刷新的城市数量"""
+        refreshed = 0
+        for start in range(0, len(cities), self.batch_size):
+            if start:
+                # 批次之间随机等待，分散上游请求
+                time.sleep(random.uniform(0, self.jitter))
+            try:
+                refreshed += refresh(cities[start:start + self.batch_size])
+            except Exception as e:
+                print(f"预取热门城市天气失败: {e}")
+        return refreshed
+    
+    def run_once(self):
+        """获取到租约时执行一次预取，返回预取结果；其他进程本周期已执行时返回None"""
+        # 租约略短于刷新周期，保证下一个周期可以重新获取
+        if not self.db.acquire_fetch_lease(self.WEATHER_LEASE_KEY, self.owner, self.interval * 0.9):
+            return None
+        
+        cities = list(dict.fromkeys(self.get_cities()))
+        result = {
+            'cities': len(cities),
+            'weather': self._refresh_in_batches(cities, self.refresh_weather),
+            'forecast': None
+        }
+        
+        # 逐日预报更新频率较低，由单独的租约控制刷新间隔
+        if self.db.acquire_fetch_lease(self.FORECAST_LEASE_KEY, self.owner, self.forecast_interval * 0.9):
+            result['forecast'] = self._refresh_in_batches(cities, self.refresh_forecast)
+        
+        self.last_run = time.strftime('%Y-%m-%d %H:%M:%S')
+        self.last_result = result
+        return result
+    
+    def run_forever(self):
+        """按周期执行预取，也可以在单独的进程中直接调用"""
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"预取热门城市天气失败: {e}")
+            # 周期也加入随机偏移，避免多个实例同时醒来
+            time.sleep(self.interval + random.uniform(0, self.jitter))
+    
+    def stats(self):
+        """返回最近一次预取的信息"""
+        return {
+            'interval': self.interval,
+            'forecast_interval': self.forecast_interval,
+            'last_run': self.last_run,
+            'last_result': self.last_result
+        }
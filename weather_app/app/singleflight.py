@@ -0,0 +1,58 @@
+import threading
+
+
+class _Call:
+    """一次正在进行中的调用"""
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """进程内请求合并：同一个key同一时间只执行一次，其他调用等待并共享结果"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        
+        # 被合并（未实际执行）的调用次数
+        self.deduplicated = 0
+    
+    def do(self, key, fn):
+        """执行fn并返回结果；若该key已有调用在执行，则等待其完成并返回相同结果"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+            else:
+                self.deduplicated += 1
+                leader = False
+        
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+    
+    def stats(self):
+        """返回请求合并统计信息"""
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'deduplicated': self.deduplicated
+            }
@@ -0,0 +1,74 @@
+import math
+import threading
+
+# 地球平均半径（千米）
+EARTH_RADIUS_KM = 6371.0
+
+# 每纬度对应的距离（千米）
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """两个经纬度之间的球面距离（千米）"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class NearestCityIndex:
+    """最近城市查询：按经纬度网格划分城市，查询时只计算半径范围内网格中城市的距离
+    
+    运行中可以继续添加城市（如地理编码得到的城市），网格中的城市列表写入时整体替换，查询不需要加锁。
+    """
+    
+    def __init__(self, cell_degrees=1.0):
+        self.cell_degrees = cell_degrees
+        self._lon_cells = round(360 / cell_degrees)
+        # 网格 -> ((城市名称, 纬度, 经度), ...)
+        self._cells = {}
+        self._names = set()
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._names)
+    
+    def _cell(self, latitude, longitude):
+        return (math.floor(latitude / self.cell_degrees),
+                math.floor((longitude + 180) / self.cell_degrees) % self._lon_cells)
+    
+    def add(self, name, latitude, longitude):
+        """添加城市，同名城市只保留第一次添加的坐标"""
+        if name in self._names:
+            return
+        with self._lock:
+            if name in self._names:
+                return
+            cell = self._cell(latitude, longitude)
+            self._cells[cell] = self._cells.get(cell, ()) + ((name, latitude, longitude),)
+            self._names.add(name)
+    
+    def nearest(self, latitude, longitude, max_km):
+        """查询max_km范围内最近的城市，返回 (城市名称, 纬度, 经度, 距离千米)，范围内没有城市时返回None"""
+        cell_lat, cell_lon = self._cell(latitude, longitude)
+        
+        # 纬度方向每个网格的高度固定；经度方向网格宽度随纬度缩小，按范围内最高纬度计算
+        lat_span = math.ceil(max_km / (KM_PER_DEGREE * self.cell_degrees))
+        edge_lat = min(89.0, abs(latitude) + max_km / KM_PER_DEGREE)
+        lon_span = math.ceil(max_km / (KM_PER_DEGREE * self.cell_degrees * math.cos(math.radians(edge_lat))))
+        lon_span = min(lon_span, self._lon_cells // 2)
+        
+        best = None
+        best_km = max_km
+        for d_lat in range(-lat_span, lat_span + 1):
+            for d_lon in range(-lon_span, lon_span + 1):
+                cities = self._cells.get((cell_lat + d_lat, (cell_lon + d_lon) % self._lon_cells))
+                if not cities:
+                    continue
+                for name, city_lat, city_lon in cities:
+                    distance = haversine_km(latitude, longitude, city_lat, city_lon)
+                    if distance <= best_km:
+                        best = (name, city_lat, city_lon, distance)
+                        best_km = distance
+        return best
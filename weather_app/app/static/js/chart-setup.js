@@ -0,0 +1,30 @@
+// Chart.js全局配置（Chart.js在本文件之前从本地同步加载），确保所有图表使用一致的字体
+if (typeof Chart !== 'undefined') {
+    // 简化字体配置，使用更基础的字体族
+    Chart.defaults.font.family = 'Arial, sans-serif';
+    Chart.defaults.font.size = 12;
+    Chart.defaults.font.weight = 'normal';
+
+    // 确保图表元素有足够的空间
+    Chart.defaults.plugins.legend.labels.padding = 15;
+    Chart.defaults.layout.padding = {
+        top: 20,
+        right: 30,
+        left: 30,
+        bottom: 80
+    };
+
+    console.log('Chart.js全局配置已设置');
+} else {
+    console.error('Chart.js未加载，请运行 python vendor_assets.py 下载本地依赖');
+}
+
+// 添加Canvas文本渲染优化
+window.addEventListener('beforeprint', function() {
+    if (typeof Chart !== 'undefined' && window.temperatureChart) {
+        window.temperatureChart.resize();
+    }
+    if (typeof Chart !== 'undefined' && window.weeklyForecastChart) {
+        window.weeklyForecastChart.resize();
+    }
+});
@@ -0,0 +1,1558 @@
+// 全局变量和函数定义
+
+// 热门城市列表（与后端城市坐标映射表保持一致）
+const popularCities = ['北京', '上海', '广州', '深圳', '杭州', '成都', '武汉', '西安', '重庆', '南京', '天津', '昆明', '呼和浩特', '拉萨', '乌鲁木齐', '银川', '西宁', '南宁', '济南', '石家庄', '哈尔滨', '长春', '沈阳', '郑州', '合肥', '福州', '南昌', '长沙', '贵阳', '海口', '兰州'];
+
+// 定义全局的图表初始化函数
+function initChartAfterChartJsLoaded() {
+    console.log('检查Chart.js加载状态:', typeof Chart !== 'undefined');
+    
+    // 优化：只要Chart对象可用，就尝试初始化图表
+    if (typeof Chart !== 'undefined') {
+        // Chart.js已加载完成，检查DOM是否已完全加载
+        if (document.readyState === 'loading') {
+            // DOM还在加载中，添加DOMContentLoaded事件监听器
+            document.addEventListener('DOMContentLoaded', function() {
+                console.log('DOM和Chart.js都已加载完成，开始初始化图表');
+                loadPopularCitiesWeather();
+            });
+        } else {
+            // DOM已加载完成，直接初始化图表
+            console.log('Chart.js和DOM都已可用，开始初始化图表');
+            loadPopularCitiesWeather();
+        }
+    } else {
+        // 等待Chart.js加载完成，最多等待15秒
+        let waitTime = 0;
+        const interval = setInterval(() => {
+            waitTime += 500;
+            console.log(`等待Chart.js加载中...(${waitTime/1000}秒)`);
+            
+            if (typeof Chart !== 'undefined') {
+                clearInterval(interval);
+                console.log('Chart.js已加载完成，开始初始化图表');
+                loadPopularCitiesWeather();
+            } else if (waitTime >= 15000) {
+                clearInterval(interval);
+                console.error('Chart.js加载超时，使用静态表格');
+                // 直接调用显示热门城市天气函数，它会处理Chart.js不可用的情况
+                loadPopularCitiesWeather();
+            }
+        }, 500);
+    }
+}
+
+// 页面加载完成后初始化
+document.addEventListener('DOMContentLoaded', function() {
+    // 绑定查询按钮点击事件
+    document.getElementById('searchBtn').addEventListener('click', searchWeather);
+    
+    // 绑定回车键事件
+    document.getElementById('cityInput').addEventListener('keypress', function(e) {
+        if (e.key === 'Enter') {
+            searchWeather();
+        }
+    });
+    
+    // 城市输入自动完成功能
+    const cityInput = document.getElementById('cityInput');
+    const citySuggestions = document.getElementById('citySuggestions');
+    
+    // 所有支持的城市列表
+    const allCities = [
+        '北京', '上海', '广州', '深圳', '杭州', '成都', '武汉', '西安', '重庆', '南京',
+        '天津', '苏州', '郑州', '长沙', '沈阳', '青岛', '济南', '大连', '宁波', '厦门',
+        '福州', '哈尔滨', '长春', '石家庄', '太原', '合肥', '南昌', '南宁', '贵阳', '昆明',
+        '拉萨', '兰州', '西宁', '银川', '乌鲁木齐', '呼和浩特', '拉萨', '澳门', '香港', '台湾'
+    ];
+    
+    // 输入事件监听
+    cityInput.addEventListener('input', function() {
+        const input = this.value.trim().toLowerCase();
+        citySuggestions.innerHTML = '';
+        
+        if (input.length > 0) {
+            // 过滤匹配的城市
+            const matches = allCities.filter(city => 
+                city.toLowerCase().includes(input)
+            );
+            
+            // 显示建议
+            if (matches.length > 0) {
+                citySuggestions.style.display = 'block';
+                matches.forEach(city => {
+                    const item = document.createElement('button');
+                    item.type = 'button';
+                    item.className = 'list-group-item list-group-item-action';
+                    item.textContent = city;
+                    item.addEventListener('click', function() {
+                        selectCity(city);
+                        citySuggestions.style.display = 'none';
+                    });
+                    citySuggestions.appendChild(item);
+                });
+            } else {
+                citySuggestions.style.display = 'none';
+            }
+        } else {
+            citySuggestions.style.display = 'none';
+        }
+    });
+    
+    // 点击页面其他地方关闭建议
+    document.addEventListener('click', function(e) {
+        if (!cityInput.contains(e.target) && !citySuggestions.contains(e.target)) {
+            citySuggestions.style.display = 'none';
+        }
+    });
+
+    // 绑定历史天气查询按钮
+    document.getElementById('historicalSearch').addEventListener('click', searchHistoricalWeather);
+    
+    // 设置默认日期为昨天
+    const yesterday = new Date();
+    yesterday.setDate(yesterday.getDate() - 1);
+    const yesterdayStr = yesterday.toISOString().split('T')[0];
+    document.getElementById('historicalDate').value = yesterdayStr;
+    
+    // 页面加载完成后立即检查Chart.js状态并初始化图表
+    initChartAfterChartJsLoaded();
+    
+    // 添加刷新图表按钮事件监听器
+    document.getElementById('refreshChartBtn').addEventListener('click', function() {
+        console.log('刷新图表数据');
+        loadPopularCitiesWeather();
+    });
+    
+    // 显示热门城市列表的函数
+    function showPopularCitiesList() {
+        console.log('显示热门城市列表');
+        const chartContainer = document.getElementById('chartContainer');
+        if (chartContainer) {
+            chartContainer.innerHTML = `
+                <div class="d-flex justify-content-between align-items-center mb-4">
+                    <h3 class="text-center mb-0">热门城市温度实时对比</h3>
+                    <button id="refreshChartBtn" class="btn btn-primary btn-sm">
+                        <i class="fas fa-sync-alt me-1"></i> 刷新数据
+                    </button>
+                </div>
+                <div class="alert alert-warning text-center">
+                    <i class="fas fa-exclamation-triangle me-2"></i>
+                    图表加载失败，正在使用静态数据展示
+                </div>
+                <div class="text-center">
+                    <p>热门城市：${popularCities.slice(0, 10).join('、')}</p>
+                    <button class="btn btn-primary" onclick="loadPopularCitiesWeather()">
+                        <i class="fas fa-refresh me-2"></i>重试加载图表
+                    </button>
+                </div>
+            `;
+            // 重新绑定刷新按钮事件
+            document.getElementById('refreshChartBtn').addEventListener('click', function() {
+                console.log('刷新图表数据');
+                loadPopularCitiesWeather();
+            });
+        }
+    }
+});
+
+// 选择热门城市函数
+function selectCity(cityName) {
+    document.getElementById('cityInput').value = cityName;
+    searchWeather();
+}
+
+// 查询天气函数
+function searchWeather() {
+    const city = document.getElementById('cityInput').value.trim();
+    
+    if (!city) {
+        showError('请输入城市名称');
+        return;
+    }
+
+    // 隐藏之前的结果和错误
+    hideError();
+    hideWeatherResult();
+    
+    // 隐藏城市建议
+    document.getElementById('citySuggestions').style.display = 'none';
+
+    // 显示加载状态
+    showLoading();
+
+    // 定义重试配置
+    const maxRetries = 2;
+    let retryCount = 0;
+    
+    // 发送API请求（添加超时处理和重试机制）
+    function sendRequest() {
+        const controller = new AbortController();
+        const timeoutId = setTimeout(() => controller.abort(), 10000); // 10秒超时
+
+        return fetch(`/weather?city=${encodeURIComponent(city)}`, {
+            signal: controller.signal
+        })
+            .then(response => {
+                clearTimeout(timeoutId);
+                if (!response.ok) {
+                    return response.json().then(err => {
+                        throw new Error(err.error || `HTTP错误: ${response.status}`);
+                    });
+                }
+                return response.json();
+            })
+            .catch(error => {
+                clearTimeout(timeoutId);
+                
+                // 处理超时错误，进行重试
+                if ((error.name === 'AbortError' || error.name === 'TimeoutError') && retryCount < maxRetries) {
+                    retryCount++;
+                    console.log(`第${retryCount}次重试获取天气信息...`);
+                    // 短暂延迟后重试
+                    return new Promise(resolve => setTimeout(resolve, 500 * retryCount))
+                        .then(sendRequest);
+                }
+                
+                // 其他错误或重试次数用尽，抛出异常
+                throw error;
+            });
+    }
+    
+    // 执行请求
+    sendRequest()
+        .then(data => {
+            if (data.error) {
+                showError(data.error);
+            } else {
+                displayWeatherResult(data);
+                subscribeWeatherUpdates(data.city);
+            }
+        })
+        .catch(error => {
+            if (error.name === 'AbortError') {
+                showError('网络请求超时，请稍后重试');
+            } else if (!navigator.onLine) {
+                showError('当前网络不可用，请检查网络连接后重试');
+            } else {
+                showError(`查询失败: ${error.message}`);
+            }
+            console.error('Error:', error);
+        })
+        .finally(() => {
+            // 恢复按钮状态
+            hideLoading();
+        });
+}
+
+// 显示错误信息
+function showError(message) {
+    const errorAlert = document.getElementById('errorAlert');
+    const errorMessage = document.getElementById('errorMessage');
+    
+    errorMessage.textContent = message;
+    errorAlert.style.display = 'block';
+    
+    // 根据错误类型设置不同的样式
+    if (message.includes('网络') || message.includes('超时')) {
+        errorAlert.className = 'alert alert-warning';
+    } else {
+        errorAlert.className = 'alert alert-danger';
+    }
+    
+    // 添加自动隐藏功能
+    setTimeout(() => {
+        hideError();
+    }, 5000);
+}
+
+// 隐藏错误信息
+function hideError() {
+    const errorAlert = document.getElementById('errorAlert');
+    errorAlert.style.display = 'none';
+}
+
+// 显示网络状态提示
+function checkNetworkStatus() {
+    if (!navigator.onLine) {
+        showError('当前网络不可用，请检查网络连接后重试');
+        return false;
+    }
+    return true;
+}
+
+// 显示加载状态
+function showLoading() {
+    document.getElementById('searchBtn').disabled = true;
+    document.getElementById('searchBtn').innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> 查询中...';
+}
+
+// 隐藏加载状态
+function hideLoading() {
+    document.getElementById('searchBtn').disabled = false;
+    document.getElementById('searchBtn').textContent = '查询天气';
+}
+
+// 显示天气结果
+function displayWeatherResult(data) {
+    document.getElementById('resultCity').textContent = data.city;
+    document.getElementById('temperature').textContent = data.temperature;
+    document.getElementById('weatherCondition').textContent = data.weather;
+    document.getElementById('windInfo').textContent = `风力：${data.wind} ${data.wind_dir}`;
+    document.getElementById('humidity').textContent = `湿度：${data.humidity}`;
+    document.getElementById('pressure').textContent = `气压：${data.pressure}`;
+    document.getElementById('visibility').textContent = `能见度：${data.visibility}`;
+    document.getElementById('aqi').textContent = `空气质量指数：${data.aqi}`;
+
+    // 根据天气状况设置图标
+    setWeatherIcon(data.weather);
+
+    // 检查温度并显示预警
+    checkTemperatureAlert(data.temperature);
+
+    // 显示结果
+    document.getElementById('weatherResult').style.display = 'block';
+}
+
+// 订阅当前显示城市的天气更新：服务端缓存刷新时通过Server-Sent Events推送，页面无需定时轮询
+// 服务端未启用推送（非gevent工作模式）时首页的data-stream为off，不建立连接
+let weatherStream = null;
+
+function subscribeWeatherUpdates(city) {
+    if (document.body.dataset.stream !== 'on' || typeof EventSource === 'undefined') {
+        return;
+    }
+    if (weatherStream && weatherStream.city === city) {
+        return;
+    }
+    if (weatherStream) {
+        weatherStream.source.close();
+    }
+
+    // 连接断开后浏览器会自动重连，并通过Last-Event-ID只接收之后的更新
+    const source = new EventSource(`/stream?cities=${encodeURIComponent(city)}`);
+    source.addEventListener('weather', function(event) {
+        const data = JSON.parse(event.data);
+        if (data.city === city) {
+            displayWeatherResult(data);
+        }
+    });
+    weatherStream = { city: city, source: source };
+}
+
+// 检查温度并显示预警
+function checkTemperatureAlert(temperatureStr) {
+    const temp = parseFloat(temperatureStr.replace('°C', ''));
+    const alertDiv = document.getElementById('temperatureAlert');
+    const alertTitle = document.getElementById('alertTitle');
+    const alertMessage = document.getElementById('alertMessage');
+    
+    // 默认隐藏预警
+    alertDiv.style.display = 'none';
+    
+    if (temp >= 35) {
+        // 高温预警
+        alertDiv.className = 'alert alert-danger';
+        alertTitle.textContent = '高温预警：';
+        alertMessage.innerHTML = `气温很高（${temp}°C），请注意防暑降温，避免长时间户外活动，防止中暑！<br><br>💧 健康建议：<br>- 多喝水，保持身体水分<br>- 避免正午时分外出<br>- 穿着宽松透气的衣物<br>- 注意饮食清淡`;
+        alertDiv.style.display = 'block';
+    } else if (temp >= 25) {
+        // 较热预警
+        alertDiv.className = 'alert alert-warning';
+        alertTitle.textContent = '高温提示：';
+        alertMessage.innerHTML = `气温较高（${temp}°C），请注意防暑，多喝水，避免暴晒<br><br>🌤️ 健康建议：<br>- 出门涂抹防晒霜<br>- 佩戴遮阳帽和太阳镜<br>- 适当补充盐分`;
+        alertDiv.style.display = 'block';
+    } else if (temp >= 15) {
+        // 舒适温度
+        alertDiv.className = 'alert alert-success';
+        alertTitle.textContent = '温馨提示：';
+        alertMessage.innerHTML = `气温适宜（${temp}°C），适合进行户外活动<br><br>😊 健康建议：<br>- 多进行户外运动<br>- 保持良好的作息时间<br>- 注意饮食均衡`;
+        alertDiv.style.display = 'block';
+    } else if (temp >= 10) {
+        // 较凉预警
+        alertDiv.className = 'alert alert-info';
+        alertTitle.textContent = '温馨提示：';
+        alertMessage.innerHTML = `气温较低（${temp}°C），请注意增减衣物，预防感冒<br><br>🧥 健康建议：<br>- 早晚适当增添衣物<br>- 注意室内通风<br>- 多喝温水`;
+        alertDiv.style.display = 'block';
+    } else if (temp >= 0) {
+        // 低温警告
+        alertDiv.className = 'alert alert-warning';
+        alertTitle.textContent = '低温警告：';
+        alertMessage.innerHTML = `气温很低（${temp}°C），请注意保暖，建议穿着厚外套和毛衣<br><br>❄️ 健康建议：<br>- 穿着保暖的衣物（帽子、围巾、手套）<br>- 注意脚部保暖<br>- 适当增加热量摄入`;
+        alertDiv.style.display = 'block';
+    } else if (temp >= -5) {
+        // 严寒警告
+        alertDiv.className = 'alert alert-danger';
+        alertTitle.textContent = '严寒警告：';
+        alertMessage.innerHTML = `气温极低（${temp}°C），请做好防寒保暖措施，建议穿着羽绒服<br><br>⚠️ 健康建议：<br>- 减少户外活动时间<br>- 注意保护手脚和面部<br>- 避免长时间暴露在低温环境`;
+        alertDiv.style.display = 'block';
+    } else {
+        // 极端严寒
+        alertDiv.className = 'alert alert-danger';
+        alertTitle.textContent = '极端严寒警告：';
+        alertMessage.innerHTML = `气温极低（${temp}°C），请避免长时间户外活动，注意防冻伤！<br><br>🚨 健康建议：<br>- 尽量待在室内<br>- 使用取暖设备时注意安全<br>- 如必须外出，做好全面防寒措施<br>- 注意预防冻疮和低体温症`;
+        alertDiv.style.display = 'block';
+    }
+}
+
+// 隐藏天气结果
+function hideWeatherResult() {
+    document.getElementById('weatherResult').style.display = 'none';
+}
+
+// 设置天气图标
+function setWeatherIcon(weatherCondition) {
+    const iconElement = document.getElementById('weatherIcon');
+    let icon = '☀️'; // 默认晴天
+    let iconClass = 'sunny';
+
+    if (weatherCondition.includes('晴')) {
+        icon = '☀️';
+        iconClass = 'sunny';
+    } else if (weatherCondition.includes('云') || weatherCondition.includes('阴')) {
+        icon = '☁️';
+        iconClass = 'cloudy';
+    } else if (weatherCondition.includes('雨')) {
+        icon = '🌧️';
+        iconClass = 'rainy';
+    } else if (weatherCondition.includes('雪')) {
+        icon = '❄️';
+        iconClass = 'snowy';
+    } else if (weatherCondition.includes('雾')) {
+        icon = '🌫️';
+        iconClass = 'cloudy';
+    } else if (weatherCondition.includes('雷')) {
+        icon = '⛈️';
+        iconClass = 'thunderstorm';
+    }
+
+    // 移除所有天气图标类，添加当前天气图标类
+    iconElement.className = 'weather-icon';
+    iconElement.classList.add(iconClass);
+    iconElement.textContent = icon;
+}
+
+// 加载热门城市天气数据并绘制图表
+function loadPopularCitiesWeather(callback) {
+    console.log('开始加载热门城市天气数据');
+    // 只选择前10个热门城市，避免过多API请求
+    const selectedCities = popularCities.slice(0, 10);
+    const temperatures = [];
+    let completedRequests = 0;
+    let failedRequests = 0;
+
+    // 初始化温度数组
+    selectedCities.forEach(() => {
+        temperatures.push(null);
+    });
+
+    console.log('选择的热门城市列表:', selectedCities);
+    console.log('Chart.js是否可用:', typeof Chart !== 'undefined');
+    console.log('图表容器是否存在:', document.getElementById('chartContainer'));
+    console.log('Canvas元素是否存在:', document.getElementById('temperatureChart'));
+
+    // 批量请求热门城市天气数据：一次请求获取所有城市（添加超时和重试机制）
+    const batchRequest = (retryCount = 0) => {
+        // 使用兼容的超时机制
+        const controller = new AbortController();
+        const timeoutId = setTimeout(() => controller.abort(), 15000);
+        const citiesParam = selectedCities.map(city => encodeURIComponent(city)).join(',');
+        
+        fetch(`/weather/batch?cities=${citiesParam}`, {
+            signal: controller.signal
+        })
+        .then(response => {
+            clearTimeout(timeoutId);
+            return response.json();
+        })
+        .then(data => {
+            if (data.error || !Array.isArray(data.results)) {
+                throw new Error(data.error || '批量数据格式错误');
+            }
+            
+            data.results.forEach((item, index) => {
+                const city = selectedCities[index];
+                completedRequests++;
+                if (item && !item.error && item.temperature) {
+                    // 提取温度数值
+                    const tempStr = item.temperature;
+                    const temp = parseFloat(tempStr.replace('°C', ''));
+                    temperatures[index] = temp;
+                    console.log(`获取${city}天气成功，温度：${temp}°C`);
+                } else {
+                    temperatures[index] = 0;
+                    failedRequests++;
+                    console.error(`获取${city}天气失败:`, (item && item.error) || '无温度数据');
+                }
+            });
+            
+            // 检查是否所有请求都完成
+            checkAllRequestsComplete();
+        })
+        .catch(error => {
+            clearTimeout(timeoutId);
+            console.error('批量获取热门城市天气失败:', error);
+            
+            // 重试机制（最多重试2次）
+            if (retryCount < 2) {
+                console.log(`重试批量获取热门城市天气，第${retryCount + 1}次`);
+                setTimeout(() => batchRequest(retryCount + 1), 1000);
+                return;
+            }
+            
+            // 重试失败后将所有城市标记为失败
+            completedRequests = selectedCities.length;
+            failedRequests = selectedCities.length;
+            selectedCities.forEach((city, index) => {
+                temperatures[index] = 0;
+            });
+            checkAllRequestsComplete();
+        });
+    };
+
+    // 检查所有请求是否完成
+    function checkAllRequestsComplete() {
+        if (completedRequests === selectedCities.length) {
+            console.log('所有请求完成，成功:', completedRequests - failedRequests, '失败:', failedRequests);
+            console.log('最终温度数据:', temperatures);
+            
+            // 确保数据有效后再绘制图表
+            const hasValidData = temperatures.some(temp => temp !== null && temp !== 0);
+            if (!hasValidData) {
+                console.error('没有有效的温度数据，使用默认测试数据');
+                // 使用模拟数据进行测试
+                const mockTemperatures = [15, 18, 22, 25, 19, 21, 16, 23, 20, 17];
+                drawTemperatureChart(selectedCities, mockTemperatures);
+            } else {
+                drawTemperatureChart(selectedCities, temperatures);
+            }
+            
+            document.getElementById('chartContainer').style.display = 'block';
+            // 调用回调函数
+            if (callback && typeof callback === 'function') {
+                callback();
+            }
+        }
+    }
+
+    // 一次批量请求获取所有热门城市的天气
+    batchRequest();
+}
+
+// 绘制温度对比图表（优化版本，确保能正常显示）
+function drawTemperatureChart(cities, temperatures) {
+    console.log('开始绘制温度对比图表');
+    console.log('Chart对象是否存在:', typeof Chart !== 'undefined');
+    console.log('城市数据:', cities);
+    console.log('温度数据:', temperatures);
+    
+    // 确保图表容器和canvas元素存在
+    const chartContainer = document.getElementById('chartContainer');
+    let canvas = document.getElementById('temperatureChart');
+    
+    if (!chartContainer || !canvas) {
+        console.error('图表容器或canvas元素不存在');
+        showStaticTemperatureTable(cities, temperatures);
+        return;
+    }
+    
+    // 强制显示图表容器并设置尺寸
+    chartContainer.style.display = 'block';
+    chartContainer.style.height = '500px';
+    
+    // 先清除之前的表格（如果存在）
+    const existingTable = chartContainer.querySelector('#temperatureTable');
+    if (existingTable) {
+        existingTable.remove();
+    }
+    
+    // 确保canvas可见，由Chart.js控制尺寸
+    canvas.style.display = 'block';
+    canvas.style.width = '100%';
+    canvas.style.height = '450px'; // 明确设置高度以确保可见
+    
+    // 移除手动设置的像素尺寸，让Chart.js完全控制
+    canvas.removeAttribute('width');
+    canvas.removeAttribute('height');
+    
+    console.log('Canvas样式设置:', canvas.style.width, 'x', canvas.style.height);
+    console.log('Canvas属性:', canvas.width, 'x', canvas.height);
+    console.log('Canvas类名:', canvas.className);
+    console.log('Canvas父容器:', canvas.parentNode);
+    console.log('Canvas父容器样式:', canvas.parentNode.style);
+    
+    // 检查Chart.js是否已正确加载
+    if (typeof Chart === 'undefined') {
+        console.error('Chart.js未正确加载');
+        // Chart.js随页面从本地加载，不可用时直接显示静态表格
+        showStaticTemperatureTable(cities, temperatures);
+        return;
+    }
+    
+    // 销毁已存在的图表实例
+    if (window.temperatureChart && typeof window.temperatureChart.destroy === 'function') {
+        try {
+            window.temperatureChart.destroy();
+            window.temperatureChart = null;
+            console.log('已销毁旧图表实例');
+        } catch (error) {
+            console.error('销毁图表失败:', error);
+            // 如果销毁失败，尝试重新创建canvas
+            const newCanvas = document.createElement('canvas');
+            newCanvas.id = 'temperatureChart';
+            newCanvas.className = 'chart-canvas'; // 添加正确的CSS类
+            canvas.parentNode.replaceChild(newCanvas, canvas);
+            // 重新获取canvas引用
+            const updatedCanvas = document.getElementById('temperatureChart');
+            // 使用新的canvas引用继续
+            if (updatedCanvas) {
+                console.log('已重新创建canvas元素');
+                // 设置样式
+                updatedCanvas.style.display = 'block';
+                updatedCanvas.style.width = '100%';
+                updatedCanvas.style.height = 'auto';
+                // 移除手动设置的像素尺寸，让Chart.js完全控制
+                updatedCanvas.removeAttribute('width');
+                updatedCanvas.removeAttribute('height');
+                // 重新设置canvas引用
+                canvas = updatedCanvas;
+            }
+        }
+    } else {
+        window.temperatureChart = null;
+        console.log('无旧图表实例需要销毁');
+    }
+    
+    try {
+        // 处理数据：确保所有温度都是数字类型
+        const processedTemperatures = temperatures.map((temp, index) => {
+            if (temp === null || temp === undefined) {
+                console.warn(`城市 ${cities[index]} 温度数据为null或undefined`);
+                return 0;
+            }
+            
+            // 如果温度是字符串，尝试解析
+            if (typeof temp === 'string') {
+                // 移除温度符号和空格
+                const cleanTemp = temp.replace(/[°C℃ ]/g, '');
+                const parsedTemp = parseFloat(cleanTemp);
+                if (isNaN(parsedTemp)) {
+                    console.warn(`城市 ${cities[index]} 温度数据格式错误: ${temp}`);
+                    return 0;
+                }
+                return parsedTemp;
+            }
+            
+            // 如果温度是数字，直接使用
+            if (typeof temp === 'number') {
+                if (isNaN(temp)) {
+                    console.warn(`城市 ${cities[index]} 温度数据为NaN`);
+                    return 0;
+                }
+                return temp;
+            }
+            
+            // 其他情况返回0
+            console.warn(`城市 ${cities[index]} 温度数据类型错误: ${typeof temp}`);
+            return 0;
+        });
+        
+        // 计算温度范围
+        const validTemperatures = processedTemperatures.filter(temp => temp !== 0);
+        const minTemp = validTemperatures.length > 0 ? Math.floor(Math.min(...validTemperatures) - 5) : 0;
+        const maxTemp = validTemperatures.length > 0 ? Math.ceil(Math.max(...validTemperatures) + 5) : 30;
+        
+        console.log('处理后的温度数据:', processedTemperatures);
+        console.log('温度范围:', minTemp, '到', maxTemp);
+        
+        // 使用更稳定的图表配置
+        const ctx = canvas.getContext('2d');
+        
+        // 确保Canvas上下文有效
+        if (!ctx) {
+            console.error('无法获取Canvas上下文');
+            showStaticTemperatureTable(cities, temperatures);
+            return;
+        }
+        
+        // 重置Canvas
+        ctx.clearRect(0, 0, canvas.width, canvas.height);
+        
+        // 创建新的图表实例（使用最稳定的配置）
+        console.log('开始创建Chart实例');
+        console.log('处理后的温度数据:', processedTemperatures);
+        console.log('温度范围:', minTemp, '到', maxTemp);
+        
+        // 使用简化的图表配置，避免可能的兼容性问题
+        // 使用统一颜色配置柱状图
+        const unifiedColor = 'rgba(54, 162, 235, 0.8)'; // 蓝色作为统一背景色
+        const unifiedBorderColor = 'rgba(54, 162, 235, 1)'; // 蓝色作为统一边框色
+        
+        // 为所有柱状图使用统一颜色
+        const colors = Array(cities.length).fill(unifiedColor);
+        const borderColors = Array(cities.length).fill(unifiedBorderColor);
+        
+        window.temperatureChart = new Chart(ctx, {
+            type: 'bar',
+            data: {
+                labels: cities,
+                datasets: [{
+                    label: '当前温度 (°C)',
+                    data: processedTemperatures,
+                    backgroundColor: colors.slice(0, cities.length),
+                    borderColor: borderColors.slice(0, cities.length),
+                    borderWidth: 2,
+                    borderRadius: 6,
+                    barThickness: 35,
+                    maxBarThickness: 50
+                }]
+            },
+            options: {
+                responsive: true,
+                maintainAspectRatio: false,
+                layout: {
+                    padding: {
+                        top: 10,
+                        right: 20,
+                        left: 20,
+                        bottom: 80  // 增加底部内边距，确保x轴文本可见
+                    }
+                },
+                scales: {
+                    y: {
+                        beginAtZero: false,
+                        min: minTemp,
+                        max: maxTemp,
+                        title: {
+                            display: true,
+                            text: '温度 (°C)',
+                            color: '#000',
+                            font: {
+                            size: 14,
+                            weight: 'bold',
+                            family: 'Inter, -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif'
+                        }
+                        },
+                        ticks: {
+                            callback: function(value) {
+                                return value + '°C';
+                            },
+                            color: '#000',
+                            font: {
+                            size: 12,
+                            weight: 'bold',
+                            family: 'Inter, -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif'
+                        },
+                            stepSize: 5  // 控制Y轴刻度间隔
+                        },
+                        grid: {
+                            color: 'rgba(0, 0, 0, 0.15)',
+                            lineWidth: 1,
+                            drawBorder: true
+                        }
+                    },
+                    x: {
+                        title: {
+                            display: true,
+                            text: '城市',
+                            color: '#000000',
+                            font: {
+                            weight: 'bold',
+                            size: 14,
+                            family: 'Inter, -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif'
+                        }
+                        },
+                        ticks: {
+                            maxRotation: 45,
+                            minRotation: 45,
+                            color: '#000000',
+                            font: {
+                            weight: 'bold',
+                            size: 12,  // 增加字体大小，确保可见
+                            family: 'Inter, -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif'
+                        },
+                            autoSkip: false,  // 不自动跳过标签
+                            maxTicksLimit: 10  // 最多显示10个标签
+                        },
+                        grid: {
+                            display: false
+                        }
+                    }
+                },
+                plugins: {
+                    title: {
+                        display: true,
+                        text: '热门城市温度实时对比',
+                        color: '#000',
+                        font: {
+                            size: 18,
+                            weight: 'bold',
+                            family: 'Inter, -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif'
+                        },
+                        padding: {
+                            top: 10,
+                            bottom: 20
+                        }
+                    },
+                    legend: {
+                        display: true,
+                        position: 'top',
+                        labels: {
+                            color: '#000',
+                            font: {
+                            size: 13,
+                            weight: 'bold',
+                            family: 'Inter, -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif'
+                        }
+                        }
+                    },
+                    tooltip: {
+                        enabled: true,
+                        backgroundColor: 'rgba(0, 0, 0, 0.85)',
+                        titleColor: '#fff',
+                        bodyColor: '#fff',
+                        borderColor: '#555',
+                        borderWidth: 1,
+                        padding: 12,
+                        cornerRadius: 8,
+                        titleFont: {
+                            size: 14,
+                            weight: 'bold'
+                        },
+                        bodyFont: {
+                            size: 13
+                        }
+                    }
+                },
+                animation: {
+                    duration: 300 // 较短的动画以提高用户体验
+                }
+            }
+        });
+        
+        console.log('图表实例创建成功');
+        console.log('Chart实例:', window.temperatureChart);
+        console.log('Chart实例状态:', window.temperatureChart.canvas.style.display);
+        
+        // 强制重绘图表
+        window.temperatureChart.update('none'); // 使用'none'动画模式
+        console.log('图表更新完成');
+        
+        // 只添加一次窗口大小变化事件监听
+        if (!window.resizeListenerAdded) {
+            window.addEventListener('resize', function() {
+                if (window.temperatureChart) {
+                    console.log('窗口大小变化，调整图表尺寸');
+                    window.temperatureChart.resize();
+                }
+            });
+            window.resizeListenerAdded = true;
+        }
+        
+    } catch (error) {
+        console.error('绘制图表失败:', error);
+        console.error('错误详情:', error.stack);
+        // 如果图表绘制失败，显示静态表格
+        showStaticTemperatureTable(cities, temperatures);
+    }
+}
+
+// 显示静态温度对比表格（作为Chart.js的备选方案）
+function showStaticTemperatureTable(cities, temperatures) {
+    console.log('显示静态温度对比表格');
+    const chartContainer = document.getElementById('chartContainer');
+    const canvas = document.getElementById('temperatureChart');
+    
+    if (canvas) {
+        // 隐藏canvas元素
+        canvas.style.display = 'none';
+    }
+    
+    // 创建表格元素
+    let tableHTML = `
+        <table class="table table-striped">
+            <thead class="table-primary">
+                <tr>
+                    <th scope="col">城市</th>
+                    <th scope="col">当前温度 (°C)</th>
+                </tr>
+            </thead>
+            <tbody>
+    `;
+    
+    // 添加表格内容
+    cities.forEach((city, index) => {
+        const temp = temperatures[index] !== null ? temperatures[index] : '无数据';
+        tableHTML += `
+            <tr>
+                <td>${city}</td>
+                <td>${temp}</td>
+            </tr>
+        `;
+    });
+    
+    tableHTML += `
+            </tbody>
+        </table>
+    `;
+    
+    // 添加表格到图表容器
+    const tableDiv = document.createElement('div');
+    tableDiv.innerHTML = tableHTML;
+    tableDiv.id = 'temperatureTable';
+    
+    // 检查是否已存在表格元素，如果存在则替换
+    const existingTable = chartContainer.querySelector('#temperatureTable');
+    if (existingTable) {
+        existingTable.remove();
+    }
+    
+    chartContainer.appendChild(tableDiv);
+}
+
+// 查询历史天气函数
+function searchHistoricalWeather() {
+    const city = document.getElementById('historicalCity').value.trim();
+    const date = document.getElementById('historicalDate').value;
+    
+    if (!city) {
+        showError('请输入城市名称');
+        return;
+    }
+    
+    if (!date) {
+        showError('请选择查询日期');
+        return;
+    }
+    
+    // 检查网络状态
+    if (!checkNetworkStatus()) {
+        return;
+    }
+    
+    // 显示加载状态
+    const searchBtn = document.getElementById('historicalSearch');
+    const originalText = searchBtn.innerHTML;
+    searchBtn.disabled = true;
+    searchBtn.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> 查询中...';
+    
+    // 隐藏之前的结果
+    const resultDiv = document.getElementById('historicalResult');
+    resultDiv.style.display = 'none';
+    
+    // 定义重试配置
+    const maxRetries = 2;
+    let retryCount = 0;
+    
+    // 发送API请求（添加超时处理和重试机制）
+    function sendRequest() {
+        const controller = new AbortController();
+        const timeoutId = setTimeout(() => controller.abort(), 10000); // 10秒超时
+        
+        return fetch(`/historical?city=${encodeURIComponent(city)}&date=${encodeURIComponent(date)}`, {
+            signal: controller.signal
+        })
+            .then(response => {
+                clearTimeout(timeoutId);
+                if (!response.ok) {
+                    return response.json().then(err => {
+                        throw new Error(err.error || `HTTP错误: ${response.status}`);
+                    });
+                }
+                return response.json();
+            })
+            .catch(error => {
+                clearTimeout(timeoutId);
+                
+                // 处理超时错误，进行重试
+                if ((error.name === 'AbortError' || error.name === 'TimeoutError') && retryCount < maxRetries) {
+                    retryCount++;
+                    console.log(`第${retryCount}次重试获取历史天气...`);
+                    // 短暂延迟后重试
+                    return new Promise(resolve => setTimeout(resolve, 500 * retryCount))
+                        .then(sendRequest);
+                }
+                
+                // 其他错误或重试次数用尽，抛出异常
+                throw error;
+            });
+    }
+    
+    // 执行请求
+    sendRequest()
+        .then(data => {
+            if (data.error) {
+                showError(data.error);
+            } else {
+                displayHistoricalResult(data);
+            }
+        })
+        .catch(error => {
+            if (error.name === 'AbortError') {
+                showError('网络请求超时，请稍后重试');
+            } else if (!navigator.onLine) {
+                showError('当前网络不可用，请检查网络连接后重试');
+            } else {
+                showError(`查询历史天气失败: ${error.message}`);
+            }
+            console.error('Error:', error);
+        })
+        .finally(() => {
+            // 恢复按钮状态
+            searchBtn.disabled = false;
+            searchBtn.innerHTML = originalText;
+        });
+}
+
+// 显示历史天气结果
+function displayHistoricalResult(data) {
+    const resultDiv = document.getElementById('historicalResult');
+    const cityResult = document.getElementById('historicalCityResult');
+    const dataTable = document.getElementById('historicalDataTable');
+    
+    // 设置结果标题（添加空值检查）
+    const cityName = data.city || '未知城市';
+    const date = data.date || '未知日期';
+    cityResult.textContent = `${cityName} - ${date} 历史天气`;
+    
+    // 创建表格（修正数据结构：后端返回的是data.data而不是data.hourly）
+    const hourlyData = data.data || [];
+    const tableRows = hourlyData.map(item => `
+        <tr>
+            <td>${item.record_hour !== undefined ? item.record_hour + ':00' : 'N/A'}</td>
+            <td>${item.temperature || 'N/A'}</td>
+            <td>${item.weather || 'N/A'}</td>
+            <td>${item.wind || 'N/A'}</td>
+            <td>${item.humidity || 'N/A'}</td>
+        </tr>
+    `).join('');
+    
+    // 如果没有小时数据，显示提示信息
+    const tableHTML = hourlyData.length > 0 ? `
+        <table class="table table-striped">
+            <thead class="table-primary">
+                <tr>
+                    <th scope="col">时间</th>
+                    <th scope="col">温度</th>
+                    <th scope="col">天气</th>
+                    <th scope="col">风力</th>
+                    <th scope="col">湿度</th>
+                </tr>
+            </thead>
+            <tbody>
+                ${tableRows}
+            </tbody>
+        </table>
+    ` : `
+        <div class="alert alert-info text-center">
+            <i class="fas fa-info-circle me-2"></i>
+            该日期没有历史天气数据
+        </div>
+    `;
+    
+    // 设置表格内容
+    dataTable.innerHTML = tableHTML;
+    
+    // 显示结果
+    resultDiv.style.display = 'block';
+}
+
+// 获取未来一周天气预报
+function getWeeklyForecast() {
+    const city = document.getElementById('forecastCityInput').value.trim();
+    if (!city) {
+        showError('请输入城市名称');
+        return;
+    }
+
+    // 检查网络状态
+    if (!checkNetworkStatus()) {
+        return;
+    }
+
+    // 显示加载状态
+    const searchBtn = document.getElementById('forecastSearchBtn');
+    const originalText = searchBtn.innerHTML;
+    searchBtn.disabled = true;
+    searchBtn.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> 查询中...';
+
+    // 定义重试配置
+    const maxRetries = 2;
+    let retryCount = 0;
+    
+    // 发送API请求（添加超时处理和重试机制）
+    function sendRequest() {
+        const controller = new AbortController();
+        const timeoutId = setTimeout(() => controller.abort(), 10000); // 10秒超时
+
+        return fetch(`/weekly-forecast?city=${encodeURIComponent(city)}`, {
+            signal: controller.signal
+        })
+            .then(response => {
+                clearTimeout(timeoutId);
+                if (!response.ok) {
+                    return response.json().then(err => {
+                        throw new Error(err.error || `HTTP错误: ${response.status}`);
+                    });
+                }
+                return response.json();
+            })
+            .catch(error => {
+                clearTimeout(timeoutId);
+                
+                // 处理超时错误，进行重试
+                if ((error.name === 'AbortError' || error.name === 'TimeoutError') && retryCount < maxRetries) {
+                    retryCount++;
+                    console.log(`第${retryCount}次重试获取未来天气预报...`);
+                    // 短暂延迟后重试
+                    return new Promise(resolve => setTimeout(resolve, 500 * retryCount))
+                        .then(sendRequest);
+                }
+                
+                // 其他错误或重试次数用尽，抛出异常
+                throw error;
+            });
+    }
+    
+    // 执行请求
+    sendRequest()
+        .then(data => {
+            if (data.error) {
+                showError(data.error);
+            } else {
+                drawWeeklyForecastChart(data);
+                displayWeeklyForecastInfo(data);
+            }
+        })
+        .catch(error => {
+            if (error.name === 'AbortError') {
+                showError('网络请求超时，请稍后重试');
+            } else if (!navigator.onLine) {
+                showError('当前网络不可用，请检查网络连接后重试');
+            } else {
+                showError(`查询未来一周天气预报失败: ${error.message}`);
+            }
+            console.error('Error:', error);
+        })
+        .finally(() => {
+            // 恢复按钮状态
+            searchBtn.disabled = false;
+            searchBtn.innerHTML = originalText;
+        });
+}
+
+// 绘制未来一周天气预报折线图
+function drawWeeklyForecastChart(data) {
+    console.log('=== 开始绘制未来一周天气预报图表 ===');
+    console.log('Chart对象是否存在:', typeof Chart !== 'undefined');
+    console.log('Chart版本:', typeof Chart !== 'undefined' ? Chart.version : '未加载');
+    console.log('预报数据:', data);
+    
+    // 确保图表容器和canvas元素存在
+    const canvas = document.getElementById('weeklyForecastChart');
+    let ctx = canvas ? canvas.getContext('2d') : null;
+    
+    if (!canvas) {
+        console.error('canvas元素不存在');
+        showStaticWeeklyForecastTable(data);
+        return;
+    }
+    
+    // 如果无法获取ctx，立即回退到静态表格
+    if (!ctx) {
+        console.error('无法获取Canvas上下文');
+        showStaticWeeklyForecastTable(data);
+        return;
+    }
+    
+    // 确保canvas可见，由Chart.js控制尺寸
+    canvas.style.display = 'block';
+    canvas.style.width = '100%';
+    canvas.style.height = '450px'; // 明确设置高度以确保可见
+    
+    // 移除手动设置的像素尺寸，让Chart.js完全控制
+    canvas.removeAttribute('width');
+    canvas.removeAttribute('height');
+    
+    console.log('Canvas样式设置:', canvas.style.width, 'x', canvas.style.height);
+    console.log('Canvas属性:', canvas.width, 'x', canvas.height);
+    console.log('Canvas类名:', canvas.className);
+    console.log('Canvas父容器:', canvas.parentNode);
+    console.log('Canvas父容器样式:', canvas.parentNode.style);
+    
+    // 检查Chart.js是否已正确加载
+    if (typeof Chart === 'undefined') {
+        console.error('Chart.js未正确加载');
+        // Chart.js随页面从本地加载，不可用时直接显示静态表格
+        showStaticWeeklyForecastTable(data);
+        return;
+    }
+    
+    // 销毁已存在的图表实例
+    if (window.weeklyForecastChart && typeof window.weeklyForecastChart.destroy === 'function') {
+        try {
+            window.weeklyForecastChart.destroy();
+            window.weeklyForecastChart = null;
+            console.log('已销毁旧图表实例');
+        } catch (error) {
+            console.error('销毁图表失败:', error);
+            // 如果销毁失败，尝试重新创建canvas
+            const newCanvas = document.createElement('canvas');
+            newCanvas.id = 'weeklyForecastChart';
+            newCanvas.className = 'chart-canvas'; // 添加正确的CSS类
+            canvas.parentNode.replaceChild(newCanvas, canvas);
+            // 重新获取canvas引用
+            const updatedCanvas = document.getElementById('weeklyForecastChart');
+            // 设置样式
+            updatedCanvas.style.display = 'block';
+            updatedCanvas.style.width = '100%';
+            updatedCanvas.style.height = 'auto';
+            // 移除手动设置的像素尺寸，让Chart.js完全控制
+            updatedCanvas.removeAttribute('width');
+            updatedCanvas.removeAttribute('height');
+            // 重新获取上下文
+            ctx = updatedCanvas.getContext('2d');
+            console.log('已重新创建canvas和上下文');
+            console.log('新Canvas样式:', updatedCanvas.style.width, 'x', updatedCanvas.style.height);
+            console.log('新Canvas类名:', updatedCanvas.className);
+        }
+    } else {
+        window.weeklyForecastChart = null;
+        console.log('无旧图表实例需要销毁');
+    }
+
+    try {
+        const forecast = data.forecast;
+        const dates = forecast.map(item => {
+            const date = new Date(item.date);
+            return `${date.getMonth() + 1}/${date.getDate()}`;
+        });
+        
+        // 处理温度数据，确保都是数字类型
+        const maxTemps = forecast.map(item => {
+            if (item.max_temp === null || item.max_temp === undefined) {
+                return 0;
+            }
+            if (typeof item.max_temp === 'string') {
+                const cleanTemp = item.max_temp.replace(/[°C℃ ]/g, '');
+                const parsedTemp = parseFloat(cleanTemp);
+                return isNaN(parsedTemp) ? 0 : parsedTemp;
+            }
+            return typeof item.max_temp === 'number' ? item.max_temp : 0;
+        });
+        
+        const minTemps = forecast.map(item => {
+            if (item.min_temp === null || item.min_temp === undefined) {
+                return 0;
+            }
+            if (typeof item.min_temp === 'string') {
+                const cleanTemp = item.min_temp.replace(/[°C℃ ]/g, '');
+                const parsedTemp = parseFloat(cleanTemp);
+                return isNaN(parsedTemp) ? 0 : parsedTemp;
+            }
+            return typeof item.min_temp === 'number' ? item.min_temp : 0;
+        });
+
+        console.log('处理后的最高温度:', maxTemps);
+        console.log('处理后的最低温度:', minTemps);
+        
+        // 确保Canvas上下文有效
+        if (!ctx) {
+            console.error('无法获取Canvas上下文');
+            showStaticWeeklyForecastTable(data);
+            return;
+        }
+
+        window.weeklyForecastChart = new Chart(ctx, {
+            type: 'line',
+            data: {
+                labels: dates,
+                datasets: [
+                    {
+                        label: '最高温度 (°C)',
+                        data: maxTemps,
+                        borderColor: 'rgba(220, 53, 69, 1)', // 更鲜艳的红色
+                        backgroundColor: 'rgba(220, 53, 69, 0.3)',
+                        fill: true,
+                        tension: 0.4,
+                        borderWidth: 3,
+                        pointRadius: 6,
+                        pointBackgroundColor: 'rgba(220, 53, 69, 1)',
+                        pointBorderColor: '#fff',
+                        pointBorderWidth: 2,
+                        pointHoverRadius: 8
+                    },
+                    {
+                        label: '最低温度 (°C)',
+                        data: minTemps,
+                        borderColor: 'rgba(13, 110, 253, 1)', // 更鲜艳的蓝色
+                        backgroundColor: 'rgba(13, 110, 253, 0.3)',
+                        fill: true,
+                        tension: 0.4,
+                        borderWidth: 3,
+                        pointRadius: 6,
+                        pointBackgroundColor: 'rgba(13, 110, 253, 1)',
+                        pointBorderColor: '#fff',
+                        pointBorderWidth: 2,
+                        pointHoverRadius: 8
+                    }
+                ]
+            },
+            options: {
+                responsive: true,
+                maintainAspectRatio: false,
+                layout: {
+                    padding: {
+                        top: 10,
+                        right: 20,
+                        left: 20,
+                        bottom: 60
+                    }
+                },
+                scales: {
+                    y: {
+                        beginAtZero: false,
+                        title: {
+                            display: true,
+                            text: '温度 (°C)',
+                            color: '#000',
+                            font: {
+                            size: 14,
+                            weight: 'bold',
+                            family: 'Inter, -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif'
+                        }
+                        },
+                        ticks: {
+                            callback: function(value) {
+                                return value + '°C';
+                            },
+                            color: '#000',
+                            font: {
+                            size: 12,
+                            weight: 'bold',
+                            family: 'Inter, -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif'
+                        },
+                            stepSize: 3
+                        },
+                        grid: {
+                            color: 'rgba(0, 0, 0, 0.15)',
+                            lineWidth: 1,
+                            drawBorder: true
+                        }
+                    },
+                    x: {
+                        title: {
+                            display: true,
+                            text: '日期',
+                            color: '#000',
+                            font: {
+                            weight: 'bold',
+                            size: 14,
+                            family: 'Inter, -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif'
+                        }
+                        },
+                        ticks: {
+                            color: '#000',
+                            font: {
+                            size: 12,
+                            weight: 'bold',
+                            family: 'Inter, -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif'
+                        },
+                            maxRotation: 45,
+                            minRotation: 45
+                        },
+                        grid: {
+                            display: false
+                        }
+                    }
+                },
+                plugins: {
+                    title: {
+                        display: true,
+                        text: `${data.city}未来一周温度变化趋势`,
+                        color: '#000',
+                        font: {
+                            size: 18,
+                            weight: 'bold'
+                        },
+                        padding: {
+                            top: 10,
+                            bottom: 20
+                        }
+                    },
+                    legend: {
+                        display: true,
+                        position: 'top',
+                        labels: {
+                            color: '#000',
+                            font: {
+                            size: 13,
+                            weight: 'bold',
+                            family: 'Inter, -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif'
+                        },
+                            padding: 15
+                        }
+                    },
+                    tooltip: {
+                        enabled: true,
+                        backgroundColor: 'rgba(0, 0, 0, 0.85)',
+                        titleColor: '#fff',
+                        bodyColor: '#fff',
+                        borderColor: '#555',
+                        borderWidth: 1,
+                        padding: 12,
+                        cornerRadius: 8,
+                        titleFont: {
+                            size: 14,
+                            weight: 'bold'
+                        },
+                        bodyFont: {
+                            size: 13
+                        },
+                        callbacks: {
+                            label: function(context) {
+                                let label = context.dataset.label || '';
+                                if (label) {
+                                    label += ': ';
+                                }
+                                if (context.parsed.y !== null) {
+                                    label += context.parsed.y + '°C';
+                                }
+                                return label;
+                            }
+                        }
+                    }
+                },
+                interaction: {
+                    mode: 'index',
+                    intersect: false
+                },
+                animation: {
+                    duration: 500 // 适中的动画效果
+                }
+            }
+        });
+
+        console.log('未来一周天气预报图表绘制成功');
+    } catch (error) {
+        console.error('绘制未来一周天气预报图表失败:', error);
+        console.error('错误详情:', error.stack);
+        showStaticWeeklyForecastTable(data);
+    }
+}
+
+// 显示未来一周天气预报静态表格（作为Chart.js的备选方案）
+function showStaticWeeklyForecastTable(data) {
+    console.log('显示未来一周天气预报静态表格');
+    const chartContainer = document.getElementById('weeklyForecastContainer');
+    const canvas = document.getElementById('weeklyForecastChart');
+
+    if (canvas) {
+        // 隐藏canvas元素
+        canvas.style.display = 'none';
+    }
+
+    // 创建表格元素
+    const forecast = data.forecast;
+    let tableHTML = `
+        <table class="table table-striped">
+            <thead class="table-primary">
+                <tr>
+                    <th scope="col">日期</th>
+                    <th scope="col">最高温度 (°C)</th>
+                    <th scope="col">最低温度 (°C)</th>
+                </tr>
+            </thead>
+            <tbody>
+    `;
+
+    // 添加表格内容
+    forecast.forEach(item => {
+        const date = new Date(item.date);
+        const formattedDate = `${date.getMonth() + 1}/${date.getDate()}`;
+        tableHTML += `
+            <tr>
+                <td>${formattedDate}</td>
+                <td>${item.max_temp || 'N/A'}°C</td>
+                <td>${item.min_temp || 'N/A'}°C</td>
+            </tr>
+        `;
+    });
+
+    tableHTML += `
+            </tbody>
+        </table>
+    `;
+
+    // 添加表格到图表容器
+    const tableDiv = document.createElement('div');
+    tableDiv.innerHTML = tableHTML;
+    tableDiv.id = 'weeklyForecastTable';
+
+    // 检查是否已存在表格元素，如果存在则替换
+    const existingTable = chartContainer.querySelector('#weeklyForecastTable');
+    if (existingTable) {
+        existingTable.remove();
+    }
+
+    chartContainer.appendChild(tableDiv);
+}
+
+// 显示未来一周天气预报详细信息
+function displayWeeklyForecastInfo(data) {
+    const infoDiv = document.getElementById('weeklyForecastInfo');
+    const forecast = data.forecast;
+
+    let infoHTML = `<h4>${data.city}未来一周天气预报详情</h4>`;
+    infoHTML += '<div class="row">';
+
+    forecast.forEach(item => {
+        const date = new Date(item.date);
+        const dayOfWeek = ['周日', '周一', '周二', '周三', '周四', '周五', '周六'][date.getDay()];
+        const formattedDate = `${date.getMonth() + 1}/${date.getDate()}`;
+
+        infoHTML += `
+            <div class="col-md-12 mb-3">
+                <div class="weather-info-card">
+                    <div class="d-flex justify-content-between align-items-center">
+                        <h5>${dayOfWeek} (${formattedDate})</h5>
+                        <div>
+                            <span class="badge bg-danger me-2">最高: ${item.max_temp}°C</span>
+                            <span class="badge bg-primary">最低: ${item.min_temp}°C</span>
+                        </div>
+                    </div>
+                    <div class="mt-2">
+                        <p><strong>体感温度:</strong> ${item.max_apparent_temp}°C (最高) / ${item.min_apparent_temp}°C (最低)</p>
+                        <p><strong>降水量:</strong> ${item.precipitation} mm</p>
+                        <p><strong>最大风速:</strong> ${item.wind_speed_max} km/h</p>
+                    </div>
+                </div>
+            </div>
+        `;
+    });
+
+    infoHTML += '</div>';
+    infoDiv.innerHTML = infoHTML;
+}
+
+// 为未来一周天气预报查询按钮添加事件监听器
+document.addEventListener('DOMContentLoaded', function() {
+    const forecastSearchBtn = document.getElementById('forecastSearchBtn');
+    if (forecastSearchBtn) {
+        forecastSearchBtn.addEventListener('click', getWeeklyForecast);
+    }
+
+    // 为城市输入框添加回车事件
+    const forecastCityInput = document.getElementById('forecastCityInput');
+    if (forecastCityInput) {
+        forecastCityInput.addEventListener('keypress', function(e) {
+            if (e.key === 'Enter') {
+                getWeeklyForecast();
+            }
+        });
+    }
+
+    // 默认查询北京的未来一周天气预报
+    document.getElementById('forecastCityInput').value = '北京';
+    getWeeklyForecast();
+});
@@ -0,0 +1,90 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+from app.concurrency import gevent_active
+
+load_dotenv()
+
+# 使用Open-Meteo API（免费无需API密钥），可通过环境变量指向本地测试服务器
+# 地理编码API - 根据城市名称获取经纬度
+GEOCODING_API_URL = os.getenv('GEOCODING_API_URL', 'https://geocoding-api.open-meteo.com/v1/search')
+# 当前天气API
+WEATHER_API_URL = os.getenv('WEATHER_API_URL', 'https://api.open-meteo.com/v1/forecast')
+
+# 连接超时和读取超时（秒）
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv('UPSTREAM_CONNECT_TIMEOUT', 3.05))
+UPSTREAM_READ_TIMEOUT = float(os.getenv('UPSTREAM_READ_TIMEOUT', 10))
+
+# 失败重试次数和指数退避系数（第n次重试前等待 backoff * 2^(n-1) 秒）
+UPSTREAM_MAX_RETRIES = int(os.getenv('UPSTREAM_MAX_RETRIES', 2))
+UPSTREAM_BACKOFF_FACTOR = float(os.getenv('UPSTREAM_BACKOFF_FACTOR', 0.5))
+
+# 每个主机保持的长连接数量；未设置时gevent模式下与每个工作进程的最大并发连接数一致
+# （并发请求超过连接池大小时，多出的连接用完即关闭，无法复用），其他模式下为10
+UPSTREAM_POOL_MAXSIZE = os.getenv('UPSTREAM_POOL_MAXSIZE')
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def pool_maxsize():
+    """每个主机保持的长连接数量"""
+    if UPSTREAM_POOL_MAXSIZE:
+        return int(UPSTREAM_POOL_MAXSIZE)
+    if gevent_active():
+        return int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+    return 10
+
+
+def create_session():
+    """创建带连接池和自动重试的HTTP会话"""
+    retry = Retry(
+        total=UPSTREAM_MAX_RETRIES,
+        connect=UPSTREAM_MAX_RETRIES,
+        read=UPSTREAM_MAX_RETRIES,
+        status=UPSTREAM_MAX_RETRIES,
+        backoff_factor=UPSTREAM_BACKOFF_FACTOR,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET']),
+        # 重试用尽后返回最后一次响应，由raise_for_status抛出HTTPError
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=pool_maxsize(),
+        max_retries=retry
+    )
+    
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Accept': 'application/json'})
+    return session
+
+
+def get_session():
+    """获取当前工作进程的HTTP会话，进程fork后自动重新创建，避免共享连接"""
+    global _session, _session_pid
+    
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                _session = create_session()
+                _session_pid = pid
+    return _session
+
+
+def get_json(url, params):
+    """发送GET请求并返回JSON数据，请求失败时抛出requests异常"""
+    response = get_session().get(
+        url,
+        params=params,
+        timeout=(UPSTREAM_CONNECT_TIMEOUT, UPSTREAM_READ_TIMEOUT)
+    )
+    response.raise_for_status()
+    return response.json()
@@ -1,4 +1,4 @@
-from flask import render_template, request, jsonify
+from flask import Response, render_template, request, jsonify
 from app import app, limiter
 import requests
 import os
@@ -6,326 +6,593 @@ import random
 from dotenv import load_dotenv
 import urllib.parse
 import datetime
+import hashlib
 import time
-from app.database import WeatherDatabase
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app.archive import archive_filename, export_partition
+from app.assets import StaticAssets, load_vendor_manifest
+from app.broadcast import WeatherBroadcaster
+from app.city_resolver import SUGGEST_SIZE, CityResolver
+from app.compression import choose_encoding, compress_data
+from app.concurrency import gevent_active
+from app.database import CACHE_TTL_SECONDS, FORECAST_TTL_SECONDS, WeatherDatabase
+from app.formatting import format_weather, format_weather_batch, weather_texts, wind_speed_to_level
+from app.http_cache import conditional_response, parse_timestamp, remaining_ttl
+from app.maintenance import MaintenanceScheduler
+from app.popularity import PopularityTracker
+from app.prefetcher import PopularCityPrefetcher
+from app.singleflight import SingleFlight
+from app.spatial import NearestCityIndex
+from app.upstream import GEOCODING_API_URL, WEATHER_API_URL, get_json
 
 load_dotenv()
 
-# 使用Open-Meteo API（免费无需API密钥）
-# 地理编码API - 根据城市名称获取经纬度
-GEOCODING_API_URL = 'https://geocoding-api.open-meteo.com/v1/search'
-# 当前天气API
-WEATHER_API_URL = 'https://api.open-meteo.com/v1/forecast'
-
-# 城市坐标映射表（针对Open-Meteo无法识别的中文城市）
-city_coordinates = {
-    # 直辖市
-    '北京': {'latitude': 39.9042, 'longitude': 116.4074, 'name': '北京'},
-    '上海': {'latitude': 31.2304, 'longitude': 121.4737, 'name': '上海'},
-    '天津': {'latitude': 39.1256, 'longitude': 117.1902, 'name': '天津'},
-    '重庆': {'latitude': 29.4316, 'longitude': 106.9123, 'name': '重庆'},
-    
-    # 省会城市
-    '广州': {'latitude': 23.1291, 'longitude': 113.2644, 'name': '广州'},
-    '深圳': {'latitude': 22.5431, 'longitude': 114.0579, 'name': '深圳'},
-    '杭州': {'latitude': 30.2741, 'longitude': 120.1551, 'name': '杭州'},
-    '苏州': {'latitude': 31.2989, 'longitude': 120.5853, 'name': '苏州'},
-    '成都': {'latitude': 30.5728, 'longitude': 104.0668, 'name': '成都'},
-    '武汉': {'latitude': 30.5928, 'longitude': 114.3055, 'name': '武汉'},
-    '西安': {'latitude': 34.3416, 'longitude': 108.9398, 'name': '西安'},
-    '南京': {'latitude': 32.0603, 'longitude': 118.7969, 'name': '南京'},
-    '昆明': {'latitude': 25.0389, 'longitude': 102.7183, 'name': '昆明'},
-    '呼和浩特': {'latitude': 40.8181, 'longitude': 111.7626, 'name': '呼和浩特'},
-    '拉萨': {'latitude': 29.6524, 'longitude': 91.1735, 'name': '拉萨'},
-    '乌鲁木齐': {'latitude': 43.8256, 'longitude': 87.6168, 'name': '乌鲁木齐'},
-    '银川': {'latitude': 38.4681, 'longitude': 106.2328, 'name': '银川'},
-    '西宁': {'latitude': 36.6171, 'longitude': 101.7782, 'name': '西宁'},
-    '南宁': {'latitude': 22.8170, 'longitude': 108.3661, 'name': '南宁'},
-    '济南': {'latitude': 36.6683, 'longitude': 117.0203, 'name': '济南'},
-    '石家庄': {'latitude': 38.0428, 'longitude': 114.5149, 'name': '石家庄'},
-    '哈尔滨': {'latitude': 45.8038, 'longitude': 126.5349, 'name': '哈尔滨'},
-    '长春': {'latitude': 43.8256, 'longitude': 125.3245, 'name': '长春'},
-    '沈阳': {'latitude': 41.8057, 'longitude': 123.4315, 'name': '沈阳'},
-    '郑州': {'latitude': 34.8074, 'longitude': 113.4668, 'name': '郑州'},
-    '合肥': {'latitude': 31.8206, 'longitude': 117.2272, 'name': '合肥'},
-    '福州': {'latitude': 26.0745, 'longitude': 119.3062, 'name': '福州'},
-    '南昌': {'latitude': 28.6827, 'longitude': 115.8595, 'name': '南昌'},
-    '长沙': {'latitude': 28.2278, 'longitude': 112.9388, 'name': '长沙'},
-    '贵阳': {'latitude': 26.5783, 'longitude': 106.7078, 'name': '贵阳'},
-    '海口': {'latitude': 20.0440, 'longitude': 110.3593, 'name': '海口'},
-    '兰州': {'latitude': 36.0580, 'longitude': 103.8235, 'name': '兰州'},
-    '桂林': {'latitude': 25.2867, 'longitude': 110.2997, 'name': '桂林'},
-    '漠河': {'latitude': 53.4833, 'longitude': 122.5167, 'name': '漠河'},
-    
-    # 其他城市
-    '青岛': {'latitude': 36.0671, 'longitude': 120.3826, 'name': '青岛'},
-    '东莞': {'latitude': 23.0465, 'longitude': 113.7460, 'name': '东莞'},
-    '宁波': {'latitude': 29.8683, 'longitude': 121.5440, 'name': '宁波'},
-    '佛山': {'latitude': 23.0208, 'longitude': 113.2892, 'name': '佛山'},
-    '无锡': {'latitude': 31.5928, 'longitude': 120.3053, 'name': '无锡'},
-    '厦门': {'latitude': 24.4798, 'longitude': 118.0894, 'name': '厦门'},
-    '温州': {'latitude': 27.9944, 'longitude': 120.6728, 'name': '温州'},
-    '大连': {'latitude': 38.9140, 'longitude': 121.6147, 'name': '大连'},
-    '金华': {'latitude': 29.1201, 'longitude': 119.6430, 'name': '金华'},
-    '泉州': {'latitude': 24.8000, 'longitude': 118.5853, 'name': '泉州'},
-    '常州': {'latitude': 31.7789, 'longitude': 119.9790, 'name': '常州'},
-    '南通': {'latitude': 32.0116, 'longitude': 120.8922, 'name': '南通'},
-    '嘉兴': {'latitude': 30.7628, 'longitude': 120.7534, 'name': '嘉兴'},
-    '徐州': {'latitude': 34.2629, 'longitude': 117.1848, 'name': '徐州'},
-    '惠州': {'latitude': 23.0940, 'longitude': 114.4075, 'name': '惠州'},
-    '太原': {'latitude': 37.8715, 'longitude': 112.5489, 'name': '太原'},
-    '烟台': {'latitude': 37.5396, 'longitude': 121.4128, 'name': '烟台'},
-    '临沂': {'latitude': 35.0658, 'longitude': 118.3463, 'name': '临沂'},
-    '保定': {'latitude': 38.8683, 'longitude': 115.4878, 'name': '保定'},
-    '台州': {'latitude': 28.6800, 'longitude': 121.4233, 'name': '台州'},
-    '绍兴': {'latitude': 30.0000, 'longitude': 120.5853, 'name': '绍兴'},
-    '珠海': {'latitude': 22.2769, 'longitude': 113.5674, 'name': '珠海'},
-    '洛阳': {'latitude': 34.6279, 'longitude': 112.4115, 'name': '洛阳'},
-    '潍坊': {'latitude': 36.7161, 'longitude': 119.1005, 'name': '潍坊'},
-    '通辽': {'latitude': 43.6150, 'longitude': 122.2721, 'name': '通辽'},
-    '台北': {'latitude': 25.0330, 'longitude': 121.5654, 'name': '台北'},
-    '桃园': {'latitude': 25.0025, 'longitude': 121.2167, 'name': '桃园'}
-}
-
-# 城市别名映射表，确保特殊城市能被正确识别
-city_aliases = {
-    '重庆市': '重庆',  # 反向映射，确保能找到正确的键
-    '西藏': '拉萨',
-    '内蒙': '呼和浩特',
-    '新疆': '乌鲁木齐',
-    '内蒙古': '呼和浩特',  # 添加更多别名
-    '广西': '南宁',
-    '宁夏': '银川',
-    '青海': '西宁'
-}
+
+# 城市名称解析索引（地级行政区坐标、拼音和别名，针对Open-Meteo无法识别的中文城市）
+city_resolver = CityResolver.from_file()
+
+# 当前天气API请求的字段
+CURRENT_WEATHER_FIELDS = 'weather_code,temperature_2m,relative_humidity_2m,apparent_temperature,precipitation,rain,showers,snowfall,cloud_cover,wind_speed_10m,wind_direction_10m,pressure_msl,visibility'
+
+# 逐日预报API请求的字段
+DAILY_FORECAST_FIELDS = 'temperature_2m_max,temperature_2m_min,apparent_temperature_max,apparent_temperature_min,precipitation_sum,wind_speed_10m_max'
+
+# 批量查询一次最多支持的城市数量
+MAX_BATCH_CITIES = 20
+
+# Open-Meteo最多支持16天的逐日预报，默认返回未来7天
+MAX_FORECAST_DAYS = 16
+DEFAULT_FORECAST_DAYS = 7
+
+# 流式输出历史数据时每次发送的行数
+HISTORY_STREAM_CHUNK_ROWS = 200
+
+# 历史汇总查询默认返回最近30天，一次最多查询366天
+SUMMARY_DEFAULT_DAYS = 30
+MAX_SUMMARY_DAYS = 366
+
+# 上游请求租约有效期（秒），覆盖最坏情况下的超时与重试时间
+FETCH_LEASE_TTL = 60
+
+# 等待其他进程完成上游请求时的轮询间隔（秒）
+FETCH_LEASE_POLL_INTERVAL = 0.2
+
+# 后台刷新过期缓存的线程数
+REFRESH_WORKERS = int(os.getenv('REFRESH_WORKERS', 2))
+
+# 首页展示的热门城市，访问数据不足时用于补足预取列表
+PREFETCH_CITIES = ['北京', '上海', '广州', '深圳', '杭州', '成都', '武汉', '西安', '重庆', '南京', '天津', '昆明',
+                   '呼和浩特', '拉萨', '乌鲁木齐', '银川', '西宁', '南宁', '济南', '石家庄', '哈尔滨', '长春', '沈阳',
+                   '郑州', '合肥', '福州', '南昌', '长沙', '贵阳', '海口', '兰州']
+
+# 按请求热度排名前PREFETCH_TOP_K的城市由后台预取，并固定在进程内缓存中不被LRU淘汰
+PREFETCH_TOP_K = int(os.getenv('PREFETCH_TOP_K', 50))
+
+# 热门城市接口默认返回的城市数量
+POPULAR_CITIES_LIMIT = 10
+
+# 进程内请求计数写入数据库的周期（秒）
+POPULARITY_FLUSH_INTERVAL = int(os.getenv('POPULARITY_FLUSH_INTERVAL', 60))
+
+# 后台预取：当前天气的刷新周期（秒，需短于1小时的缓存有效期）、逐日预报的刷新周期（秒）、批次间随机等待的上限（秒）
+PREFETCH_ENABLED = os.getenv('PREFETCH_ENABLED', 'true').lower() != 'false'
+PREFETCH_INTERVAL = int(os.getenv('PREFETCH_INTERVAL', 1800))
+PREFETCH_FORECAST_INTERVAL = int(os.getenv('PREFETCH_FORECAST_INTERVAL', FORECAST_TTL_SECONDS // 2))
+PREFETCH_JITTER = float(os.getenv('PREFETCH_JITTER', 5))
+
+# 历史数据响应的缓存有效期（秒）：已结束的日期不再变化，包含今天的数据每小时都会更新
+HISTORY_MAX_AGE = 24 * 3600
+HISTORY_RECENT_MAX_AGE = 300
+
+# 经纬度查询吸附到最近已知城市的最大距离（千米）
+NEAREST_CITY_MAX_KM = float(os.getenv('NEAREST_CITY_MAX_KM', 100))
+
+# 定期清理过期缓存的周期（秒）
+MAINTENANCE_INTERVAL = int(os.getenv('MAINTENANCE_INTERVAL', 3600))
+
+# 天气推送（/stream）：检查其他进程写入的更新的周期（秒）、无更新时发送心跳的间隔（秒）、
+# 单个连接的最长时间（秒，到期后由浏览器自动重连）、断线后浏览器重连的等待时间（毫秒）
+STREAM_POLL_INTERVAL = int(os.getenv('STREAM_POLL_INTERVAL', 30))
+STREAM_HEARTBEAT_INTERVAL = int(os.getenv('STREAM_HEARTBEAT_INTERVAL', 15))
+STREAM_MAX_DURATION = int(os.getenv('STREAM_MAX_DURATION', 3600))
+STREAM_RETRY_MS = 10000
+
+# 是否提供/stream：auto表示只在gevent协程工作模式下提供；sync模式下每个长连接会占用整个工作进程，
+# 几个打开的页面就能耗尽全部工作进程，此时/stream返回503，首页改为不订阅更新
+STREAM_ENABLED = os.getenv('STREAM_ENABLED', 'auto').lower()
 
 # 数据库实例
 weather_db = WeatherDatabase()
 
-@app.route('/')
-def index():
-    return render_template('index.html')
+# 经纬度查询的最近城市索引：包括城市名称索引中的城市和地理编码缓存中的城市
+city_locations = NearestCityIndex()
+for _city in city_resolver.cities.values():
+    city_locations.add(_city['name'], _city['latitude'], _city['longitude'])
+for _name, _latitude, _longitude in weather_db.get_geocoded_locations():
+    city_locations.add(_name, _latitude, _longitude)
 
-@app.route('/weather')
-@limiter.limit("60 per minute")  # 提高速率限制到每分钟60次
-def get_weather():
-    city = request.args.get('city')
-    if not city:
-        return jsonify({'error': '请提供城市名称'}), 400
+# 定期清理任务，在工作进程处理第一个请求时启动
+maintenance_scheduler = MaintenanceScheduler(weather_db, interval=MAINTENANCE_INTERVAL)
+
+def pin_popular_cities(ranking):
+    """热门城市的天气和默认天数预报固定在进程内缓存中"""
+    pinned = ranking[:PREFETCH_TOP_K]
+    weather_db.hot_cache.pin(pinned)
+    weather_db.forecast_cache.pin((city, DEFAULT_FORECAST_DAYS) for city in pinned)
+
+# 城市请求热度统计，排名更新后同步更新缓存固定的城市
+popularity = PopularityTracker(
+    weather_db,
+    flush_interval=POPULARITY_FLUSH_INTERVAL,
+    ranking_size=max(PREFETCH_TOP_K, POPULAR_CITIES_LIMIT),
+    on_update=pin_popular_cities
+)
+
+# 后台刷新线程池：过期缓存先返回给用户，再由后台线程刷新
+refresh_executor = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix='weather-refresh')
+pending_refreshes = set()
+pending_refreshes_lock = threading.Lock()
 
+# 进程内请求合并，同一城市同一时间只有一个上游请求
+weather_fetches = SingleFlight()
+
+# 天气更新推送，缓存刷新后分发给/stream的订阅连接
+broadcaster = WeatherBroadcaster(weather_db.get_latest_weather_batch, poll_interval=STREAM_POLL_INTERVAL)
+
+def store_weather(result):
+    """保存新获取的当前天气：写入缓存和历史表（每天每小时只保存一条），并推送给订阅的连接"""
+    weather_db.save_weather(result)
+    weather_db.save_historical_weather(result)
+    broadcaster.publish(result)
+
+def normalize_city_name(city):
+    """标准化城市名称：解析全称、拼音和别名，未知城市移除行政区划后缀"""
+    return city_resolver.normalize(city)
+
+def parse_city_list(cities_param):
+    """解析逗号分隔的城市列表，支持中英文逗号，去除空白和重复项并保持顺序"""
+    cities = []
+    for city in cities_param.replace('，', ',').split(','):
+        city = city.strip()
+        if city and city not in cities:
+            cities.append(city)
+    return cities
+
+def resolve_city_location(city):
+    """解析城市经纬度，返回 (城市名称, 纬度, 经度)，未找到城市时返回None"""
+    city_name = normalize_city_name(city)
+    
+    # 首先检查城市名称索引
+    location = city_resolver.lookup(city_name)
+    if location:
+        return location['name'], location['latitude'], location['longitude']
+    
+    # 其次查询地理编码缓存（包括未找到城市的负缓存）
+    cached_location = weather_db.get_cached_geocode(city_name)
+    if cached_location:
+        if not cached_location['found']:
+            return None
+        return cached_location['name'], cached_location['latitude'], cached_location['longitude']
+    
+    # 如果都没有，调用地理编码API
+    geo_params = {
+        'name': city_name,
+        'country': 'CN',  # 指定中国
+        'count': 5,  # 获取更多结果
+        'language': 'zh'
+    }
+    
+    # 通过共享的长连接会话请求，超时和重试由upstream模块统一处理
+    geo_data = get_json(GEOCODING_API_URL, geo_params)
+    
+    if not geo_data.get('results'):
+        # 记录未找到的城市，负缓存有效期内不再请求上游API
+        weather_db.save_geocode(city_name)
+        return None
+    
+    # 获取经纬度，并确保城市名称没有'市'后缀
+    location = geo_data['results'][0]
+    resolved_name = location['name'].replace('市', '')
+    weather_db.save_geocode(city_name, resolved_name, location['latitude'], location['longitude'])
+    city_locations.add(resolved_name, location['latitude'], location['longitude'])
+    return resolved_name, location['latitude'], location['longitude']
+
+def parse_coordinates(lat_param, lon_param):
+    """解析经纬度参数，返回 (纬度, 经度)，参数缺失或超出范围时返回None"""
     try:
-        # 从缓存获取数据（1小时内有效）
-        cached_data = weather_db.get_cached_weather(city)
-        if cached_data:
-            return jsonify(cached_data), 200
+        latitude, longitude = float(lat_param), float(lon_param)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    return latitude, longitude
+
+def fetch_current_weather(locations):
+    """调用天气API获取多个坐标的当前天气，locations为[(纬度, 经度), ...]，按顺序返回current数据"""
+    # Open-Meteo支持以逗号分隔的经纬度列表，一次请求获取多个地点
+    weather_params = {
+        'latitude': ','.join(str(latitude) for latitude, _ in locations),
+        'longitude': ','.join(str(longitude) for _, longitude in locations),
+        'current': CURRENT_WEATHER_FIELDS,
+        'wind_speed_unit': 'kmh',
+        'timezone': 'Asia/Shanghai'
+    }
+    
+    weather_data = get_json(WEATHER_API_URL, weather_params)
+    
+    # 单个坐标时API返回对象，多个坐标时返回列表
+    if isinstance(weather_data, dict):
+        weather_data = [weather_data]
+    
+    return [item.get('current') if isinstance(item, dict) else None for item in weather_data]
+
+def fetch_daily_forecast(locations, forecast_days=7):
+    """调用天气API获取多个坐标的逐日预报，locations为[(纬度, 经度), ...]，按顺序返回预报列表"""
+    weather_params = {
+        'latitude': ','.join(str(latitude) for latitude, _ in locations),
+        'longitude': ','.join(str(longitude) for _, longitude in locations),
+        'daily': DAILY_FORECAST_FIELDS,
+        'timezone': 'Asia/Shanghai',
+        'forecast_days': forecast_days
+    }
+    
+    weather_data = get_json(WEATHER_API_URL, weather_params)
+    
+    # 单个坐标时API返回对象，多个坐标时返回列表
+    if isinstance(weather_data, dict):
+        weather_data = [weather_data]
+    
+    results = []
+    for item in weather_data:
+        daily_data = item.get('daily') if isinstance(item, dict) else None
+        if not daily_data:
+            results.append(None)
+            continue
         
-        # 标准化城市名称：移除'市'后缀
-        normalized_city = city.replace('市', '')
+        # 格式化输出
+        forecast_data = []
+        for i in range(len(daily_data['time'])):
+            forecast_data.append({
+                'date': daily_data['time'][i],
+                'max_temp': daily_data['temperature_2m_max'][i],
+                'min_temp': daily_data['temperature_2m_min'][i],
+                'max_apparent_temp': daily_data['apparent_temperature_max'][i],
+                'min_apparent_temp': daily_data['apparent_temperature_min'][i],
+                'precipitation': daily_data['precipitation_sum'][i],
+                'wind_speed_max': daily_data['wind_speed_10m_max'][i]
+            })
+        results.append(forecast_data)
+    return results
+
+def generate_mock_weather(city_name):
+    """生成合理的模拟天气数据，作为索引中城市的最后手段"""
+    wind_speed_kmh = round(random.uniform(0, 38), 1)
+    return {
+        'city': city_name,
+        'temperature_c': round(random.uniform(0, 35), 1),
+        'humidity_pct': random.randint(30, 90),
+        'pressure_hpa': round(random.uniform(1000, 1020), 1),
+        'visibility_km': round(random.uniform(5, 20), 1),
+        'wind_level': wind_speed_to_level(wind_speed_kmh),
+        'wind_speed_kmh': wind_speed_kmh,
+        'wind_deg': random.choice(range(0, 360, 45)),
+        'weather_code': random.choice([0, 2, 3, 61]),
+        'aqi': random.randint(30, 150)
+    }
+
+def build_weather_result(city_name, current_data):
+    """将天气API返回的current数据转换为数值形式的天气记录，展示格式由format_weather在输出时生成"""
+    weather_code = current_data.get('weather_code', 0)
+    
+    # 风速转换为风力等级
+    wind_speed_kmh = current_data.get('wind_speed_10m', 0)
+    wind_level = wind_speed_to_level(wind_speed_kmh)
+    
+    # 生成合理的模拟AQI数据（0-500之间）
+    # 根据天气状况调整AQI范围
+    if weather_code in [45, 48]:  # 雾和霾
+        aqi_value = random.randint(100, 300)  # 雾霾天气AQI较高
+    elif wind_level >= 3:  # 风力较大时AQI较低
+        aqi_value = random.randint(0, 100)
+    else:  # 一般天气
+        aqi_value = random.randint(50, 150)
+    
+    return {
+        'city': city_name,
+        'temperature_c': current_data['temperature_2m'],
+        'humidity_pct': current_data['relative_humidity_2m'],
+        'pressure_hpa': current_data['pressure_msl'],
+        'visibility_km': current_data['visibility'] / 1000,  # 转换为km
+        'wind_level': wind_level,
+        'wind_speed_kmh': wind_speed_kmh,
+        'wind_deg': current_data.get('wind_direction_10m', 0),
+        'weather_code': weather_code,
+        'aqi': aqi_value,
+        # 获取时间（UTC），与写入缓存的时间一致，用作响应的缓存验证器
+        'timestamp': datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+        # 刚获取的数据未过期，响应字段与缓存命中时一致，同一验证器对应同样的响应内容
+        'stale': False
+    }
+
+def wait_for_cached_weather(city_name, lease_key):
+    """等待持有租约的其他进程写入缓存，租约释放或过期后返回缓存（可能为None）"""
+    deadline = time.time() + FETCH_LEASE_TTL
+    while time.time() < deadline:
+        cached_data = weather_db.get_cached_weather(city_name)
+        if cached_data:
+            return cached_data
+        if not weather_db.is_fetch_lease_active(lease_key):
+            break
+        time.sleep(FETCH_LEASE_POLL_INTERVAL)
+    return weather_db.get_cached_weather(city_name)
+
+def load_current_weather(city_name, latitude, longitude):
+    """获取城市当前天气并写入缓存，上游API请求失败或数据为空时返回None或抛出异常
+    
+    同一城市的并发请求在进程内合并，多个工作进程之间通过数据库租约合并，
+    保证同一时间只有一个上游请求，其他请求等待并共享其结果。
+    """
+    def load():
+        # 等待期间其他请求可能已经刷新了缓存
+        cached_data = weather_db.get_cached_weather(city_name)
+        if cached_data:
+            return cached_data
         
-        # 使用别名（如果有）
-        city_name = city_aliases.get(normalized_city, normalized_city)
+        lease_key = f'weather:{city_name}'
+        owner = uuid.uuid4().hex
+        if not weather_db.acquire_fetch_lease(lease_key, owner, FETCH_LEASE_TTL):
+            # 其他工作进程正在请求同一城市，等待其结果
+            cached_data = wait_for_cached_weather(city_name, lease_key)
+            if cached_data:
+                return cached_data
+            # 对方请求失败，由当前进程重新获取租约后请求
+            weather_db.acquire_fetch_lease(lease_key, owner, FETCH_LEASE_TTL)
         
-        # 首先检查是否在城市坐标映射表中
-        if city_name in city_coordinates:
-            location = city_coordinates[city_name]
-            latitude = location['latitude']
-            longitude = location['longitude']
-            city_name = location['name']
-        else:
-            # 如果不在映射表中，调用地理编码API
-            geo_params = {
-                'name': city_name,
-                'country': 'CN',  # 指定中国
-                'count': 5,  # 获取更多结果
-                'language': 'zh'
-            }
+        try:
+            current_data = fetch_current_weather([(latitude, longitude)])[0]
+            if not current_data:
+                return None
             
-            # 增加超时时间并添加重试机制
-            max_retries = 3
-            retry_delay = 1
-            geo_response = None
+            result = build_weather_result(city_name, current_data)
             
-            for retry in range(max_retries):
-                try:
-                    geo_response = requests.get(GEOCODING_API_URL, params=geo_params, timeout=10)
-                    geo_response.raise_for_status()
-                    break  # 成功获取响应，跳出循环
-                except requests.exceptions.RequestException as e:
-                    if retry == max_retries - 1:
-                        raise  # 最后一次重试失败，抛出异常
-                    time.sleep(retry_delay)  # 等待一段时间后重试
-            geo_data = geo_response.json()
+            # 将获取的天气数据保存到数据库缓存和历史天气表
+            store_weather(result)
             
-            if not geo_data.get('results'):
-                return jsonify({'error': '未找到该城市，请确认城市名称是否正确'}), 404
-            
-            # 获取经纬度
-            location = geo_data['results'][0]
-            latitude = location['latitude']
-            longitude = location['longitude']
-            city_name = location['name']
-        
-        # 最终标准化：确保存储的城市名称没有'市'后缀
-        city_name = city_name.replace('市', '')
-        
-        # 2. 使用经纬度调用天气API获取天气数据
-        weather_params = {
-            'latitude': latitude,
-            'longitude': longitude,
-            'current': 'temperature_2m,relative_humidity_2m,apparent_temperature,precipitation,rain,showers,snowfall,cloud_cover,wind_speed_10m,wind_direction_10m,pressure_msl,visibility',
-            'wind_speed_unit': 'kmh',
-            'timezone': 'Asia/Shanghai'
-        }
+            return result
+        finally:
+            weather_db.release_fetch_lease(lease_key, owner)
+    
+    return weather_fetches.do(city_name, load)
+
+def load_daily_forecast(city_name, latitude, longitude, forecast_days):
+    """获取城市逐日预报，返回 (预报列表, 写入时间)，优先读取预报缓存，未命中时请求天气API并写入缓存；没有数据时返回None"""
+    cached_forecast = weather_db.get_cached_forecast_entry(city_name, forecast_days)
+    if cached_forecast is not None:
+        return cached_forecast
+    
+    def load():
+        # 等待期间其他请求可能已经刷新了缓存
+        cached_forecast = weather_db.get_cached_forecast_entry(city_name, forecast_days)
+        if cached_forecast is not None:
+            return cached_forecast
         
-        # 增加超时时间并添加重试机制，使用指数退避
-        max_retries = 3
-        weather_response = None
+        forecast_data = fetch_daily_forecast([(latitude, longitude)], forecast_days)[0]
+        if forecast_data is None:
+            return None
+        return forecast_data, weather_db.save_forecast(city_name, forecast_days, forecast_data)
+    
+    return weather_fetches.do(f'forecast:{city_name}:{forecast_days}', load)
+
+def get_prefetch_cities():
+    """需要后台预取的热门城市：按热度排名的前PREFETCH_TOP_K个，不足时用首页热门城市补足"""
+    cities = popularity.top(PREFETCH_TOP_K)
+    for city in PREFETCH_CITIES:
+        if len(cities) >= PREFETCH_TOP_K:
+            break
+        if city not in cities:
+            cities.append(city)
+    return cities
+
+def resolve_city_locations(cities):
+    """解析一批城市的经纬度，跳过未找到的城市，返回 [(城市名称, 纬度, 经度)]"""
+    locations = []
+    for city in cities:
+        location = resolve_city_location(city)
+        if location:
+            locations.append(location)
+    return locations
+
+def prefetch_current_weather(cities):
+    """通过一次多坐标请求刷新一批城市的当前天气，同时写入历史表，返回刷新成功的城市数量"""
+    locations = resolve_city_locations(cities)
+    if not locations:
+        return 0
+    
+    current_list = fetch_current_weather([(latitude, longitude) for _, latitude, longitude in locations])
+    refreshed = 0
+    for (city_name, _, _), current_data in zip(locations, current_list):
+        if not current_data:
+            continue
+        result = build_weather_result(city_name, current_data)
+        store_weather(result)
+        refreshed += 1
+    return refreshed
+
+def prefetch_daily_forecast(cities):
+    """通过一次多坐标请求刷新一批城市的默认天数逐日预报，返回刷新成功的城市数量"""
+    locations = resolve_city_locations(cities)
+    if not locations:
+        return 0
+    
+    forecast_list = fetch_daily_forecast(
+        [(latitude, longitude) for _, latitude, longitude in locations], DEFAULT_FORECAST_DAYS
+    )
+    refreshed = 0
+    for (city_name, _, _), forecast_data in zip(locations, forecast_list):
+        if forecast_data is None:
+            continue
+        weather_db.save_forecast(city_name, DEFAULT_FORECAST_DAYS, forecast_data)
+        refreshed += 1
+    return refreshed
+
+# 热门城市后台预取，多个工作进程中只有获取到租约的进程请求上游API
+prefetcher = PopularCityPrefetcher(
+    weather_db,
+    get_prefetch_cities,
+    prefetch_current_weather,
+    prefetch_daily_forecast,
+    interval=PREFETCH_INTERVAL,
+    forecast_interval=PREFETCH_FORECAST_INTERVAL,
+    batch_size=MAX_BATCH_CITIES,
+    jitter=PREFETCH_JITTER
+)
+
+def refresh_weather(city):
+    """后台刷新城市天气缓存"""
+    try:
+        location = resolve_city_location(city)
+        if location:
+            load_current_weather(*location)
+    except Exception as e:
+        print(f"后台刷新{city}天气失败: {e}")
+    finally:
+        with pending_refreshes_lock:
+            pending_refreshes.discard(city)
+
+def schedule_weather_refresh(city):
+    """提交后台刷新任务，同一城市同一时间只排队一次"""
+    with pending_refreshes_lock:
+        if city in pending_refreshes:
+            return
+        pending_refreshes.add(city)
+    refresh_executor.submit(refresh_weather, city)
+
+@app.before_request
+def start_background_tasks():
+    """确保当前工作进程的后台任务已经启动"""
+    maintenance_scheduler.start()
+    popularity.start()
+    broadcaster.start()
+    if PREFETCH_ENABLED:
+        prefetcher.start()
+
+def weather_response(record):
+    """当前天气响应：以城市和获取时间作为缓存验证器，有效期为缓存的剩余有效期"""
+    timestamp = record.get('timestamp')
+    if timestamp is None:
+        # 模拟数据不允许缓存
+        response = jsonify(format_weather(record))
+        response.cache_control.no_store = True
+        return response
+    return conditional_response(
+        lambda: format_weather(record),
+        ('weather', record['city'], timestamp, record.get('stale', False)),
+        last_modified=parse_timestamp(timestamp),
+        max_age=0 if record.get('stale') else remaining_ttl(timestamp, CACHE_TTL_SECONDS)
+    )
+
+def history_max_age(end_date):
+    """历史数据响应的缓存有效期：查询范围包含今天时数据还会更新"""
+    if end_date < datetime.date.today().strftime('%Y-%m-%d'):
+        return HISTORY_MAX_AGE
+    return HISTORY_RECENT_MAX_AGE
+
+# 模板中的静态资源URL带内容指纹，可以长期缓存；第三方库未下载到本地时使用带SRI哈希的CDN地址
+static_assets = StaticAssets(app.static_folder, app.static_url_path, load_vendor_manifest())
+app.jinja_env.globals['asset_url'] = static_assets.url
+app.jinja_env.globals['vendor_asset'] = static_assets.vendor
+
+# 首页HTML不依赖请求参数，渲染后缓存HTML和各压缩格式的内容（调试模式下每次重新渲染）；
+# 页面引用的静态文件指纹变化（如更新或下载了第三方库）时重新渲染
+index_page = None
+
+def render_index_page():
+    """渲染首页，返回(静态文件指纹, HTML, 压缩格式 -> 压缩后的内容, 版本标识)"""
+    global index_page
+    page = index_page
+    if page is None or page[0] != static_assets.version() or app.debug:
+        # 服务端不支持推送时，首页不建立订阅连接
+        html = render_template('index.html', stream_enabled=stream_supported()).encode('utf-8')
+        page = index_page = (static_assets.version(), html, {}, ('index', hashlib.md5(html).hexdigest()))
+    return page
+
+@app.route('/')
+def index():
+    _, html, compressed, version = render_index_page()
+    encoding = choose_encoding(request.accept_encodings)
+    
+    def build():
+        if encoding is None:
+            return Response(html, mimetype='text/html')
+        # 压缩结果随页面一起缓存，不在每次请求时重新压缩
+        if encoding not in compressed:
+            compressed[encoding] = compress_data(html, encoding)
+        response = Response(compressed[encoding], mimetype='text/html')
+        response.headers['Content-Encoding'] = encoding
+        return response
+    
+    # 静态资源更新后首页内容随之变化，浏览器每次用ETag验证
+    response = conditional_response(build, version)
+    response.vary.add('Accept-Encoding')
+    if encoding is not None:
+        # 与compress_response一致，压缩后的内容使用弱ETag
+        response.set_etag(response.get_etag()[0], weak=True)
+    return response
+
+@app.route('/weather')
+@limiter.limit("60 per minute")  # 提高速率限制到每分钟60次
+def get_weather():
+    city = request.args.get('city')
+    nearest = None
+    if not city and ('lat' in request.args or 'lon' in request.args):
+        coordinates = parse_coordinates(request.args.get('lat'), request.args.get('lon'))
+        if coordinates is None:
+            return jsonify({'error': '经纬度无效，纬度范围为-90~90，经度范围为-180~180'}), 400
+        # 吸附到范围内最近的已知城市，附近的用户共用同一个城市的缓存
+        nearest = city_locations.nearest(*coordinates, NEAREST_CITY_MAX_KM)
+        if nearest is None:
+            return jsonify({'error': f'{NEAREST_CITY_MAX_KM:g}千米范围内没有已知城市'}), 404
+        city = nearest[0]
+    if not city:
+        return jsonify({'error': '请提供城市名称或经纬度'}), 400
+    
+    try:
+        # 从缓存获取数据，缓存按标准化后的城市名称保存
+        # 超过1小时的过期数据直接返回（stale为True），同时在后台刷新
+        city_key = city if nearest else normalize_city_name(city)
+        cached_data = weather_db.get_cached_weather(city_key, allow_stale=True)
+        if cached_data:
+            if cached_data['stale']:
+                schedule_weather_refresh(city_key)
+            popularity.record(city_key)
+            return weather_response(cached_data)
         
-        for retry in range(max_retries):
-            try:
-                weather_response = requests.get(WEATHER_API_URL, params=weather_params, timeout=15)  # 增加超时时间
-                weather_response.raise_for_status()
-                break  # 成功获取响应，跳出循环
-            except requests.exceptions.RequestException as e:
-                retry_delay = 1.5 ** retry  # 指数退避
-                if retry == max_retries - 1:
-                    # 如果是映射表中的城市，生成模拟数据作为最后手段
-                    if city_name in city_coordinates:
-                        # 生成合理的模拟天气数据
-                        result = {
-                            'city': city_name,
-                            'temperature': f'{random.uniform(0, 35):.1f}°C',
-                            'humidity': f'{random.randint(30, 90)}%',
-                            'weather': random.choice(['晴朗', '多云', '阴天', '小雨']),
-                            'wind': f'{random.randint(0, 5)}级',
-                            'wind_dir': random.choice(['东', '南', '西', '北', '东南', '西南', '东北', '西北']),
-                            'pressure': f'{random.uniform(1000, 1020):.1f}hPa',
-                            'visibility': f'{random.uniform(5, 20):.1f}km',
-                            'aqi': random.randint(30, 150)
-                        }
-                        return jsonify(result), 200
-                    raise  # 最后一次重试失败，抛出异常
-                time.sleep(retry_delay)  # 等待一段时间后重试
+        # 1. 解析城市经纬度（经纬度查询直接使用最近城市的坐标）
+        location = nearest[:3] if nearest else resolve_city_location(city)
+        if location is None:
+            return jsonify({'error': '未找到该城市，请确认城市名称是否正确'}), 404
+        city_name, latitude, longitude = location
+        popularity.record(city_name)
         
-        weather_data = weather_response.json()
+        # 2. 使用经纬度调用天气API获取天气数据（同一城市的并发请求合并为一次）
+        try:
+            result = load_current_weather(city_name, latitude, longitude)
+        except requests.exceptions.RequestException:
+            # 如果是索引中的城市，生成模拟数据作为最后手段
+            if city_resolver.lookup(city_name):
+                return weather_response(generate_mock_weather(city_name))
+            raise
         
-        if not weather_data.get('current'):
-            # 如果是映射表中的城市，生成模拟数据作为最后手段
-            if city_name in city_coordinates:
-                # 生成合理的模拟天气数据
-                result = {
-                    'city': city_name,
-                    'temperature': f'{random.uniform(0, 35):.1f}°C',
-                    'humidity': f'{random.randint(30, 90)}%',
-                    'weather': random.choice(['晴朗', '多云', '阴天', '小雨']),
-                    'wind': f'{random.randint(0, 5)}级',
-                    'wind_dir': random.choice(['东', '南', '西', '北', '东南', '西南', '东北', '西北']),
-                    'pressure': f'{random.uniform(1000, 1020):.1f}hPa',
-                    'visibility': f'{random.uniform(5, 20):.1f}km',
-                    'aqi': random.randint(30, 150)
-                }
-                return jsonify(result), 200
+        if not result:
+            # 如果是索引中的城市，生成模拟数据作为最后手段
+            if city_resolver.lookup(city_name):
+                return weather_response(generate_mock_weather(city_name))
             return jsonify({'error': '获取天气信息失败: 数据格式错误'}), 400
         
-        # 3. 提取天气数据
-        current_data = weather_data['current']
-        
-        # 天气状况映射
-        weather_conditions = {
-            0: '晴朗',
-            1: '晴间多云',
-            2: '多云',
-            3: '阴',
-            45: '雾',
-            48: '霾',
-            51: '小雨',
-            53: '中雨',
-            55: '大雨',
-            56: '冻雨',
-            57: '冻雨',
-            61: '小雨',
-            63: '中雨',
-            65: '大雨',
-            66: '冻雨',
-            67: '冻雨',
-            71: '小雪',
-            73: '中雪',
-            75: '大雪',
-            77: '雪粒',
-            80: '阵雨',
-            81: '阵雨',
-            82: '强阵雨',
-            85: '阵雪',
-            86: '阵雪'
-        }
-        
-        # 获取天气代码对应的天气状况
-        weather_code = current_data.get('weather_code', 0)
-        weather_text = weather_conditions.get(weather_code, '未知')
-        
-        # 风向映射
-        wind_directions = {
-            0: '北',
-            45: '东北',
-            90: '东',
-            135: '东南',
-            180: '南',
-            225: '西南',
-            270: '西',
-            315: '西北',
-            360: '北'
-        }
-        
-        # 获取风向
-        wind_dir_deg = current_data.get('wind_direction_10m', 0)
-        # 找到最接近的风向
-        closest_dir = min(wind_directions.keys(), key=lambda x: abs(x - wind_dir_deg))
-        wind_dir_text = wind_directions[closest_dir]
-        
-        # 风速转换为风力等级
-        wind_speed_kmh = current_data.get('wind_speed_10m', 0)
-        wind_speed_mps = wind_speed_kmh / 3.6
-        
-        # 使用列表查找风力等级，更高效
-        wind_levels = [(0.3, 0), (1.6, 1), (3.4, 2), (5.5, 3), (8.0, 4), 
-                      (10.8, 5), (13.9, 6), (17.2, 7), (20.8, 8), (24.5, 9), 
-                      (28.5, 10), (32.7, 11), (float('inf'), 12)]
-        
-        wind_level = 0
-        for speed, level in wind_levels:
-            if wind_speed_mps < speed:
-                wind_level = level
-                break
-        
-        # 生成合理的模拟AQI数据（0-500之间）
-        # 根据天气状况调整AQI范围
-        if weather_code in [45, 48]:  # 雾和霾
-            aqi_value = random.randint(100, 300)  # 雾霾天气AQI较高
-        elif wind_level >= 3:  # 风力较大时AQI较低
-            aqi_value = random.randint(0, 100)
-        else:  # 一般天气
-            aqi_value = random.randint(50, 150)
-        
-        # 格式化输出
-        result = {
-            'city': city_name,
-            'temperature': f'{current_data["temperature_2m"]}°C',
-            'humidity': f'{current_data["relative_humidity_2m"]}%',
-            'weather': weather_text,
-            'wind': f'{wind_level}级',
-            'wind_dir': wind_dir_text,
-            'pressure': f'{current_data["pressure_msl"]}hPa',
-            'visibility': f'{current_data["visibility"] / 1000}km',  # 转换为km
-            'aqi': aqi_value
-        }
-        
-        # 将获取的天气数据保存到数据库缓存
-        weather_db.save_weather(result)
-        
-        # 同时保存到历史天气表（每天每小时只保存一条）
-        weather_db.save_historical_weather(result)
-        
-        return jsonify(result), 200
+        # 数值记录在输出时转换为带单位的展示格式
+        return weather_response(result)
     except requests.exceptions.Timeout:
         return jsonify({'error': '网络连接超时，请稍后重试'}), 500
     except requests.exceptions.ConnectionError:
@@ -337,148 +604,412 @@ def get_weather():
     except Exception as e:
         return jsonify({'error': f'获取天气信息失败: {str(e)}'}), 500
 
+@app.route('/weather/batch')
+@limiter.limit("60 per minute")
+def get_weather_batch():
+    """批量获取多个城市的天气：一次缓存查询 + 一次多坐标天气API请求"""
+    cities = parse_city_list(request.args.get('cities', ''))
+    
+    if not cities:
+        return jsonify({'error': '请提供城市名称，多个城市用逗号分隔'}), 400
+    
+    if len(cities) > MAX_BATCH_CITIES:
+        return jsonify({'error': f'一次最多查询{MAX_BATCH_CITIES}个城市'}), 400
+    
+    try:
+        # 1. 一次查询读取所有城市的缓存
+        normalized_names = {city: normalize_city_name(city) for city in cities}
+        cached_data = weather_db.get_cached_weather_batch(list(normalized_names.values()), allow_stale=True)
+        
+        # 过期数据直接返回，同时在后台刷新
+        for city_name, data in cached_data.items():
+            if data['stale']:
+                schedule_weather_refresh(city_name)
+        
+        results = {}
+        # 缓存未命中的城市：城市名称 -> (纬度, 经度, [请求中的城市名称])
+        pending = {}
+        
+        for city in cities:
+            if normalized_names[city] in cached_data:
+                results[city] = cached_data[normalized_names[city]]
+                continue
+            
+            # 2. 解析缓存未命中城市的经纬度
+            try:
+                location = resolve_city_location(city)
+            except (requests.exceptions.RequestException, KeyError, IndexError):
+                results[city] = {'city': city, 'error': '获取城市位置失败，请稍后重试'}
+                continue
+            
+            if location is None:
+                results[city] = {'city': city, 'error': '未找到该城市，请确认城市名称是否正确'}
+                continue
+            
+            city_name, latitude, longitude = location
+            if city_name in cached_data:
+                results[city] = cached_data[city_name]
+            elif city_name in pending:
+                pending[city_name][2].append(city)
+            else:
+                pending[city_name] = (latitude, longitude, [city])
+        
+        # 3. 所有缓存未命中的城市合并为一次多坐标天气API请求
+        if pending:
+            pending_names = list(pending.keys())
+            try:
+                current_list = fetch_current_weather([pending[name][:2] for name in pending_names])
+            except requests.exceptions.RequestException:
+                current_list = []
+            
+            for index, city_name in enumerate(pending_names):
+                current_data = current_list[index] if index < len(current_list) else None
+                
+                result = None
+                if current_data:
+                    try:
+                        result = build_weather_result(city_name, current_data)
+                    except (KeyError, TypeError):
+                        result = None
+                
+                if result:
+                    store_weather(result)
+                elif city_resolver.lookup(city_name):
+                    # 如果是索引中的城市，生成模拟数据作为最后手段
+                    result = generate_mock_weather(city_name)
+                else:
+                    result = {'city': city_name, 'error': '获取天气信息失败，请稍后重试'}
+                
+                for city in pending[city_name][2]:
+                    results[city] = result
+        
+        for result in results.values():
+            if 'error' not in result:
+                popularity.record(result['city'])
+        
+        # 所有城市都是缓存或上游数据时，以各城市的获取时间作为缓存验证器
+        records = [results[city] for city in cities]
+        if all('timestamp' in record for record in records):
+            timestamps = [record['timestamp'] for record in records]
+            stale = any(record.get('stale') for record in records)
+            return conditional_response(
+                lambda: {'results': format_weather_batch(records)},
+                ('batch',) + tuple((record['city'], record['timestamp'], record.get('stale', False)) for record in records),
+                last_modified=parse_timestamp(max(timestamps)),
+                max_age=0 if stale else min(remaining_ttl(timestamp, CACHE_TTL_SECONDS) for timestamp in timestamps)
+            )
+        
+        # 错误信息原样返回，天气记录转换为带单位的展示格式
+        formatted = iter(format_weather_batch(results[city] for city in cities if 'error' not in results[city]))
+        return jsonify({'results': [
+            results[city] if 'error' in results[city] else next(formatted)
+            for city in cities
+        ]}), 200
+    except Exception as e:
+        return jsonify({'error': f'批量获取天气信息失败: {str(e)}'}), 500
+
+def stream_supported():
+    """当前工作进程是否可以保持大量/stream长连接"""
+    if STREAM_ENABLED != 'auto':
+        return STREAM_ENABLED == 'true'
+    return gevent_active()
+
+def stream_weather_updates(subscription, snapshot, last_event_id):
+    """输出Server-Sent Events：先发送订阅城市的当前缓存，之后只在缓存刷新时发送新记录，空闲时定期发送心跳
+    
+    事件id为已发送记录的最新获取时间，浏览器重连时通过Last-Event-ID带回，只补发之后的记录。
+    """
+    sent = {}
+    last_id = last_event_id
+    deadline = time.monotonic() + STREAM_MAX_DURATION
+    
+    def render(records):
+        nonlocal last_id
+        # 同一城市只发送比上次更新的记录，按获取时间排序保证事件id递增
+        records = sorted(
+            (record for record in records if record['timestamp'] > sent.get(record['city'], last_event_id)),
+            key=lambda record: record['timestamp']
+        )
+        events = []
+        for record, formatted in zip(records, format_weather_batch(records)):
+            sent[record['city']] = record['timestamp']
+            last_id = max(last_id, record['timestamp'])
+            events.append(f'id: {last_id}\nevent: weather\ndata: {app.json.dumps(formatted)}\n\n')
+        return ''.join(events)
+    
+    yield f'retry: {STREAM_RETRY_MS}\n\n' + render(snapshot)
+    while time.monotonic() < deadline:
+        records = subscription.wait(STREAM_HEARTBEAT_INTERVAL)
+        # 心跳为注释行，浏览器忽略，用于保持代理和负载均衡的连接不被空闲超时关闭
+        yield render(records) or ': ping\n\n'
+
+@app.route('/stream')
+@limiter.limit("30 per minute")
+def stream_weather():
+    """订阅多个城市的当前天气更新（Server-Sent Events），替代客户端定时轮询/weather
+    
+    一个工作进程需要同时保持大量长连接，只在gevent工作模式（或STREAM_ENABLED=true）下提供。
+    """
+    if not stream_supported():
+        return jsonify({'error': '当前服务器未启用天气推送'}), 503
+    
+    cities = parse_city_list(request.args.get('cities') or request.args.get('city') or '')
+    
+    if not cities:
+        return jsonify({'error': '请提供城市名称，多个城市用逗号分隔'}), 400
+    
+    if len(cities) > MAX_BATCH_CITIES:
+        return jsonify({'error': f'一次最多订阅{MAX_BATCH_CITIES}个城市'}), 400
+    
+    city_names = list(dict.fromkeys(normalize_city_name(city) for city in cities))
+    
+    # 先订阅再读取当前缓存，读取期间的更新不会丢失（重复的记录在输出时过滤）
+    subscription = broadcaster.subscribe(city_names)
+    snapshot = weather_db.get_cached_weather_batch(city_names, allow_stale=True)
+    for city_name, record in snapshot.items():
+        popularity.record(city_name)
+        if record['stale']:
+            # 过期数据先发送，后台刷新完成后再推送新记录
+            schedule_weather_refresh(city_name)
+    
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    response = Response(
+        stream_weather_updates(subscription, list(snapshot.values()), last_event_id),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            # 关闭nginx的响应缓冲，事件立即发送给客户端
+            'X-Accel-Buffering': 'no'
+        }
+    )
+    # 连接结束（包括客户端断开）时取消订阅
+    response.call_on_close(lambda: broadcaster.unsubscribe(subscription))
+    return response
+
+def stream_historical_weather(city_names, start_date, end_date, ndjson):
+    """逐行从数据库游标读取历史天气并分块输出，内存占用与查询范围无关"""
+    if not ndjson:
+        header = app.json.dumps({'cities': city_names, 'from': start_date, 'to': end_date})
+        # 去掉结尾的'}'，接着输出data数组
+        yield header[:-1] + ', "data": ['
+    
+    separator = '\n' if ndjson else ','
+    first = True
+    
+    def render(records):
+        # 每块记录的展示格式批量转换
+        lines = [app.json.dumps(result) for result in format_weather_batch(records)]
+        if ndjson:
+            return ''.join(line + separator for line in lines)
+        return ('' if first else separator) + separator.join(lines)
+    
+    chunk = []
+    for city_name in city_names:
+        for record in weather_db.iter_historical_weather(city_name, start_date, end_date):
+            chunk.append(record)
+            if len(chunk) >= HISTORY_STREAM_CHUNK_ROWS:
+                yield render(chunk)
+                first = False
+                chunk = []
+    
+    if chunk:
+        yield render(chunk)
+    if not ndjson:
+        yield ']}'
+
 @app.route('/historical')
 @limiter.limit("60 per minute")
 def get_historical_weather():
-    city = request.args.get('city')
+    """查询历史天气：city+date返回单日数据；from/to日期范围或多个城市时以流式JSON（format=ndjson时为NDJSON）输出"""
+    cities = parse_city_list(request.args.get('cities') or request.args.get('city') or '')
     date = request.args.get('date')
+    start_date = request.args.get('from') or date
+    end_date = request.args.get('to') or start_date
     
-    if not city:
+    if not cities:
         return jsonify({'error': '请提供城市名称'}), 400
     
-    if not date:
+    if len(cities) > MAX_BATCH_CITIES:
+        return jsonify({'error': f'一次最多查询{MAX_BATCH_CITIES}个城市'}), 400
+    
+    if not start_date:
         return jsonify({'error': '请提供查询日期，格式：YYYY-MM-DD'}), 400
     
     try:
-        # 标准化城市名称：移除'市'后缀
-        normalized_city = city.replace('市', '')
-        
-        # 使用别名（如果有）
-        city_name = city_aliases.get(normalized_city, normalized_city)
+        # 标准化城市名称：移除'市'后缀并应用别名
+        city_names = list(dict.fromkeys(normalize_city_name(city) for city in cities))
         
         # 验证日期格式
-        datetime.datetime.strptime(date, '%Y-%m-%d')
+        if datetime.datetime.strptime(start_date, '%Y-%m-%d') > datetime.datetime.strptime(end_date, '%Y-%m-%d'):
+            return jsonify({'error': '开始日期不能晚于结束日期'}), 400
         
-        # 查询历史天气数据
-        historical_data = weather_db.get_historical_weather_by_date(city_name, date)
+        # 以记录数和最后写入时间作为缓存验证器，客户端缓存有效时不查询数据
+        count, last_modified = weather_db.get_historical_version(city_names, start_date, end_date)
+        ndjson = request.args.get('format') == 'ndjson'
+        validator = ('historical', tuple(city_names), start_date, end_date, ndjson, count, last_modified)
+        
+        # 日期范围或多个城市：直接从游标流式输出
+        if start_date != end_date or len(city_names) > 1 or ndjson:
+            return conditional_response(
+                lambda: Response(
+                    stream_historical_weather(city_names, start_date, end_date, ndjson),
+                    mimetype='application/x-ndjson' if ndjson else 'application/json'
+                ),
+                validator,
+                last_modified=parse_timestamp(last_modified),
+                max_age=history_max_age(end_date)
+            )
         
-        if not historical_data:
-            return jsonify({'error': f'未找到{city}在{date}的历史天气数据'}), 404
+        if not count:
+            return jsonify({'error': f'未找到{cities[0]}在{start_date}的历史天气数据'}), 404
         
-        return jsonify({'city': city_name, 'date': date, 'data': historical_data}), 200
+        # 查询历史天气数据
+        city_name = city_names[0]
+        return conditional_response(
+            lambda: {
+                'city': city_name,
+                'date': start_date,
+                'data': format_weather_batch(weather_db.get_historical_weather_by_date(city_name, start_date))
+            },
+            validator,
+            last_modified=parse_timestamp(last_modified),
+            max_age=history_max_age(end_date)
+        )
         
     except ValueError:
         return jsonify({'error': '日期格式错误，请使用YYYY-MM-DD格式'}), 400
     except Exception as e:
         return jsonify({'error': f'查询历史天气失败: {str(e)}'}), 500
 
-@app.route('/weekly-forecast')
+@app.route('/historical/summary')
 @limiter.limit("60 per minute")
-def get_weekly_forecast():
+def get_historical_summary():
+    """按日或按周返回历史天气汇总（最低/最高/平均温度、湿度、AQI和主要天气），数据来自预先汇总的表"""
     city = request.args.get('city')
     if not city:
         return jsonify({'error': '请提供城市名称'}), 400
-
+    
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in ('day', 'week'):
+        return jsonify({'error': '汇总粒度必须是day或week'}), 400
+    
     try:
-        # 标准化城市名称：移除'市'后缀
-        normalized_city = city.replace('市', '')
-        
-        # 使用别名（如果有）
-        city_name = city_aliases.get(normalized_city, normalized_city)
-        
-        # 首先检查是否在城市坐标映射表中
-        if city_name in city_coordinates:
-            location = city_coordinates[city_name]
-            latitude = location['latitude']
-            longitude = location['longitude']
-            city_name = location['name']
+        # 默认查询截至今天的最近30天
+        end_date = datetime.datetime.strptime(
+            request.args.get('to') or datetime.date.today().strftime('%Y-%m-%d'), '%Y-%m-%d'
+        ).date()
+        if request.args.get('from'):
+            start_date = datetime.datetime.strptime(request.args.get('from'), '%Y-%m-%d').date()
         else:
-            # 如果不在映射表中，调用地理编码API
-            geo_params = {
-                'name': city_name,
-                'country': 'CN',  # 指定中国
-                'count': 5,  # 获取更多结果
-                'language': 'zh'
-            }
-            
-            # 增加超时时间并添加重试机制
-            max_retries = 3
-            retry_delay = 1
-            geo_response = None
-            
-            for retry in range(max_retries):
-                try:
-                    geo_response = requests.get(GEOCODING_API_URL, params=geo_params, timeout=10)
-                    geo_response.raise_for_status()
-                    break  # 成功获取响应，跳出循环
-                except requests.exceptions.RequestException as e:
-                    if retry == max_retries - 1:
-                        raise  # 最后一次重试失败，抛出异常
-                    time.sleep(retry_delay)  # 等待一段时间后重试
-            geo_data = geo_response.json()
-            
-            if not geo_data.get('results'):
-                return jsonify({'error': '未找到该城市，请确认城市名称是否正确'}), 404
-            
-            # 获取经纬度
-            location = geo_data['results'][0]
-            latitude = location['latitude']
-            longitude = location['longitude']
-            city_name = location['name']
+            start_date = end_date - datetime.timedelta(days=SUMMARY_DEFAULT_DAYS - 1)
+    except ValueError:
+        return jsonify({'error': '日期格式错误，请使用YYYY-MM-DD格式'}), 400
+    
+    if start_date > end_date:
+        return jsonify({'error': '开始日期不能晚于结束日期'}), 400
+    if (end_date - start_date).days >= MAX_SUMMARY_DAYS:
+        return jsonify({'error': f'一次最多查询{MAX_SUMMARY_DAYS}天'}), 400
+    
+    try:
+        city_name = normalize_city_name(city)
+        start, end = start_date.isoformat(), end_date.isoformat()
+        count, last_modified = weather_db.get_historical_version([city_name], start, end)
         
-        # 最终标准化：确保存储的城市名称没有'市'后缀
-        city_name = city_name.replace('市', '')
+        def build():
+            summary = weather_db.get_historical_summary(city_name, start, end, granularity)
+            summary['weather'] = weather_texts(summary['weather_code']).tolist()
+            return {
+                'city': city_name,
+                'from': start,
+                'to': end,
+                'granularity': granularity,
+                'count': len(summary['period']),
+                'series': summary
+            }
         
-        # 调用Open-Meteo API获取未来一周天气预报
-        weather_params = {
-            'latitude': latitude,
-            'longitude': longitude,
-            'daily': 'temperature_2m_max,temperature_2m_min,apparent_temperature_max,apparent_temperature_min,precipitation_sum,wind_speed_10m_max',
-            'timezone': 'Asia/Shanghai',
-            'forecast_days': 7  # 未来7天
-        }
+        return conditional_response(
+            build,
+            ('summary', city_name, start, end, granularity, count, last_modified),
+            last_modified=parse_timestamp(last_modified),
+            max_age=history_max_age(end)
+        )
+    except Exception as e:
+        return jsonify({'error': f'查询历史天气汇总失败: {str(e)}'}), 500
+
+@app.route('/historical/export')
+@limiter.limit("10 per minute")
+def export_historical_weather():
+    """导出指定城市某个月的历史天气，返回压缩的NumPy列式文件（.npz），可用history_archive.py导入"""
+    city = request.args.get('city')
+    month = request.args.get('month')
+    
+    if not city:
+        return jsonify({'error': '请提供城市名称'}), 400
+    
+    try:
+        # 查询范围和文件名使用规范化的月份（strptime也接受2025-1这样的写法）
+        month = datetime.datetime.strptime(month or '', '%Y-%m').strftime('%Y-%m')
+    except ValueError:
+        return jsonify({'error': '请提供导出月份，格式：YYYY-MM'}), 400
+    
+    try:
+        city_name = normalize_city_name(city)
+        count, last_modified = weather_db.get_historical_version([city_name], f'{month}-01', f'{month}-31')
+        if not count:
+            return jsonify({'error': f'未找到{city}在{month}的历史天气数据'}), 404
         
-        # 增加超时时间并添加重试机制
-        max_retries = 3
-        retry_delay = 1
-        weather_response = None
+        filename = urllib.parse.quote(archive_filename(city_name, month).replace(os.sep, '_'))
+        return conditional_response(
+            lambda: Response(export_partition(weather_db, city_name, month), mimetype='application/octet-stream', headers={
+                'Content-Disposition': f"attachment; filename*=UTF-8''{filename}"
+            }),
+            ('export', city_name, month, count, last_modified),
+            last_modified=parse_timestamp(last_modified),
+            max_age=history_max_age(f'{month}-31')
+        )
+    except Exception as e:
+        return jsonify({'error': f'导出历史天气失败: {str(e)}'}), 500
+
+@app.route('/weekly-forecast')
+@limiter.limit("60 per minute")
+def get_weekly_forecast():
+    city = request.args.get('city')
+    if not city:
+        return jsonify({'error': '请提供城市名称'}), 400
+    
+    # 预报天数，默认未来7天
+    try:
+        forecast_days = int(request.args.get('days', DEFAULT_FORECAST_DAYS))
+    except ValueError:
+        return jsonify({'error': '预报天数必须是整数'}), 400
+    if not 1 <= forecast_days <= MAX_FORECAST_DAYS:
+        return jsonify({'error': f'预报天数必须在1到{MAX_FORECAST_DAYS}之间'}), 400
+    
+    try:
+        # 解析城市经纬度
+        location = resolve_city_location(city)
+        if location is None:
+            return jsonify({'error': '未找到该城市，请确认城市名称是否正确'}), 404
+        city_name, latitude, longitude = location
+        popularity.record(city_name)
         
-        for retry in range(max_retries):
-            try:
-                weather_response = requests.get(WEATHER_API_URL, params=weather_params, timeout=10)
-                weather_response.raise_for_status()
-                break  # 成功获取响应，跳出循环
-            except requests.exceptions.RequestException as e:
-                if retry == max_retries - 1:
-                    raise  # 最后一次重试失败，抛出异常
-                time.sleep(retry_delay)  # 等待一段时间后重试
-        weather_data = weather_response.json()
+        # 从预报缓存获取数据，未命中时调用天气API（同一城市的并发请求合并为一次）
+        forecast = load_daily_forecast(city_name, latitude, longitude, forecast_days)
         
-        if not weather_data.get('daily'):
+        if forecast is None:
             return jsonify({'error': '获取天气信息失败: 数据格式错误'}), 400
+        forecast_data, timestamp = forecast
         
-        # 提取未来一周天气数据
-        daily_data = weather_data['daily']
-        
-        # 格式化输出
-        forecast_data = []
-        for i in range(len(daily_data['time'])):
-            forecast_data.append({
-                'date': daily_data['time'][i],
-                'max_temp': daily_data['temperature_2m_max'][i],
-                'min_temp': daily_data['temperature_2m_min'][i],
-                'max_apparent_temp': daily_data['apparent_temperature_max'][i],
-                'min_apparent_temp': daily_data['apparent_temperature_min'][i],
-                'precipitation': daily_data['precipitation_sum'][i],
-                'wind_speed_max': daily_data['wind_speed_10m_max'][i]
-            })
-        
-        result = {
-            'city': city_name,
-            'forecast': forecast_data
-        }
-        
-        return jsonify(result), 200
+        # 以预报的写入时间作为缓存验证器，有效期为预报缓存的剩余有效期
+        return conditional_response(
+            lambda: {
+                'city': city_name,
+                'forecast': forecast_data
+            },
+            ('forecast', city_name, forecast_days, timestamp),
+            last_modified=parse_timestamp(timestamp),
+            max_age=remaining_ttl(timestamp, FORECAST_TTL_SECONDS)
+        )
         
     except requests.exceptions.Timeout:
         return jsonify({'error': '网络连接超时，请稍后重试'}), 500
@@ -496,11 +1027,71 @@ def health_check():
     """健康检查端点"""
     return jsonify({'status': 'ok', 'message': 'Weather App is running'}), 200
 
+@app.route('/cache-stats')
+def get_cache_stats():
+    """获取进程内热点缓存的统计信息"""
+    return jsonify({
+        'weather': weather_db.hot_cache.stats(),
+        'geocode': weather_db.geocode_cache.stats(),
+        'forecast': weather_db.forecast_cache.stats(),
+        'singleflight': weather_fetches.stats(),
+        'writer': weather_db.writer.stats() if weather_db.writer else None,
+        'prefetch': prefetcher.stats(),
+        'popularity': popularity.stats(),
+        'stream': broadcaster.stats()
+    }), 200
+
+@app.route('/db-stats')
+def get_db_stats():
+    """获取数据库各表大小和最近一次清理结果"""
+    return jsonify({
+        'database': weather_db.get_table_stats(),
+        'maintenance': maintenance_scheduler.stats()
+    }), 200
+
 @app.route('/popular-cities')
 def get_popular_cities():
-    """获取热门城市列表"""
+    """获取按请求热度排序的热门城市列表，从进程内的排名缓存读取"""
     try:
-        popular_cities = weather_db.get_popular_cities()
-        return jsonify({'cities': popular_cities}), 200
+        limit = int(request.args.get('limit', POPULAR_CITIES_LIMIT))
+    except ValueError:
+        return jsonify({'error': '城市数量必须是整数'}), 400
+    limit = max(1, min(limit, popularity.ranking_size))
+    
+    try:
+        popular_cities = popularity.top(limit)
+        # 排名在下次写入热度时才会变化
+        updated_at = popularity.ranking_updated_at
+        return conditional_response(
+            lambda: {'cities': popular_cities},
+            ('popular', tuple(popular_cities)),
+            last_modified=datetime.datetime.fromtimestamp(updated_at, datetime.timezone.utc),
+            max_age=popularity.flush_interval - (time.time() - updated_at)
+        )
     except Exception as e:
         return jsonify({'error': f'获取热门城市列表失败: {str(e)}'}), 500
+
+@app.route('/cities/suggest')
+@limiter.limit("120 per minute")
+def suggest_cities():
+    """城市输入联想，支持名称、拼音和拼音首字母前缀，只查询内存中的索引"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': '请提供查询关键字'}), 400
+    try:
+        limit = int(request.args.get('limit', SUGGEST_SIZE))
+    except ValueError:
+        return jsonify({'error': '城市数量必须是整数'}), 400
+    limit = max(1, min(limit, SUGGEST_SIZE))
+    
+    cities = [
+        {
+            'name': city['name'],
+            'full_name': city['full_name'],
+            'province': city['province'],
+            'latitude': city['latitude'],
+            'longitude': city['longitude']
+        }
+        for city in city_resolver.suggest(query, limit)
+    ]
+    return jsonify({'query': query, 'cities': cities}), 200
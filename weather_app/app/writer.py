@@ -0,0 +1,151 @@
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+
+class _FlushRequest:
+    """立即写入请求，写入完成后通知等待方"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class WriteBehindQueue:
+    """延迟批量写入队列：写操作先放入内存队列，由后台线程合并为一个事务写入数据库
+    
+    每隔flush_interval秒或积累max_batch条写操作时写入一次，按提交顺序执行，连续的相同SQL语句
+    使用executemany批量执行。请求线程不再等待磁盘同步，写入吞吐随批量大小提升。
+    """
+    
+    def __init__(self, connect, flush_interval=0.2, max_batch=500, run=None):
+        self._connect = connect
+        # 执行写入的方式（如gevent模式下放到数据库线程中执行），默认在后台线程中直接执行
+        self._run_blocking = run or (lambda fn, *args: fn(*args))
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        
+        # 已写入的操作数、写入批次数和失败（丢弃）的操作数
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+        
+        # 进程退出时写入剩余数据
+        atexit.register(self.flush)
+    
+    def _ensure_started(self):
+        """启动后台写入线程，gunicorn fork出的工作进程中会重新启动"""
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == pid and self._thread.is_alive():
+                return
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name='weather-write-behind', daemon=True)
+            self._thread.start()
+    
+    def submit(self, sql, params):
+        """提交一条写操作，立即返回"""
+        self._ensure_started()
+        self._queue.put((sql, params))
+    
+    def flush(self, timeout=10):
+        """等待队列中已有的写操作全部写入数据库"""
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        request = _FlushRequest()
+        self._queue.put(request)
+        request.done.wait(timeout)
+    
+    def pending(self):
+        """队列中等待写入的操作数量（近似值）"""
+        return self._queue.qsize()
+    
+    def stats(self):
+        """返回写入统计信息"""
+        return {
+            'pending': self.pending(),
+            'written': self.written,
+            'batches': self.batches,
+            'errors': self.errors,
+            'flush_interval': self.flush_interval,
+            'max_batch': self.max_batch
+        }
+    
+    def _run(self):
+        """后台线程：收集一批写操作后在一个事务中写入"""
+        while True:
+            item = self._queue.get()
+            batch = []
+            flush_requests = []
+            deadline = time.monotonic() + self.flush_interval
+            
+            while True:
+                if isinstance(item, _FlushRequest):
+                    # 收到立即写入请求，不再等待更多数据
+                    flush_requests.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.max_batch:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            
+            if batch:
+                self._run_blocking(self._write_batch, batch)
+            for request in flush_requests:
+                request.done.set()
+    
+    def _write_batch(self, batch):
+        """在一个事务中按提交顺序写入，连续的相同SQL语句合并为一次executemany
+        
+        事务失败时回滚并逐条重新写入，只丢弃出错的写操作。
+        """
+        groups = []
+        for sql, params in batch:
+            if groups and groups[-1][0] == sql:
+                groups[-1][1].append(params)
+            else:
+                groups.append((sql, [params]))
+        
+        conn = self._connect()
+        if not conn:
+            self.errors += len(batch)
+            return
+        
+        try:
+            cursor = conn.cursor()
+            for sql, rows in groups:
+                cursor.executemany(sql, rows)
+            conn.commit()
+            self.written += len(batch)
+            self.batches += 1
+        except sqlite3.Error as e:
+            print(f"批量写入数据库失败，改为逐条写入: {e}")
+            conn.rollback()
+            self._write_one_by_one(conn, batch)
+    
+    def _write_one_by_one(self, conn, batch):
+        """逐条写入并提交，失败的写操作记录日志后丢弃"""
+        for sql, params in batch:
+            try:
+                conn.execute(sql, params)
+                conn.commit()
+                self.written += 1
+            except sqlite3.Error as e:
+                print(f"写入数据库失败，已丢弃: {e}: {' '.join(sql.split())} {params!r}")
+                conn.rollback()
+                self.errors += 1
+        self.batches += 1
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# 数据库访问微基准：对比"每次查询新建连接 + 默认回滚日志"与"线程长连接 + WAL"的单次请求开销，
+# 以及延迟批量写入在不同批量大小下的写入吞吐
+#
+# 使用方法：
+#   python bench_db.py --reads 5000 --writes 1000 --batch-sizes 1 10 100 500
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+BENCH_DIR = tempfile.mkdtemp(prefix='weather_bench_')
+os.environ['WEATHER_DB_PATH'] = os.path.join(BENCH_DIR, 'after.db')
+
+from app.cache import TTLCache
+from app.database import WeatherDatabase
+from app.formatting import format_weather
+from app.writer import WriteBehindQueue
+
+BEFORE_DB_PATH = os.path.join(BENCH_DIR, 'before.db')
+
+SAMPLE_WEATHER = {
+    'city': '北京',
+    'temperature_c': 23.4,
+    'humidity_pct': 56,
+    'pressure_hpa': 1012.3,
+    'visibility_km': 24.0,
+    'wind_level': 3,
+    'wind_speed_kmh': 18.2,
+    'wind_deg': 135,
+    'weather_code': 2,
+    'aqi': 80
+}
+
+# 优化前的表结构保存带单位的展示字符串
+LEGACY_SAMPLE_WEATHER = format_weather(SAMPLE_WEATHER)
+
+
+def legacy_get_cached_weather(city):
+    """优化前的实现：每次查询都打开新连接"""
+    conn = sqlite3.connect(BEFORE_DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT city, temperature, humidity, weather, wind, wind_dir, pressure, visibility, aqi, timestamp
+        FROM weather_cache
+        WHERE city = ? AND timestamp >= datetime('now', '-1 hours')
+        ORDER BY timestamp DESC
+        LIMIT 1
+    ''', (city,))
+    row = cursor.fetchone()
+    conn.close()
+    return row
+
+
+def legacy_save_weather(weather_data):
+    """优化前的实现：每次写入都打开新连接并单独提交"""
+    conn = sqlite3.connect(BEFORE_DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO weather_cache (city, temperature, humidity, weather, wind, wind_dir, pressure, visibility, aqi)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        weather_data['city'],
+        weather_data['temperature'],
+        weather_data['humidity'],
+        weather_data['weather'],
+        weather_data['wind'],
+        weather_data['wind_dir'],
+        weather_data['pressure'],
+        weather_data['visibility'],
+        weather_data['aqi']
+    ))
+    conn.commit()
+    conn.close()
+
+
+def setup_before_db():
+    """创建优化前的数据库（默认回滚日志模式）"""
+    conn = sqlite3.connect(BEFORE_DB_PATH)
+    conn.execute('''
+        CREATE TABLE weather_cache (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            city TEXT NOT NULL,
+            temperature TEXT,
+            humidity TEXT,
+            weather TEXT,
+            wind TEXT,
+            wind_dir TEXT,
+            pressure TEXT,
+            visibility TEXT,
+            aqi REAL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX idx_cache_city_timestamp ON weather_cache (city, timestamp)')
+    conn.commit()
+    conn.close()
+
+
+def measure(label, fn, count):
+    """执行count次fn，返回每次的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(count):
+        fn()
+    elapsed = time.perf_counter() - start
+    per_op = elapsed / count * 1e6
+    print(f"  {label:<28} {per_op:9.1f} 微秒/次")
+    return per_op
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据库访问微基准')
+    parser.add_argument('--reads', type=int, default=5000, help='读取次数')
+    parser.add_argument('--writes', type=int, default=1000, help='写入次数')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 100, 500], help='延迟批量写入的批量大小')
+    args = parser.parse_args()
+    
+    setup_before_db()
+    db = WeatherDatabase()
+    # 关闭进程内热点缓存和延迟批量写入，只测量SQLite访问本身
+    db.hot_cache = TTLCache(maxsize=0)
+    writer = db.writer
+    db.writer = None
+    
+    legacy_save_weather(LEGACY_SAMPLE_WEATHER)
+    db.save_weather(SAMPLE_WEATHER)
+    
+    print(f"数据库目录: {BENCH_DIR}")
+    print(f"\n读取（get_cached_weather，{args.reads}次）")
+    before_read = measure('优化前：每次新建连接', lambda: legacy_get_cached_weather('北京'), args.reads)
+    after_read = measure('优化后：线程长连接 + WAL', lambda: db.get_cached_weather('北京'), args.reads)
+    
+    print(f"\n写入（save_weather，{args.writes}次）")
+    before_write = measure('优化前：每次新建连接', lambda: legacy_save_weather(LEGACY_SAMPLE_WEATHER), args.writes)
+    after_write = measure('优化后：线程长连接 + WAL', lambda: db.save_weather(SAMPLE_WEATHER), args.writes)
+    
+    print(f"\n读取加速 {before_read / after_read:.1f} 倍，写入加速 {before_write / after_write:.1f} 倍")
+    
+    print(f"\n延迟批量写入（save_weather + save_historical_weather，{args.writes}次）")
+    for batch_size in args.batch_sizes:
+        db.writer = WriteBehindQueue(db.connect, flush_interval=writer.flush_interval, max_batch=batch_size)
+        start = time.perf_counter()
+        for _ in range(args.writes):
+            db.save_weather(SAMPLE_WEATHER)
+            db.save_historical_weather(SAMPLE_WEATHER)
+        submit_elapsed = time.perf_counter() - start
+        db.flush_writes()
+        elapsed = time.perf_counter() - start
+        rows = args.writes * 2
+        print(f"  批量大小 {batch_size:<5} 请求线程 {submit_elapsed / args.writes * 1e6:6.1f} 微秒/次，"
+              f"写入吞吐 {rows / elapsed:9.0f} 行/秒，事务 {db.writer.batches} 个")
+
+
+if __name__ == '__main__':
+    main()
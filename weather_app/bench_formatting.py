@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# 天气展示字段转换基准：对比优化前每条记录重建映射表、逐个比较风向和逐级查找风力等级的实现，
+# 与app.formatting中基于模块级查找表的逐条转换和NumPy批量转换
+#
+# 使用方法：
+#   python bench_formatting.py --rows 100000
+import argparse
+import time
+import numpy as np
+from app.formatting import (format_weather, format_weather_batch, weather_text, weather_texts,
+                            wind_direction_text, wind_direction_texts, wind_speed_to_level,
+                            wind_speed_to_levels)
+
+
+def legacy_convert(weather_code, wind_dir_deg, wind_speed_kmh):
+    """优化前的实现：每次调用都重建天气状况、风向和风力等级表"""
+    weather_conditions = {
+        0: '晴朗', 1: '晴间多云', 2: '多云', 3: '阴', 45: '雾', 48: '霾',
+        51: '小雨', 53: '中雨', 55: '大雨', 56: '冻雨', 57: '冻雨',
+        61: '小雨', 63: '中雨', 65: '大雨', 66: '冻雨', 67: '冻雨',
+        71: '小雪', 73: '中雪', 75: '大雪', 77: '雪粒',
+        80: '阵雨', 81: '阵雨', 82: '强阵雨', 85: '阵雪', 86: '阵雪'
+    }
+    weather = weather_conditions.get(weather_code, '未知')
+    
+    wind_directions = {
+        0: '北', 45: '东北', 90: '东', 135: '东南', 180: '南',
+        225: '西南', 270: '西', 315: '西北', 360: '北'
+    }
+    closest_dir = min(wind_directions.keys(), key=lambda x: abs(x - wind_dir_deg))
+    wind_dir = wind_directions[closest_dir]
+    
+    wind_speed_mps = wind_speed_kmh / 3.6
+    wind_levels = [(0.3, 0), (1.6, 1), (3.4, 2), (5.5, 3), (8.0, 4),
+                   (10.8, 5), (13.9, 6), (17.2, 7), (20.8, 8), (24.5, 9),
+                   (28.5, 10), (32.7, 11), (float('inf'), 12)]
+    wind_level = 0
+    for speed, level in wind_levels:
+        if wind_speed_mps < speed:
+            wind_level = level
+            break
+    return weather, wind_dir, wind_level
+
+
+def generate_observations(rows, seed=0):
+    """生成随机观测数据：天气代码、风向（度）、风速（千米/小时）"""
+    rng = np.random.default_rng(seed)
+    codes = rng.choice([0, 1, 2, 3, 45, 48, 51, 61, 63, 65, 71, 80, 95], size=rows)
+    degs = rng.integers(0, 361, size=rows)
+    speeds = np.round(rng.gamma(2.0, 8.0, size=rows), 1)
+    return codes, degs, speeds
+
+
+def measure(label, fn, rows):
+    """执行一次fn，打印并返回每条记录的平均耗时（微秒）"""
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    per_row = elapsed / rows * 1e6
+    print(f"  {label:<28} {elapsed * 1000:9.1f} 毫秒  {per_row:7.3f} 微秒/条")
+    return per_row, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='天气展示字段转换基准')
+    parser.add_argument('--rows', type=int, default=100000, help='观测数据条数')
+    args = parser.parse_args()
+    
+    codes, degs, speeds = generate_observations(args.rows)
+    code_list, deg_list, speed_list = codes.tolist(), degs.tolist(), speeds.tolist()
+    
+    print(f"天气状况、风向、风力等级转换（{args.rows}条）")
+    before, legacy = measure('优化前：逐条重建映射表', lambda: [
+        legacy_convert(code, deg, speed) for code, deg, speed in zip(code_list, deg_list, speed_list)
+    ], args.rows)
+    scalar, converted = measure('逐条：模块级查找表', lambda: [
+        (weather_text(code), wind_direction_text(deg), wind_speed_to_level(speed))
+        for code, deg, speed in zip(code_list, deg_list, speed_list)
+    ], args.rows)
+    vectorized, arrays = measure('批量：NumPy向量化', lambda: (
+        weather_texts(codes), wind_direction_texts(degs), wind_speed_to_levels(speeds)
+    ), args.rows)
+    
+    # 三种实现的结果必须一致
+    assert converted == legacy
+    assert list(zip(arrays[0].tolist(), arrays[1].tolist(), arrays[2].tolist())) == legacy
+    print(f"\n逐条加速 {before / scalar:.1f} 倍，批量加速 {before / vectorized:.1f} 倍")
+    
+    records = [
+        {'city': '北京', 'temperature_c': 20.0, 'humidity_pct': 50, 'pressure_hpa': 1012.0, 'visibility_km': 20.0,
+         'wind_level': level, 'wind_speed_kmh': speed, 'wind_deg': deg, 'weather_code': code, 'aqi': 80}
+        for code, deg, speed, level in zip(code_list, deg_list, speed_list, arrays[2].tolist())
+    ]
+    print(f"\n天气记录转换为展示格式（{args.rows}条）")
+    scalar_format, formatted = measure('逐条：format_weather', lambda: [format_weather(record) for record in records], args.rows)
+    batch_format, batch_formatted = measure('批量：format_weather_batch', lambda: format_weather_batch(records), args.rows)
+    assert batch_formatted == formatted
+    print(f"\n批量加速 {scalar_format / batch_format:.1f} 倍")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,24 @@
 # Gunicorn 配置文件
+import os
 
 # 绑定地址和端口
 bind = '0.0.0.0:5000'
 
 # 工作进程数（推荐为CPU核心数 * 2 + 1）
-workers = 3
+workers = int(os.getenv('GUNICORN_WORKERS', 3))
 
 # 工作模式（sync, gevent, eventlet等）
-worker_class = 'sync'
+# sync模式下每个工作进程同一时间只能处理一个请求，上游API较慢时会阻塞整个进程；
+# 设置 GUNICORN_WORKER_CLASS=gevent（需安装gevent）后，gunicorn会对socket、ssl、threading
+# 等模块打补丁，requests的上游请求在等待网络时自动让出，一个进程可同时处理大量请求
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+
+# gevent模式下每个工作进程的最大并发连接数
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# 长连接保持时间（秒），只对gevent等异步工作模式生效；
+# 需大于nginx upstream的keepalive_timeout，由nginx先关闭空闲连接，避免复用已被关闭的连接
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 75))
 
 # 最大请求数（防止内存泄漏）
 max_requests = 1000
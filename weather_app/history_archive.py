@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# 历史天气归档工具：按城市和月份将historical_weather导出为压缩的NumPy列式文件（.npz），
+# 或将归档文件批量导入数据库（一个事务 + executemany）
+#
+# 使用方法：
+#   python history_archive.py export --out archive/ [--city 北京]
+#   python history_archive.py import archive/北京/*.npz
+import argparse
+import glob
+import os
+import time
+from app.archive import export_history, import_history
+from app.database import DB_PATH, WeatherDatabase
+
+
+def directory_size(path):
+    """统计目录下所有文件的大小（字节）"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='历史天气归档工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    export_parser = subparsers.add_parser('export', help='导出历史天气')
+    export_parser.add_argument('--out', required=True, help='输出目录')
+    export_parser.add_argument('--city', help='只导出指定城市')
+    
+    import_parser = subparsers.add_parser('import', help='导入归档文件')
+    import_parser.add_argument('paths', nargs='+', help='归档文件或目录')
+    
+    args = parser.parse_args()
+    db = WeatherDatabase()
+    start = time.perf_counter()
+    
+    if args.command == 'export':
+        exported = export_history(db, args.out, args.city)
+        elapsed = time.perf_counter() - start
+        rows = sum(count for _, count in exported)
+        print(f"导出 {len(exported)} 个文件，{rows} 行，耗时 {elapsed:.2f}s")
+        print(f"归档大小 {directory_size(args.out) / 1024 / 1024:.2f}MB，"
+              f"数据库大小 {os.path.getsize(DB_PATH) / 1024 / 1024:.2f}MB")
+    else:
+        paths = []
+        for path in args.paths:
+            if os.path.isdir(path):
+                paths.extend(sorted(glob.glob(os.path.join(path, '**', '*.npz'), recursive=True)))
+            else:
+                paths.append(path)
+        rows = import_history(db, paths)
+        elapsed = time.perf_counter() - start
+        print(f"导入 {len(paths)} 个文件，{rows} 行，耗时 {elapsed:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
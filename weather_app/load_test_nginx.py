@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# Nginx微缓存压力测试：对比直接访问gunicorn与经过nginx（使用项目中的nginx.conf）时热门接口的吞吐量
+#
+# 启动本地模拟上游服务器、gunicorn和nginx（nginx.conf中的端口、缓存目录和日志路径替换为临时值），
+# 先预热缓存，再用--concurrency个客户端线程在--duration秒内循环请求热门城市的
+# /weather、/weekly-forecast和/popular-cities，统计每秒请求数、延迟和nginx缓存命中情况。
+#
+# 使用方法：
+#   python load_test_nginx.py --concurrency 50 --duration 10 --targets gunicorn nginx
+#   python load_test_nginx.py --nginx-bin /usr/sbin/nginx --worker-class gevent
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+import requests
+from load_test_workers import free_port, wait_for_health
+from stub_upstream import start_stub_server
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 压测请求的城市
+CITIES = ['北京', '上海', '广州', '深圳', '杭州', '成都', '武汉', '西安', '重庆', '南京']
+
+
+def start_gunicorn(port, stub_url, db_dir, worker_class, workers):
+    """启动gunicorn（不加载gunicorn.conf.py中的后台运行和日志配置）"""
+    env = dict(os.environ)
+    env.update({
+        'GEOCODING_API_URL': f'{stub_url}/v1/search',
+        'WEATHER_API_URL': f'{stub_url}/v1/forecast',
+        'WEATHER_DB_PATH': os.path.join(db_dir, 'weather_cache.db'),
+        'RATELIMIT_ENABLED': 'false',
+        'PREFETCH_ENABLED': 'false'
+    })
+    return subprocess.Popen([
+        sys.executable, '-m', 'gunicorn',
+        '--config', os.devnull,
+        '--workers', str(workers),
+        '--worker-class', worker_class,
+        '--keep-alive', '75',
+        '--bind', f'127.0.0.1:{port}',
+        'app:app'
+    ], cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def render_nginx_conf(nginx_port, app_port, prefix):
+    """基于项目中的nginx.conf生成本地测试配置"""
+    with open(os.path.join(APP_DIR, 'nginx.conf'), encoding='utf-8') as f:
+        site = f.read()
+    site = (site
+            .replace('server 127.0.0.1:5000;', f'server 127.0.0.1:{app_port};')
+            .replace('listen 80;', f'listen 127.0.0.1:{nginx_port};')
+            .replace('/var/cache/nginx/weather_app', os.path.join(prefix, 'cache'))
+            .replace('/var/www/weather_app/', APP_DIR + os.sep)
+            .replace('/var/log/nginx/', os.path.join(prefix, 'logs') + os.sep))
+    return f'''
+worker_processes auto;
+pid {os.path.join(prefix, 'nginx.pid')};
+error_log {os.path.join(prefix, 'logs', 'error.log')} warn;
+events {{
+    worker_connections 4096;
+}}
+http {{
+    client_body_temp_path {os.path.join(prefix, 'tmp')};
+    proxy_temp_path {os.path.join(prefix, 'tmp')};
+    access_log off;
+{site}
+}}
+'''
+
+
+def start_nginx(nginx_bin, nginx_port, app_port, prefix):
+    """使用生成的配置启动nginx（前台运行）"""
+    for name in ('cache', 'logs', 'tmp'):
+        os.makedirs(os.path.join(prefix, name), exist_ok=True)
+    conf_path = os.path.join(prefix, 'nginx.conf')
+    with open(conf_path, 'w', encoding='utf-8') as f:
+        f.write(render_nginx_conf(nginx_port, app_port, prefix))
+    return subprocess.Popen([nginx_bin, '-p', prefix, '-c', conf_path, '-g', 'daemon off;'],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def random_path():
+    """随机选择一个热门接口请求"""
+    city = random.choice(CITIES)
+    return random.choice([
+        ('/weather', {'city': city}),
+        ('/weather', {'city': city}),
+        ('/weekly-forecast', {'city': city}),
+        ('/popular-cities', {})
+    ])
+
+
+def run_load(base_url, concurrency, duration):
+    """concurrency个线程各自使用长连接会话循环请求duration秒"""
+    latencies = []
+    statuses = Counter()
+    cache_statuses = Counter()
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    
+    def client():
+        session = requests.Session()
+        local_latencies = []
+        local_statuses = Counter()
+        local_cache = Counter()
+        while time.perf_counter() < deadline:
+            path, params = random_path()
+            start = time.perf_counter()
+            try:
+                response = session.get(base_url + path, params=params, timeout=10)
+                local_statuses[response.status_code] += 1
+                local_cache[response.headers.get('X-Cache-Status', '-')] += 1
+            except requests.exceptions.RequestException:
+                local_statuses['error'] += 1
+            local_latencies.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local_latencies)
+            statuses.update(local_statuses)
+            cache_statuses.update(local_cache)
+    
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'p50': latencies[len(latencies) // 2] * 1000 if latencies else 0,
+        'p99': latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0,
+        'statuses': dict(statuses),
+        'cache': dict(cache_statuses)
+    }
+
+
+def warm_up(base_url):
+    """预热应用缓存：每个城市请求一次当前天气和逐日预报"""
+    for city in CITIES:
+        requests.get(f'{base_url}/weather', params={'city': city}, timeout=30)
+        requests.get(f'{base_url}/weekly-forecast', params={'city': city}, timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Nginx微缓存压力测试')
+    parser.add_argument('--concurrency', type=int, default=50, help='客户端线程数')
+    parser.add_argument('--duration', type=float, default=10, help='每轮压测的持续时间（秒）')
+    parser.add_argument('--targets', nargs='+', default=['gunicorn', 'nginx'], choices=['gunicorn', 'nginx'],
+                        help='要测试的访问方式')
+    parser.add_argument('--nginx-bin', default=shutil.which('nginx') or 'nginx', help='nginx可执行文件路径')
+    parser.add_argument('--worker-class', default='sync', help='gunicorn工作模式')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn工作进程数')
+    args = parser.parse_args()
+    
+    server, state = start_stub_server()
+    stub_url = f'http://127.0.0.1:{server.server_port}'
+    prefix = tempfile.mkdtemp(prefix='weather_nginx_')
+    app_port = free_port()
+    processes = [start_gunicorn(app_port, stub_url, prefix, args.worker_class, args.workers)]
+    
+    try:
+        app_url = f'http://127.0.0.1:{app_port}'
+        if not wait_for_health(app_url):
+            print("gunicorn启动失败")
+            return
+        warm_up(app_url)
+        
+        urls = {'gunicorn': app_url}
+        if 'nginx' in args.targets:
+            if not shutil.which(args.nginx_bin):
+                print(f"未找到nginx（{args.nginx_bin}），跳过nginx测试")
+            else:
+                nginx_port = free_port()
+                processes.append(start_nginx(args.nginx_bin, nginx_port, app_port, prefix))
+                urls['nginx'] = f'http://127.0.0.1:{nginx_port}'
+                if not wait_for_health(urls['nginx']):
+                    print(f"nginx启动失败，日志目录: {os.path.join(prefix, 'logs')}")
+                    urls.pop('nginx')
+        
+        print(f"客户端线程: {args.concurrency}，持续时间: {args.duration}s，"
+              f"gunicorn: {args.workers}个{args.worker_class}工作进程")
+        print("=" * 70)
+        results = {}
+        for target in args.targets:
+            if target not in urls:
+                continue
+            upstream_before = state.requests
+            result = run_load(urls[target], args.concurrency, args.duration)
+            results[target] = result
+            print(f"[{target:>8}] {result['requests']} 个请求，{result['rps']:.0f} 请求/秒，"
+                  f"延迟 p50 {result['p50']:.1f}ms p99 {result['p99']:.1f}ms，"
+                  f"状态码 {result['statuses']}，上游请求 {state.requests - upstream_before} 次")
+            if target == 'nginx':
+                print(f"           缓存状态 {result['cache']}")
+        
+        if 'gunicorn' in results and 'nginx' in results:
+            print(f"\nnginx微缓存吞吐量为直接访问的 {results['nginx']['rps'] / results['gunicorn']['rps']:.1f} 倍")
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait(timeout=10)
+        server.shutdown()
+        shutil.rmtree(prefix, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# 天气推送压力测试：单个gunicorn工作进程同时保持大量空闲的/stream订阅连接
+#
+# 启动本地模拟上游服务器和单个gunicorn工作进程（默认gevent模式），建立--subscribers个订阅连接
+# （平均分配到--cities个城市），空闲--idle秒后依次请求每个城市的/weather触发缓存刷新，统计：
+#   - 空闲期间每个连接收到的数据（只有心跳）、工作进程的CPU时间和内存占用
+#   - 一次刷新分发到该城市全部订阅连接的耗时，以及上游请求次数
+#
+# 使用方法：
+#   python load_test_stream.py --subscribers 5000 --idle 20 --heartbeat 5
+#   python load_test_stream.py --subscribers 2000 --worker-class gevent --cities 10
+import argparse
+import asyncio
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import requests
+from load_test_workers import free_port, wait_for_health
+from stub_upstream import start_stub_server
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 订阅的城市
+CITIES = ['北京', '上海', '广州', '深圳', '杭州', '成都', '武汉', '西安', '重庆', '南京',
+          '天津', '昆明', '长沙', '郑州', '济南', '沈阳', '哈尔滨', '福州', '合肥', '南宁']
+
+# 同时发起连接的数量，避免超出监听队列长度
+CONNECT_BATCH = 200
+
+
+def start_gunicorn(port, stub_url, db_dir, worker_class, subscribers, heartbeat):
+    """启动单个gunicorn工作进程（不加载gunicorn.conf.py中的后台运行和日志配置）"""
+    env = dict(os.environ)
+    env.update({
+        'GEOCODING_API_URL': f'{stub_url}/v1/search',
+        'WEATHER_API_URL': f'{stub_url}/v1/forecast',
+        'WEATHER_DB_PATH': os.path.join(db_dir, 'weather_cache.db'),
+        'RATELIMIT_ENABLED': 'false',
+        'PREFETCH_ENABLED': 'false',
+        'STREAM_HEARTBEAT_INTERVAL': str(heartbeat),
+        # 非gevent模式下/stream默认关闭，压力测试中强制开启
+        'STREAM_ENABLED': 'auto' if worker_class == 'gevent' else 'true'
+    })
+    return subprocess.Popen([
+        sys.executable, '-m', 'gunicorn',
+        '--config', os.devnull,
+        '--workers', '1',
+        '--worker-class', worker_class,
+        '--worker-connections', str(subscribers + 100),
+        '--threads', str(subscribers + 100),
+        '--backlog', str(CONNECT_BATCH * 4),
+        # 退出时不等待订阅连接结束
+        '--graceful-timeout', '1',
+        '--bind', f'127.0.0.1:{port}',
+        'app:app'
+    ], cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def worker_pid(master_pid):
+    """gunicorn工作进程的PID"""
+    with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+        return int(f.read().split()[0])
+
+
+def process_usage(pid):
+    """进程累计CPU时间（秒）和常驻内存（MB）"""
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    with open(f'/proc/{pid}/status') as f:
+        rss = next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+    return cpu, rss / 1024
+
+
+class Subscriber:
+    """一个订阅连接，统计收到的心跳和天气事件"""
+    
+    def __init__(self, city):
+        self.city = city
+        self.heartbeats = 0
+        self.events = 0
+        self.bytes = 0
+        self.last_event_at = None
+        self.connected = asyncio.Event()
+        self.writer = None
+    
+    async def run(self, port):
+        reader, self.writer = await asyncio.open_connection('127.0.0.1', port)
+        path = '/stream?cities=' + urllib.parse.quote(self.city)
+        self.writer.write(f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept: text/event-stream\r\n\r\n'.encode())
+        await self.writer.drain()
+        
+        buffer = b''
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                return
+            self.bytes += len(data)
+            buffer += data
+            # 每个响应块都以空行结束，分块传输的长度行位于消息之间，不影响按空行切分
+            *messages, buffer = buffer.split(b'\n\n')
+            for message in messages:
+                if b'retry:' in message:
+                    self.connected.set()
+                if b'event: weather' in message:
+                    self.events += 1
+                    self.last_event_at = time.perf_counter()
+                elif b': ping' in message:
+                    self.heartbeats += 1
+    
+    def close(self):
+        if self.writer:
+            self.writer.close()
+
+
+async def run_test(args, port, master_pid, state):
+    cities = CITIES[:args.cities]
+    subscribers = [Subscriber(cities[i % len(cities)]) for i in range(args.subscribers)]
+    tasks = []
+    
+    # 1. 分批建立订阅连接
+    start = time.perf_counter()
+    for offset in range(0, len(subscribers), CONNECT_BATCH):
+        batch = subscribers[offset:offset + CONNECT_BATCH]
+        tasks.extend(asyncio.create_task(subscriber.run(port)) for subscriber in batch)
+        await asyncio.wait_for(asyncio.gather(*(subscriber.connected.wait() for subscriber in batch)), timeout=60)
+    print(f"建立 {len(subscribers)} 个订阅连接（{len(cities)} 个城市），耗时 {time.perf_counter() - start:.1f}s")
+    
+    pid = worker_pid(master_pid)
+    cpu_before, rss = process_usage(pid)
+    bytes_before = sum(subscriber.bytes for subscriber in subscribers)
+    upstream_before = state.requests
+    print(f"工作进程内存: {rss:.0f}MB（每个连接约 {rss * 1024 / len(subscribers):.0f}KB，含应用本身）")
+    
+    # 2. 空闲阶段：只有心跳
+    await asyncio.sleep(args.idle)
+    cpu_after, rss = process_usage(pid)
+    idle_bytes = sum(subscriber.bytes for subscriber in subscribers) - bytes_before
+    heartbeats = sum(subscriber.heartbeats for subscriber in subscribers)
+    print(f"空闲 {args.idle:.0f}s: 工作进程CPU {cpu_after - cpu_before:.2f}s，"
+          f"内存 {rss:.0f}MB，心跳 {heartbeats} 次（每连接 {heartbeats / len(subscribers):.1f} 次），"
+          f"每连接 {idle_bytes / len(subscribers) / args.idle:.1f} 字节/秒，"
+          f"天气事件 {sum(subscriber.events for subscriber in subscribers)} 个，"
+          f"上游请求 {state.requests - upstream_before} 次")
+    
+    # 3. 依次刷新每个城市的缓存，统计分发到全部订阅连接的耗时
+    loop = asyncio.get_running_loop()
+    for city in cities:
+        targets = [subscriber for subscriber in subscribers if subscriber.city == city]
+        events_before = [subscriber.events for subscriber in targets]
+        upstream_before = state.requests
+        start = time.perf_counter()
+        await loop.run_in_executor(None, lambda: requests.get(f'http://127.0.0.1:{port}/weather',
+                                                              params={'city': city}, timeout=30))
+        deadline = start + 10
+        while time.perf_counter() < deadline:
+            if all(subscriber.events > before for subscriber, before in zip(targets, events_before)):
+                break
+            await asyncio.sleep(0.01)
+        received = sum(1 for subscriber, before in zip(targets, events_before) if subscriber.events > before)
+        latest = max((subscriber.last_event_at for subscriber in targets if subscriber.last_event_at), default=start)
+        print(f"  刷新{city}: {received}/{len(targets)} 个连接收到更新，"
+              f"全部送达耗时 {(latest - start) * 1000:.0f}ms，上游请求 {state.requests - upstream_before} 次")
+    
+    for subscriber in subscribers:
+        subscriber.close()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='天气推送空闲订阅压力测试')
+    parser.add_argument('--subscribers', type=int, default=2000, help='订阅连接数')
+    parser.add_argument('--cities', type=int, default=5, help='订阅的城市数量（连接平均分配）')
+    parser.add_argument('--idle', type=float, default=20, help='空闲阶段持续时间（秒）')
+    parser.add_argument('--heartbeat', type=int, default=5, help='服务端心跳间隔（秒）')
+    parser.add_argument('--worker-class', default='gevent', help='gunicorn工作模式（gevent或gthread）')
+    args = parser.parse_args()
+    args.cities = max(1, min(args.cities, len(CITIES)))
+    
+    # 客户端和服务端都需要为每个连接占用一个文件描述符
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    needed = args.subscribers + 1000
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard), hard))
+    
+    server, state = start_stub_server()
+    stub_url = f'http://127.0.0.1:{server.server_port}'
+    db_dir = tempfile.mkdtemp(prefix='weather_stream_')
+    port = free_port()
+    process = start_gunicorn(port, stub_url, db_dir, args.worker_class, args.subscribers, args.heartbeat)
+    
+    try:
+        if not wait_for_health(f'http://127.0.0.1:{port}'):
+            print("gunicorn启动失败")
+            return
+        asyncio.run(run_test(args, port, process.pid, state))
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        server.shutdown()
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# 工作模式压力测试：对比sync和gevent工作进程在上游API较慢时的并发能力
+#
+# 启动本地模拟上游服务器（每个请求延迟--delay秒）和单个gunicorn工作进程，
+# 同时发起--concurrency个不同城市的天气请求（缓存全部未命中，每个请求需要
+# 一次地理编码和一次天气API调用），统计耗时和上游同时处理中的请求峰值。
+#
+# 使用方法：
+#   python load_test_workers.py --concurrency 200 --delay 1.0 --worker-class sync gevent
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from stub_upstream import start_stub_server
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port():
+    """获取一个空闲端口"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_health(base_url, timeout=20):
+    """等待gunicorn启动完成"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f'{base_url}/health', timeout=1).status_code == 200:
+                return True
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def run_case(worker_class, concurrency, delay, timeout):
+    """使用指定工作模式运行一轮压力测试"""
+    server, state = start_stub_server(delay=delay)
+    stub_url = f'http://127.0.0.1:{server.server_port}'
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    
+    db_dir = tempfile.mkdtemp(prefix='weather_load_')
+    env = dict(os.environ)
+    env.update({
+        'GEOCODING_API_URL': f'{stub_url}/v1/search',
+        'WEATHER_API_URL': f'{stub_url}/v1/forecast',
+        'WEATHER_DB_PATH': os.path.join(db_dir, 'weather_cache.db'),
+        'RATELIMIT_ENABLED': 'false',
+        'UPSTREAM_MAX_RETRIES': '0',
+        'UPSTREAM_READ_TIMEOUT': str(timeout),
+        'UPSTREAM_POOL_MAXSIZE': str(concurrency)
+    })
+    
+    process = subprocess.Popen([
+        sys.executable, '-m', 'gunicorn',
+        # 不加载gunicorn.conf.py（其中配置了后台运行和日志文件）
+        '--config', os.devnull,
+        '--workers', '1',
+        '--worker-class', worker_class,
+        '--worker-connections', str(max(concurrency * 2, 1000)),
+        '--timeout', str(timeout * 4),
+        '--bind', f'127.0.0.1:{port}',
+        'app:app'
+    ], cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    
+    try:
+        if not wait_for_health(base_url):
+            print(f"[{worker_class}] gunicorn启动失败")
+            return None
+        
+        def fetch(index):
+            try:
+                response = requests.get(f'{base_url}/weather', params={'city': f'压测城市{index}'}, timeout=timeout * 4)
+                return response.status_code == 200
+            except requests.exceptions.RequestException:
+                return False
+        
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(fetch, range(concurrency)))
+        elapsed = time.time() - start
+        
+        return {
+            'worker_class': worker_class,
+            'requests': concurrency,
+            'success': sum(results),
+            'elapsed': elapsed,
+            'rps': concurrency / elapsed,
+            'upstream_requests': state.requests,
+            'max_in_flight': state.max_in_flight
+        }
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='gunicorn工作模式压力测试')
+    parser.add_argument('--concurrency', type=int, default=100, help='同时发起的请求数')
+    parser.add_argument('--delay', type=float, default=1.0, help='模拟上游API的响应延迟（秒）')
+    parser.add_argument('--timeout', type=int, default=30, help='单个请求的超时时间（秒）')
+    parser.add_argument('--worker-class', nargs='+', default=['sync', 'gevent'], help='要测试的工作模式')
+    args = parser.parse_args()
+    
+    print(f"并发请求数: {args.concurrency}，上游延迟: {args.delay}s，工作进程数: 1")
+    print("=" * 70)
+    for worker_class in args.worker_class:
+        result = run_case(worker_class, args.concurrency, args.delay, args.timeout)
+        if not result:
+            continue
+        print(f"[{result['worker_class']:>6}] 成功 {result['success']}/{result['requests']}，"
+              f"耗时 {result['elapsed']:.2f}s，{result['rps']:.1f} 请求/秒，"
+              f"上游请求 {result['upstream_requests']} 次，"
+              f"上游同时处理中峰值 {result['max_in_flight']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+# 热门城市预取进程：在gunicorn之外单独运行后台预取（此时gunicorn可设置PREFETCH_ENABLED=false）
+#
+# 使用方法：
+#   python prefetch_worker.py          # 持续运行
+#   python prefetch_worker.py --once   # 只执行一次
+import argparse
+from app.views import prefetcher, weather_db
+
+
+def main():
+    parser = argparse.ArgumentParser(description='热门城市预取进程')
+    parser.add_argument('--once', action='store_true', help='只执行一次预取')
+    args = parser.parse_args()
+    
+    if args.once:
+        print(prefetcher.run_once())
+        weather_db.flush_writes()
+    else:
+        prefetcher.run_forever()
+
+
+if __name__ == '__main__':
+    main()
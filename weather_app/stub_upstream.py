@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# 本地Open-Meteo模拟服务器，用于在无外网环境下测试上游请求（长连接、重试、超时）
+#
+# 使用方法：
+#   python stub_upstream.py --port 8081 --delay 0.2 --fail-rate 0.1
+#   GEOCODING_API_URL=http://127.0.0.1:8081/v1/search \
+#   WEATHER_API_URL=http://127.0.0.1:8081/v1/forecast python run.py
+import argparse
+import datetime
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+class StubState:
+    """模拟服务器的配置和统计信息"""
+    
+    def __init__(self, delay=0.0, fail_rate=0.0):
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.connections = 0
+        
+        # 正在处理中的请求数量及其峰值，用于观察客户端的并发能力
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+
+def build_current():
+    """生成一个地点的当前天气数据"""
+    return {
+        'time': datetime.datetime.now().strftime('%Y-%m-%dT%H:00'),
+        'temperature_2m': round(random.uniform(0, 35), 1),
+        'relative_humidity_2m': random.randint(30, 90),
+        'apparent_temperature': round(random.uniform(0, 35), 1),
+        'wind_speed_10m': round(random.uniform(0, 40), 1),
+        'wind_direction_10m': random.randint(0, 359),
+        'pressure_msl': round(random.uniform(1000, 1020), 1),
+        'visibility': random.randint(5000, 24000),
+        'weather_code': random.choice([0, 1, 2, 3, 45, 61, 80])
+    }
+
+
+def build_daily(days):
+    """生成未来几天的逐日预报数据"""
+    today = datetime.date.today()
+    return {
+        'time': [(today + datetime.timedelta(days=i)).isoformat() for i in range(days)],
+        'temperature_2m_max': [round(random.uniform(15, 35), 1) for _ in range(days)],
+        'temperature_2m_min': [round(random.uniform(0, 15), 1) for _ in range(days)],
+        'apparent_temperature_max': [round(random.uniform(15, 35), 1) for _ in range(days)],
+        'apparent_temperature_min': [round(random.uniform(0, 15), 1) for _ in range(days)],
+        'precipitation_sum': [round(random.uniform(0, 10), 1) for _ in range(days)],
+        'wind_speed_10m_max': [round(random.uniform(0, 40), 1) for _ in range(days)],
+        'weather_code': [random.choice([0, 1, 2, 3, 61]) for _ in range(days)]
+    }
+
+
+def make_handler(state):
+    class StubHandler(BaseHTTPRequestHandler):
+        # 使用HTTP/1.1以支持keep-alive长连接
+        protocol_version = 'HTTP/1.1'
+        
+        def setup(self):
+            super().setup()
+            with state.lock:
+                state.connections += 1
+        
+        def log_message(self, format, *args):
+            pass
+        
+        def send_json(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            
+            if url.path == '/stats':
+                self.send_json(200, {
+                    'requests': state.requests,
+                    'failures': state.failures,
+                    'connections': state.connections,
+                    'in_flight': state.in_flight,
+                    'max_in_flight': state.max_in_flight
+                })
+                return
+            
+            with state.lock:
+                state.requests += 1
+                state.in_flight += 1
+                state.max_in_flight = max(state.max_in_flight, state.in_flight)
+                fail = random.random() < state.fail_rate
+                if fail:
+                    state.failures += 1
+            
+            try:
+                if state.delay:
+                    time.sleep(state.delay)
+                self.respond(url, params, fail)
+            finally:
+                with state.lock:
+                    state.in_flight -= 1
+        
+        def respond(self, url, params, fail):
+            """根据请求路径返回模拟数据"""
+            if fail:
+                self.send_json(503, {'error': True, 'reason': 'stub failure'})
+                return
+            
+            if url.path == '/v1/search':
+                name = params.get('name', [''])[0]
+                self.send_json(200, {'results': [{
+                    'name': name,
+                    'latitude': round(random.uniform(20, 45), 4),
+                    'longitude': round(random.uniform(100, 125), 4)
+                }]})
+            elif url.path == '/v1/forecast':
+                latitudes = params.get('latitude', ['0'])[0].split(',')
+                longitudes = params.get('longitude', ['0'])[0].split(',')
+                days = int(params.get('forecast_days', ['7'])[0])
+                items = []
+                for latitude, longitude in zip(latitudes, longitudes):
+                    item = {'latitude': float(latitude), 'longitude': float(longitude)}
+                    if 'daily' in params:
+                        item['daily'] = build_daily(days)
+                    else:
+                        item['current'] = build_current()
+                    items.append(item)
+                # 与Open-Meteo一致：单个坐标返回对象，多个坐标返回列表
+                self.send_json(200, items[0] if len(items) == 1 else items)
+            else:
+                self.send_json(404, {'error': True, 'reason': 'not found'})
+    
+    return StubHandler
+
+
+def start_stub_server(host='127.0.0.1', port=0, delay=0.0, fail_rate=0.0):
+    """在后台线程启动模拟服务器，返回 (server, state)"""
+    state = StubState(delay=delay, fail_rate=fail_rate)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地Open-Meteo模拟服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--delay', type=float, default=0.0, help='每个请求的响应延迟（秒）')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='返回503的概率（0-1）')
+    args = parser.parse_args()
+    
+    server, state = start_stub_server(args.host, args.port, args.delay, args.fail_rate)
+    print(f"模拟服务器已启动: http://{args.host}:{server.server_port}")
+    print(f"  GEOCODING_API_URL=http://{args.host}:{server.server_port}/v1/search")
+    print(f"  WEATHER_API_URL=http://{args.host}:{server.server_port}/v1/forecast")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
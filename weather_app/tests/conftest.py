@@ -0,0 +1,18 @@
+import os
+import sys
+import tempfile
+
+# 导入app时会创建数据库和后台任务，测试使用临时数据库，不访问上游API
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('WEATHER_DB_PATH', os.path.join(tempfile.mkdtemp(prefix='weather_test_'), 'weather_cache.db'))
+os.environ.setdefault('PREFETCH_ENABLED', 'false')
+
+import pytest
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """关闭限流的测试客户端"""
+    from app import app, limiter
+    monkeypatch.setattr(limiter, 'enabled', False)
+    return app.test_client()
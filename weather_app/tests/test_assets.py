@@ -0,0 +1,39 @@
+import pytest
+from app import app
+from app.assets import StaticAssets, load_vendor_manifest
+
+
+@pytest.fixture
+def assets(tmp_path):
+    return StaticAssets(str(tmp_path), '/static', load_vendor_manifest())
+
+
+def test_vendor_prefers_local_file(assets, tmp_path):
+    path = tmp_path / 'vendor' / 'chart.js' / 'chart.umd.min.js'
+    path.parent.mkdir(parents=True)
+    path.write_text('// chart')
+    
+    url, integrity = assets.vendor('vendor/chart.js/chart.umd.min.js')
+    
+    assert url.startswith('/static/vendor/chart.js/chart.umd.min.js?v=')
+    assert integrity is None
+
+
+def test_vendor_falls_back_to_cdn(assets):
+    url, integrity = assets.vendor('vendor/bootstrap/bootstrap.min.css')
+    assert url.startswith('https://') and integrity.startswith('sha384-')
+    
+    # 清单中缺少SRI哈希时仍然从CDN加载，不省略页面依赖的库
+    url, integrity = assets.vendor('vendor/chart.js/chart.umd.min.js')
+    assert url.startswith('https://') and url.endswith('/chart.umd.min.js')
+
+
+def test_vendor_rejects_unknown_file(assets):
+    with pytest.raises(KeyError):
+        assets.vendor('vendor/unknown.js')
+
+
+def test_index_page_loads_every_vendor_library():
+    html = app.test_client().get('/', headers={'Accept-Encoding': 'identity'}).get_data(as_text=True)
+    for name in ('bootstrap.min.css', 'all.min.css', 'chart.umd.min.js', 'bootstrap.bundle.min.js'):
+        assert name in html
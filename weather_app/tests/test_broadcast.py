@@ -0,0 +1,131 @@
+import threading
+import time
+import pytest
+from app.broadcast import WeatherBroadcaster
+
+
+def record(city, timestamp, temperature=20):
+    return {'city': city, 'timestamp': timestamp, 'temperature': temperature}
+
+
+@pytest.fixture
+def broadcaster():
+    return WeatherBroadcaster(lambda cities: {}, poll_interval=30)
+
+
+def test_publish_fans_out_to_city_subscribers(broadcaster):
+    first = broadcaster.subscribe(['北京', '上海'])
+    second = broadcaster.subscribe(['北京'])
+    other = broadcaster.subscribe(['广州'])
+    
+    assert broadcaster.publish(record('北京', '2024-01-01 10:00:00')) == 2
+    assert broadcaster.publish(record('上海', '2024-01-01 10:00:00')) == 1
+    # 没有订阅者的城市不分发
+    assert broadcaster.publish(record('深圳', '2024-01-01 10:00:00')) == 0
+    
+    assert sorted(r['city'] for r in first.wait(0)) == ['上海', '北京']
+    assert [r['city'] for r in second.wait(0)] == ['北京']
+    assert other.wait(0) == []
+    assert broadcaster.stats()['subscriptions'] == 3
+    assert broadcaster.stats()['cities'] == 3
+    assert broadcaster.stats()['delivered'] == 3
+
+
+def test_publish_ignores_old_and_duplicate_records(broadcaster):
+    subscription = broadcaster.subscribe(['北京'])
+    
+    assert broadcaster.publish(record('北京', '2024-01-01 10:00:00')) == 1
+    assert broadcaster.publish(record('北京', '2024-01-01 10:00:00')) == 0
+    assert broadcaster.publish(record('北京', '2024-01-01 09:00:00')) == 0
+    assert broadcaster.publish({'city': '北京'}) == 0
+    assert len(subscription.wait(0)) == 1
+
+
+def test_slow_subscriber_keeps_only_latest_record_per_city(broadcaster):
+    subscription = broadcaster.subscribe(['北京', '上海'])
+    
+    # 客户端没有及时读取时，每个城市只保留最新一条，待发送记录的数量不超过订阅的城市数量
+    for hour in range(10, 20):
+        broadcaster.publish(record('北京', f'2024-01-01 {hour}:00:00', temperature=hour))
+        broadcaster.publish(record('上海', f'2024-01-01 {hour}:00:00', temperature=hour))
+    
+    records = {r['city']: r for r in subscription.wait(0)}
+    assert len(records) == 2
+    assert records['北京']['temperature'] == 19
+    assert records['上海']['temperature'] == 19
+    assert subscription.wait(0) == []
+
+
+def test_unsubscribe_stops_delivery(broadcaster):
+    first = broadcaster.subscribe(['北京'])
+    second = broadcaster.subscribe(['北京', '上海'])
+    
+    broadcaster.unsubscribe(second)
+    assert broadcaster.stats()['cities'] == 1
+    assert broadcaster.publish(record('上海', '2024-01-01 10:00:00')) == 0
+    assert broadcaster.publish(record('北京', '2024-01-01 10:00:00')) == 1
+    assert second.wait(0) == []
+    
+    broadcaster.unsubscribe(first)
+    assert broadcaster.stats()['subscriptions'] == 0
+    assert broadcaster.stats()['cities'] == 0
+    assert broadcaster.publish(record('北京', '2024-01-01 11:00:00')) == 0
+
+
+def test_wait_wakes_on_publish_and_close(broadcaster):
+    subscription = broadcaster.subscribe(['北京'])
+    timer = threading.Timer(0.05, broadcaster.publish, args=(record('北京', '2024-01-01 10:00:00'),))
+    timer.start()
+    started = time.monotonic()
+    assert [r['city'] for r in subscription.wait(5)] == ['北京']
+    assert time.monotonic() - started < 2
+    
+    timer = threading.Timer(0.05, broadcaster.unsubscribe, args=(subscription,))
+    timer.start()
+    started = time.monotonic()
+    assert subscription.wait(5) == []
+    assert time.monotonic() - started < 2
+
+
+def test_poll_publishes_records_from_database():
+    latest = {'北京': record('北京', '2024-01-01 10:00:00')}
+    queried = []
+    
+    def load_latest(cities):
+        queried.append(sorted(cities))
+        return {city: latest[city] for city in cities if city in latest}
+    
+    broadcaster = WeatherBroadcaster(load_latest)
+    assert broadcaster.poll() == 0
+    assert queried == []
+    
+    subscription = broadcaster.subscribe(['北京', '上海'])
+    broadcaster.subscribe(['北京'])
+    # 同一城市只查询、分发一次，与订阅连接数无关
+    assert broadcaster.poll() == 1
+    assert queried == [['上海', '北京']]
+    assert broadcaster.poll() == 0
+    assert len(subscription.wait(0)) == 1
+
+
+def test_stream_unavailable_without_gevent(client, monkeypatch):
+    from app import views
+    monkeypatch.setattr(views, 'STREAM_ENABLED', 'auto')
+    assert client.get('/stream?cities=北京').status_code == 503
+
+
+def test_stream_unsubscribes_on_disconnect(client, monkeypatch):
+    from app import views
+    monkeypatch.setattr(views, 'STREAM_ENABLED', 'true')
+    assert client.get('/stream').status_code == 400
+    before = views.broadcaster.stats()['subscriptions']
+    
+    response = client.get('/stream?cities=北京,上海', buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    assert next(response.response).startswith(b'retry: ')
+    assert views.broadcaster.stats()['subscriptions'] == before + 1
+    
+    # 客户端断开时关闭响应，取消订阅
+    response.close()
+    assert views.broadcaster.stats()['subscriptions'] == before
@@ -0,0 +1,87 @@
+import pytest
+from app import cache
+from app.cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可手动推进的单调时钟"""
+    now = [100.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_evicts_least_recently_used(clock):
+    lru = TTLCache(maxsize=3)
+    for key in 'abc':
+        lru.set(key, key)
+    
+    # 读取a后，最久未使用的是b
+    assert lru.get('a') == 'a'
+    lru.set('d', 'd')
+    
+    assert lru.get('b') is None
+    assert [lru.get(key) for key in 'acd'] == ['a', 'c', 'd']
+    assert lru.stats()['evictions'] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    lru = TTLCache(maxsize=10, ttl=60)
+    lru.set('default', 1)
+    lru.set('short', 2, ttl=10)
+    lru.set('disabled', 3, ttl=0)
+    
+    clock[0] += 10
+    assert lru.get('short') is None
+    assert lru.get('default') == 1
+    assert lru.get('disabled') is None
+    
+    clock[0] += 50
+    assert lru.get('default') is None
+    assert lru.stats()['size'] == 0
+
+
+def test_pinned_keys_are_never_evicted(clock):
+    lru = TTLCache(maxsize=4)
+    lru.pin(['hot1', 'hot2'])
+    lru.set('hot1', 1)
+    lru.set('hot2', 2)
+    
+    for i in range(20):
+        lru.set(f'cold{i}', i)
+    
+    assert lru.get('hot1') == 1
+    assert lru.get('hot2') == 2
+    # 未固定的条目按LRU淘汰，只保留最近写入的两个
+    assert lru.get('cold18') == 18 and lru.get('cold19') == 19
+    assert lru.get('cold17') is None
+
+
+def test_pinned_keys_still_expire(clock):
+    lru = TTLCache(maxsize=4, ttl=60)
+    lru.pin(['hot'])
+    lru.set('hot', 1)
+    
+    clock[0] += 60
+    
+    assert lru.get('hot') is None
+
+
+def test_pin_is_capped_at_half_capacity(clock):
+    lru = TTLCache(maxsize=4)
+    lru.pin(['a', 'b', 'c', 'd'])
+    
+    assert lru.stats()['pinned'] == 2
+
+
+def test_stats_counters(clock):
+    lru = TTLCache(maxsize=1, ttl=60)
+    lru.set('a', 1)
+    lru.get('a')
+    lru.get('missing')
+    lru.set('b', 2)
+    
+    stats = lru.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (1, 1, 1)
+    assert stats['hit_rate'] == 0.5
+    assert (stats['size'], stats['maxsize'], stats['ttl']) == (1, 1, 60)
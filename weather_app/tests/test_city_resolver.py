@@ -0,0 +1,101 @@
+import pytest
+from app.city_resolver import CityResolver, SUGGEST_SIZE
+
+
+CITIES = [
+    ('湖州', '湖州市', '浙江', 'hu zhou', 30.89, 120.09),
+    ('杭州', '杭州市', '浙江', 'hang zhou', 30.27, 120.15),
+    ('惠州', '惠州市', '广东', 'hui zhou', 23.11, 114.42),
+    ('恩施', '恩施土家族苗族自治州', '湖北', 'en shi', 30.27, 109.49),
+    ('吉林', '吉林市', '吉林', 'ji lin', 43.84, 126.55),
+    ('长春', '长春市', '吉林', 'chang chun', 43.82, 125.32),
+]
+PROVINCES = [('浙江', '浙江省', '杭州'), ('吉林', '吉林省', '长春')]
+ALIASES = {'临安': '杭州'}
+
+
+@pytest.fixture
+def resolver():
+    return CityResolver(CITIES, PROVINCES, ALIASES, major=['杭州'], suggest_size=5)
+
+
+def names(cities):
+    return [city['name'] for city in cities]
+
+
+def test_normalize_strips_suffix_and_resolves_aliases(resolver):
+    assert resolver.normalize('杭州市') == '杭州'
+    assert resolver.normalize(' 杭州 ') == '杭州'
+    assert resolver.normalize('恩施土家族苗族自治州') == '恩施'
+    assert resolver.normalize('恩施州') == '恩施'
+    assert resolver.normalize('临安') == '杭州'
+    # 拼音忽略大小写和空格
+    assert resolver.normalize('hangzhou') == '杭州'
+    assert resolver.normalize('Hang Zhou') == '杭州'
+    # 省份解析为省会，城市名称优先于同名省份
+    assert resolver.normalize('浙江省') == '杭州'
+    assert resolver.normalize('浙江') == '杭州'
+    assert resolver.normalize('吉林') == '吉林'
+    assert resolver.normalize('吉林省') == '长春'
+    # 未知城市只去除行政区划后缀
+    assert resolver.normalize('某某市') == '某某'
+    assert resolver.resolve('某某市') is None
+    assert resolver.resolve('临安')['full_name'] == '杭州市'
+
+
+def test_suggest_prefix_by_name_pinyin_and_initials(resolver):
+    assert names(resolver.suggest('杭')) == ['杭州']
+    assert names(resolver.suggest('杭州市')) == ['杭州']
+    assert names(resolver.suggest('hang')) == ['杭州']
+    # 首字母相同时主要城市在前，其余按数据顺序
+    assert names(resolver.suggest('hz')) == ['杭州', '湖州', '惠州']
+    assert names(resolver.suggest('h')) == ['杭州', '湖州', '惠州']
+    assert names(resolver.suggest('HZ')) == ['杭州', '湖州', '惠州']
+    assert resolver.suggest('') == []
+
+
+def test_suggest_falls_back_to_fuzzy_match(resolver):
+    # 前缀没有匹配（拼错的拼音）时返回最相近的城市
+    assert names(resolver.suggest('hangzou'))[0] == '杭州'
+    assert names(resolver.suggest('changchn'))[0] == '长春'
+    # 过短或完全无关的输入不返回结果
+    assert resolver.suggest('q') == []
+    assert resolver.suggest('xxxxxx') == []
+
+
+def test_suggest_limit(resolver):
+    assert names(resolver.suggest('h', limit=2)) == ['杭州', '湖州']
+    # 不超过构建索引时的数量上限
+    assert len(resolver.suggest('hangzou', limit=50)) <= 5
+
+
+def test_resolver_from_data_file():
+    resolver = CityResolver.from_file()
+    
+    assert resolver.normalize('北京市') == '北京'
+    assert resolver.normalize('广西') == '南宁'
+    assert resolver.normalize('延吉') == '延边'
+    assert names(resolver.suggest('hz'))[0] == '杭州'
+    assert len(resolver.suggest('x')) == SUGGEST_SIZE
+
+
+def test_suggest_route(client):
+    response = client.get('/cities/suggest?q=hz&limit=3')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['query'] == 'hz'
+    assert [city['name'] for city in data['cities']][0] == '杭州'
+    assert len(data['cities']) == 3
+    assert set(data['cities'][0]) == {'name', 'full_name', 'province', 'latitude', 'longitude'}
+
+
+def test_suggest_route_limit(client):
+    # 数量限制在1到SUGGEST_SIZE之间
+    response = client.get('/cities/suggest?q=x&limit=100')
+    assert len(response.get_json()['cities']) == SUGGEST_SIZE
+    response = client.get('/cities/suggest?q=x&limit=0')
+    assert len(response.get_json()['cities']) == 1
+    
+    assert client.get('/cities/suggest?q=x&limit=abc').status_code == 400
+    assert client.get('/cities/suggest').status_code == 400
+    assert client.get('/cities/suggest?q=%20').status_code == 400
@@ -0,0 +1,162 @@
+import gzip
+import json
+import zlib
+import pytest
+from flask import Flask, Response, request, send_file
+from app import compression
+
+
+class FakeBrotli:
+    """brotli模块的替身：内部用zlib压缩（raw deflate），用于测试协商和流式输出"""
+    
+    class Compressor:
+        def __init__(self, quality):
+            self._compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        
+        def process(self, data):
+            return self._compressor.compress(data)
+        
+        def flush(self):
+            return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        
+        def finish(self):
+            return self._compressor.flush()
+    
+    @staticmethod
+    def decompress(data):
+        return zlib.decompress(data, -15)
+
+
+BODY = '{"data": "' + '晴' * 1000 + '"}'
+
+
+@pytest.fixture
+def compress_client(tmp_path, monkeypatch):
+    monkeypatch.setattr(compression, 'brotli', None)
+    app = Flask(__name__)
+    app.after_request(lambda response: compression.compress_response(request, response))
+    
+    @app.route('/json')
+    def json_body():
+        response = Response(BODY, mimetype='application/json')
+        response.set_etag('abc')
+        return response
+    
+    @app.route('/small')
+    def small():
+        return Response('{"ok": true}', mimetype='application/json')
+    
+    @app.route('/stream')
+    def stream():
+        return Response((f'{{"line": {i}}}\n' for i in range(100)), mimetype='application/x-ndjson')
+    
+    @app.route('/encoded')
+    def encoded():
+        response = Response(gzip.compress(BODY.encode('utf-8')), mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+        return response
+    
+    @app.route('/not-modified')
+    def not_modified():
+        return Response(status=304, mimetype='application/json')
+    
+    @app.route('/file')
+    def file():
+        path = tmp_path / 'data.json'
+        path.write_text(BODY, encoding='utf-8')
+        return send_file(path, mimetype='application/json')
+    
+    @app.route('/binary')
+    def binary():
+        return Response(b'\0' * 2000, mimetype='application/octet-stream')
+    
+    return app.test_client()
+
+
+def test_gzip_when_accepted(compress_client):
+    response = compress_client.get('/json', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.vary
+    assert int(response.headers['Content-Length']) == len(response.data) < len(BODY.encode('utf-8'))
+    assert gzip.decompress(response.data).decode('utf-8') == BODY
+    # 压缩后强ETag改为弱ETag
+    assert response.get_etag() == ('abc', True)
+
+
+def test_identity_when_not_accepted(compress_client):
+    for headers in ({}, {'Accept-Encoding': 'identity'}, {'Accept-Encoding': 'gzip;q=0'}):
+        response = compress_client.get('/json', headers=headers)
+        assert 'Content-Encoding' not in response.headers
+        assert response.get_data(as_text=True) == BODY
+        assert response.get_etag() == ('abc', False)
+        # 未压缩的响应同样需要Vary，避免缓存把未压缩版本返回给支持压缩的客户端
+        assert 'Accept-Encoding' in response.vary
+
+
+def test_brotli_preferred_when_available(compress_client, monkeypatch):
+    monkeypatch.setattr(compression, 'brotli', FakeBrotli)
+    response = compress_client.get('/json', headers={'Accept-Encoding': 'gzip, deflate, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert FakeBrotli.decompress(response.data).decode('utf-8') == BODY
+    
+    # 客户端更偏好gzip时按q值选择
+    response = compress_client.get('/json', headers={'Accept-Encoding': 'br;q=0.5, gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+
+
+def test_gzip_fallback_without_brotli(compress_client):
+    response = compress_client.get('/json', headers={'Accept-Encoding': 'br, gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    response = compress_client.get('/json', headers={'Accept-Encoding': 'br'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_small_response_not_compressed(compress_client):
+    response = compress_client.get('/small', headers={'Accept-Encoding': 'gzip'})
+    assert len(response.data) < compression.COMPRESS_MIN_SIZE
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_json() == {'ok': True}
+    assert 'Accept-Encoding' in response.vary
+
+
+def test_streamed_response_compressed_by_chunk(compress_client, monkeypatch):
+    response = compress_client.get('/stream', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    expected = ''.join(f'{{"line": {i}}}\n' for i in range(100))
+    assert gzip.decompress(response.data).decode('utf-8') == expected
+    
+    monkeypatch.setattr(compression, 'brotli', FakeBrotli)
+    response = compress_client.get('/stream', headers={'Accept-Encoding': 'br'}, buffered=False)
+    chunks = list(response.response)
+    # 每块数据立即输出，不缓冲整个响应
+    assert len(chunks) > 1
+    assert FakeBrotli.decompress(b''.join(chunks)).decode('utf-8') == expected
+
+
+def test_skip_encoded_passthrough_and_not_modified(compress_client):
+    response = compress_client.get('/encoded', headers={'Accept-Encoding': 'gzip'})
+    # 已经编码的内容不重复压缩
+    assert gzip.decompress(response.data).decode('utf-8') == BODY
+    
+    response = compress_client.get('/file', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data(as_text=True) == BODY
+    response.close()
+    
+    response = compress_client.get('/not-modified', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 304
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_skip_incompressible_mimetype(compress_client):
+    response = compress_client.get('/binary', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' not in response.vary
+
+
+def test_registered_on_app(client):
+    response = client.get('/cities/suggest?q=h', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.vary
+    assert len(json.loads(gzip.decompress(response.data))['cities']) > 1
@@ -0,0 +1,51 @@
+import pytest
+from app import database
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'weather_cache.db'))
+    monkeypatch.setattr(database, 'WRITE_BEHIND_ENABLED', False)
+    return database.WeatherDatabase()
+
+
+def test_iter_historical_weather_pages_in_order(db, monkeypatch):
+    monkeypatch.setattr(database, 'HISTORY_PAGE_ROWS', 5)
+    metrics = (None,) * len(database.WEATHER_METRIC_COLUMNS)
+    rows = [('北京', date, hour) + metrics + (f'{date} {hour:02d}:00:00',)
+            for date in ('2024-01-01', '2024-01-02', '2024-01-03') for hour in range(4)]
+    rows.append(('上海', '2024-01-02', 0) + metrics + ('2024-01-02 00:00:00',))
+    assert db.bulk_import_history(rows) == len(rows)
+    
+    records = list(db.iter_historical_weather('北京', '2024-01-01', '2024-01-02'))
+    
+    # 跨越两页边界，不遗漏、不重复，也不包含范围之外的日期和其他城市
+    assert [(record['record_date'], record['record_hour']) for record in records] == [
+        (date, hour) for date in ('2024-01-01', '2024-01-02') for hour in range(4)
+    ]
+    assert {record['city'] for record in records} == {'北京'}
+
+
+def test_fetch_lease_is_exclusive_until_expired(db, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(database.time, 'time', lambda: now[0])
+    
+    assert db.acquire_fetch_lease('weather:北京', 'worker-1', ttl=10)
+    assert not db.acquire_fetch_lease('weather:北京', 'worker-2', ttl=10)
+    assert db.is_fetch_lease_active('weather:北京')
+    # 其他key不受影响
+    assert db.acquire_fetch_lease('weather:上海', 'worker-2', ttl=10)
+    
+    now[0] += 11
+    assert not db.is_fetch_lease_active('weather:北京')
+    assert db.acquire_fetch_lease('weather:北京', 'worker-2', ttl=10)
+
+
+def test_fetch_lease_release_only_by_owner(db):
+    assert db.acquire_fetch_lease('weather:北京', 'worker-1', ttl=10)
+    
+    db.release_fetch_lease('weather:北京', 'worker-2')
+    assert not db.acquire_fetch_lease('weather:北京', 'worker-2', ttl=10)
+    
+    db.release_fetch_lease('weather:北京', 'worker-1')
+    assert db.acquire_fetch_lease('weather:北京', 'worker-2', ttl=10)
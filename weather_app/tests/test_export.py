@@ -0,0 +1,26 @@
+import urllib.parse
+from app import database, views
+
+
+def import_month(city, month, days=3):
+    metrics = (20.0,) + (None,) * (len(database.WEATHER_METRIC_COLUMNS) - 1)
+    rows = [(city, f'{month}-{day:02d}', 12) + metrics + (f'{month}-{day:02d} 12:00:00',) for day in range(1, days + 1)]
+    assert views.weather_db.bulk_import_history(rows) == len(rows)
+
+
+def test_export_normalizes_single_digit_month(client):
+    import_month('导出测试', '2025-01')
+    
+    response = client.get('/historical/export', query_string={'city': '导出测试', 'month': '2025-1'})
+    
+    assert response.status_code == 200
+    disposition = urllib.parse.unquote(response.headers['Content-Disposition'])
+    assert disposition.endswith('2025-01.npz')
+    # 与规范写法是同一个分区，缓存验证器相同
+    canonical = client.get('/historical/export', query_string={'city': '导出测试', 'month': '2025-01'})
+    assert canonical.headers['ETag'] == response.headers['ETag']
+
+
+def test_export_rejects_invalid_month(client):
+    response = client.get('/historical/export', query_string={'city': '导出测试', 'month': '2025-13'})
+    assert response.status_code == 400
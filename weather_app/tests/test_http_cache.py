@@ -0,0 +1,35 @@
+from app import app, views
+
+CURRENT = {
+    'temperature_2m': 18.0, 'relative_humidity_2m': 60, 'pressure_msl': 1010.0, 'visibility': 20000,
+    'wind_speed_10m': 12.0, 'wind_direction_10m': 90, 'weather_code': 1
+}
+
+
+def test_fresh_and_cached_weather_have_same_body_and_etag():
+    record = views.build_weather_result('测试城市', CURRENT)
+    views.weather_db.save_weather(record)
+    cached = views.weather_db.get_cached_weather('测试城市')
+    
+    with app.test_request_context('/weather'):
+        fresh_response = views.weather_response(record)
+        cached_response = views.weather_response(cached)
+    
+    # 同一个强ETag必须对应完全相同的响应内容
+    assert fresh_response.get_etag() == cached_response.get_etag()
+    assert fresh_response.get_data() == cached_response.get_data()
+
+
+def test_not_modified_keeps_validators_and_cache_control():
+    record = views.build_weather_result('测试城市', CURRENT)
+    with app.test_request_context('/weather'):
+        etag = views.weather_response(record).get_etag()[0]
+    
+    with app.test_request_context('/weather', headers={'If-None-Match': f'"{etag}"'}) as context:
+        response = views.weather_response(record)
+        headers = response.get_wsgi_headers(context.request.environ)
+    
+    assert response.status_code == 304
+    assert headers['ETag'] == f'"{etag}"'
+    assert 'Last-Modified' in headers
+    assert headers['Cache-Control'].startswith('public, max-age=')
@@ -0,0 +1,109 @@
+import sqlite3
+import pytest
+from app import database
+
+# 最初版本（未记录user_version）的表结构，天气指标为带单位的字符串
+BASELINE_SCHEMA = '''
+    CREATE TABLE weather_cache (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        city TEXT NOT NULL,
+        temperature TEXT,
+        humidity TEXT,
+        weather TEXT,
+        wind TEXT,
+        wind_dir TEXT,
+        pressure TEXT,
+        visibility TEXT,
+        aqi REAL,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX idx_cache_city ON weather_cache (city);
+    CREATE INDEX idx_cache_timestamp ON weather_cache (timestamp);
+    CREATE INDEX idx_cache_city_timestamp ON weather_cache (city, timestamp);
+    CREATE TABLE popular_cities (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        city TEXT NOT NULL UNIQUE
+    );
+    CREATE TABLE historical_weather (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        city TEXT NOT NULL,
+        temperature TEXT,
+        humidity TEXT,
+        weather TEXT,
+        wind TEXT,
+        wind_dir TEXT,
+        pressure TEXT,
+        visibility TEXT,
+        aqi REAL,
+        record_date DATE NOT NULL,
+        record_hour INTEGER NOT NULL,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(city, record_date, record_hour)
+    );
+'''
+
+LEGACY_ROW = ('北京', '21.5°C', '40%', '多云', '3级', '西北风', '1012.0hPa', '10.0km', 55)
+
+
+@pytest.fixture(params=[False, True], ids=['baseline', 'failed-upgrade'])
+def baseline_db(request, tmp_path, monkeypatch):
+    path = str(tmp_path / 'weather_cache.db')
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.execute('''
+        INSERT INTO weather_cache (city, temperature, humidity, weather, wind, wind_dir, pressure, visibility, aqi)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', LEGACY_ROW)
+    for hour in (8, 9):
+        conn.execute('''
+            INSERT INTO historical_weather
+            (city, temperature, humidity, weather, wind, wind_dir, pressure, visibility, aqi, record_date, record_hour)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, '2024-01-01', ?)
+        ''', LEGACY_ROW + (hour,))
+    if request.param:
+        # 之前的版本在升级前就创建了汇总表和触发器，升级失败后数据库停留在这个状态
+        conn.execute('CREATE TABLE historical_daily (city TEXT, record_date DATE, samples INTEGER, '
+                     + ', '.join(f'{column} REAL' for column in database.ROLLUP_METRIC_COLUMNS)
+                     + ', weather_code INTEGER, PRIMARY KEY (city, record_date))')
+        conn.execute(database.HISTORICAL_DAILY_TRIGGER_SQL)
+    conn.commit()
+    conn.close()
+    
+    monkeypatch.setattr(database, 'DB_PATH', path)
+    monkeypatch.setattr(database, 'WRITE_BEHIND_ENABLED', False)
+    return path
+
+
+def test_upgrade_from_baseline_schema(baseline_db):
+    db = database.WeatherDatabase()
+    
+    conn = sqlite3.connect(baseline_db)
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == database.SCHEMA_VERSION
+    columns = [column[1] for column in conn.execute('PRAGMA table_info(historical_weather)')]
+    assert 'temperature_c' in columns and 'temperature' not in columns
+    
+    # 旧数据转换为数值列，并生成了按日汇总
+    cached = db.get_cached_weather('北京')
+    assert cached['temperature_c'] == 21.5
+    assert cached['wind_level'] == 3
+    assert conn.execute(
+        "SELECT samples, temperature_max FROM historical_daily WHERE city = '北京' AND record_date = '2024-01-01'"
+    ).fetchone() == (2, 21.5)
+    
+    # 升级后写入的历史数据由触发器更新汇总
+    record = dict(cached, city='上海', temperature_c=10.0)
+    db.save_historical_weather(record)
+    assert conn.execute("SELECT samples, temperature_max FROM historical_daily WHERE city = '上海'").fetchone() == (1, 10.0)
+    conn.close()
+    db.close()
+
+
+def test_new_database_is_current(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'new.db'))
+    monkeypatch.setattr(database, 'WRITE_BEHIND_ENABLED', False)
+    db = database.WeatherDatabase()
+    conn = db.connect()
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == database.SCHEMA_VERSION
+    names = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")]
+    assert names == ['historical_daily_rollup']
+    db.close()
@@ -0,0 +1,29 @@
+from app import popularity
+from app.popularity import PopularityTracker
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.ranking = ['北京', '上海']
+        self.reads = 0
+    
+    def get_popular_cities(self, limit=None):
+        self.reads += 1
+        return list(self.ranking[:limit])
+
+
+def test_top_rereads_ranking_older_than_flush_interval(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(popularity.time, 'time', lambda: now[0])
+    db = FakeDatabase()
+    tracker = PopularityTracker(db, flush_interval=60)
+    
+    assert tracker.top(1) == ['北京']
+    
+    # 其他进程写入了新的排名，未启动写入线程的进程在排名过期后重新读取
+    db.ranking = ['广州', '北京']
+    now[0] += 30
+    assert tracker.top(1) == ['北京']
+    now[0] += 30
+    assert tracker.top(1) == ['广州']
+    assert db.reads == 2
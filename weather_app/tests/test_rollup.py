@@ -0,0 +1,86 @@
+import datetime
+import random
+import pytest
+from app import database
+
+# 2024-01-07为周日，与之后两天分属两周
+DATES = ('2024-01-07', '2024-01-08', '2024-01-09')
+
+INSERT_SQL = '''
+    INSERT OR REPLACE INTO historical_weather
+    (city, record_date, record_hour, temperature_c, humidity_pct, aqi, weather_code)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'weather_cache.db'))
+    monkeypatch.setattr(database, 'WRITE_BEHIND_ENABLED', False)
+    db = database.WeatherDatabase()
+    
+    rng = random.Random(7)
+    for date in DATES:
+        for hour in range(0, 24, 3):
+            db.execute_write(INSERT_SQL, ('北京', date, hour, round(rng.uniform(-5, 15), 1),
+                                          rng.randint(20, 90), rng.randint(10, 200), rng.choice((0, 1, 3))))
+    # 覆盖同一小时的数据：汇总按新值重新计算，不重复计数
+    db.execute_write(INSERT_SQL, ('北京', '2024-01-08', 12, 30.0, 95, 300, 61))
+    # 其他城市不计入
+    db.execute_write(INSERT_SQL, ('上海', '2024-01-08', 12, -40.0, 5, 1, 0))
+    return db
+
+
+def direct_aggregate(db, period_sql):
+    """直接从逐小时数据计算的汇总，{周期: (条数, 温度最小/最大/平均, 湿度最小/最大/平均, AQI最小/最大/平均)}"""
+    rows = db.connect().execute(f'''
+        SELECT {period_sql} AS period, COUNT(*),
+            MIN(temperature_c), MAX(temperature_c), AVG(temperature_c),
+            MIN(humidity_pct), MAX(humidity_pct), AVG(humidity_pct),
+            MIN(aqi), MAX(aqi), AVG(aqi)
+        FROM historical_weather
+        WHERE city = '北京'
+        GROUP BY period
+        ORDER BY period
+    ''').fetchall()
+    return {row[0]: row[1:] for row in rows}
+
+
+def summary_rows(summary):
+    columns = ['samples'] + list(database.ROLLUP_METRIC_COLUMNS)
+    return {period: tuple(summary[column][i] for column in columns) for i, period in enumerate(summary['period'])}
+
+
+def assert_matches(actual, expected, tolerance):
+    assert actual.keys() == expected.keys()
+    for period, values in expected.items():
+        assert actual[period] == pytest.approx(values, abs=tolerance), period
+
+
+def test_daily_rollup_matches_hourly_data(db):
+    summary = db.get_historical_summary('北京', DATES[0], DATES[-1], granularity='day')
+    
+    # 平均值保留1位小数
+    assert_matches(summary_rows(summary), direct_aggregate(db, 'record_date'), tolerance=0.05 + 1e-9)
+    day = summary['period'].index('2024-01-08')
+    assert summary['samples'][day] == 8
+    assert summary['temperature_max'][day] == 30.0
+    assert summary['aqi_max'][day] == 300
+
+
+def test_weekly_summary_matches_hourly_data(db):
+    summary = db.get_historical_summary('北京', DATES[0], DATES[-1], granularity='week')
+    
+    assert summary['period'] == ['2024-01-01', '2024-01-08']
+    # 按周的平均值由每天保留1位小数的平均值加权后再保留1位小数，最多相差两次舍入
+    assert_matches(summary_rows(summary), direct_aggregate(db, "date(record_date, 'weekday 0', '-6 days')"),
+                   tolerance=0.1 + 1e-9)
+    for period in summary['period']:
+        assert datetime.date.fromisoformat(period).weekday() == 0
+
+
+def test_summary_respects_date_range(db):
+    summary = db.get_historical_summary('北京', '2024-01-08', '2024-01-08')
+    
+    assert summary['period'] == ['2024-01-08']
+    assert db.get_historical_summary('北京', '2023-01-01', '2023-01-31')['period'] == []
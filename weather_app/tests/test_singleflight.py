@@ -0,0 +1,72 @@
+import threading
+import time
+import pytest
+from app.singleflight import SingleFlight
+
+CALLERS = 8
+
+
+def run_concurrently(flight, fn):
+    """CALLERS个线程同时以同一个key调用，返回每个线程的结果或异常"""
+    outcomes = [None] * CALLERS
+    
+    def call(index):
+        try:
+            outcomes[index] = flight.do('北京', fn)
+        except Exception as e:
+            outcomes[index] = e
+    
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    return outcomes
+
+
+def blocking_upstream(flight, result=None, error=None):
+    """模拟上游请求：等所有其他调用方都在等待后才返回，记录实际调用次数"""
+    calls = []
+    
+    def fn():
+        calls.append(1)
+        deadline = time.monotonic() + 5
+        while flight.deduplicated < CALLERS - 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        if error:
+            raise error
+        return result
+    
+    return fn, calls
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    fn, calls = blocking_upstream(flight, result={'temperature_c': 20})
+    
+    outcomes = run_concurrently(flight, fn)
+    
+    assert len(calls) == 1
+    assert outcomes == [{'temperature_c': 20}] * CALLERS
+    assert flight.stats() == {'in_flight': 0, 'deduplicated': CALLERS - 1}
+
+
+def test_concurrent_callers_share_the_error():
+    flight = SingleFlight()
+    error = ConnectionError('upstream down')
+    fn, calls = blocking_upstream(flight, error=error)
+    
+    outcomes = run_concurrently(flight, fn)
+    
+    assert len(calls) == 1
+    assert all(outcome is error for outcome in outcomes)
+    # 失败后不保留结果，下一次调用重新执行
+    assert flight.do('北京', lambda: 'retried') == 'retried'
+
+
+def test_different_keys_do_not_wait_for_each_other():
+    flight = SingleFlight()
+    
+    assert flight.do('北京', lambda: flight.do('上海', lambda: 1) + 1) == 2
+    with pytest.raises(ValueError):
+        flight.do('北京', lambda: int('x'))
@@ -0,0 +1,75 @@
+import random
+import pytest
+from app.spatial import NearestCityIndex, haversine_km
+
+
+def brute_force_nearest(cities, latitude, longitude, max_km):
+    best = None
+    for name, city_lat, city_lon in cities:
+        distance = haversine_km(latitude, longitude, city_lat, city_lon)
+        if distance <= max_km and (best is None or distance < best[3]):
+            best = (name, city_lat, city_lon, distance)
+    return best
+
+
+def test_haversine_km():
+    assert haversine_km(39.9, 116.4, 39.9, 116.4) == 0
+    # 北京到上海约1070千米
+    assert haversine_km(39.90, 116.40, 31.23, 121.47) == pytest.approx(1068, abs=10)
+    # 经度1度在赤道约111千米
+    assert haversine_km(0, 0, 0, 1) == pytest.approx(111.19, abs=0.01)
+
+
+def test_nearest_across_cell_border():
+    index = NearestCityIndex(cell_degrees=1.0)
+    # 查询点所在网格内的城市比相邻网格中紧挨边界的城市远
+    index.add('同网格', 30.1, 120.1)
+    index.add('相邻网格', 31.02, 120.9)
+    index.add('跨经度边界', 30.95, 121.01)
+    
+    name, latitude, longitude, distance = index.nearest(30.98, 120.98, max_km=50)
+    assert name == '跨经度边界'
+    assert distance == pytest.approx(haversine_km(30.98, 120.98, 30.95, 121.01))
+    
+    # 跨越180度经线
+    index.add('东经179.9', 10.0, 179.9)
+    assert index.nearest(10.0, -179.9, max_km=50)[0] == '东经179.9'
+
+
+def test_nearest_out_of_radius_returns_none():
+    index = NearestCityIndex()
+    assert index.nearest(30.0, 120.0, max_km=50) is None
+    
+    index.add('杭州', 30.27, 120.15)
+    assert index.nearest(31.23, 121.47, max_km=50) is None
+    assert index.nearest(31.23, 121.47, max_km=200)[0] == '杭州'
+
+
+def test_add_keeps_first_coordinates():
+    index = NearestCityIndex()
+    index.add('杭州', 30.27, 120.15)
+    index.add('杭州', 0.0, 0.0)
+    assert len(index) == 1
+    assert index.nearest(0.0, 0.0, max_km=100) is None
+
+
+@pytest.mark.parametrize('cell_degrees', [0.5, 1.0, 2.0])
+def test_nearest_matches_brute_force(cell_degrees):
+    rng = random.Random(cell_degrees)
+    cities = [(f'城市{i}', rng.uniform(-70, 70), rng.uniform(-180, 180)) for i in range(2000)]
+    # 高纬度地区经度方向的网格更窄
+    cities += [(f'北方{i}', rng.uniform(60, 80), rng.uniform(-180, 180)) for i in range(200)]
+    index = NearestCityIndex(cell_degrees=cell_degrees)
+    for name, latitude, longitude in cities:
+        index.add(name, latitude, longitude)
+    
+    for _ in range(300):
+        latitude, longitude = rng.uniform(-75, 80), rng.uniform(-180, 180)
+        max_km = rng.choice([20, 100, 300])
+        expected = brute_force_nearest(cities, latitude, longitude, max_km)
+        actual = index.nearest(latitude, longitude, max_km)
+        if expected is None:
+            assert actual is None
+        else:
+            assert actual is not None
+            assert actual[3] == pytest.approx(expected[3])
@@ -0,0 +1,101 @@
+import pytest
+import requests
+from app import views
+
+CURRENT = {
+    'temperature_2m': 18.0, 'relative_humidity_2m': 60, 'pressure_msl': 1010.0, 'visibility': 20000,
+    'wind_speed_10m': 12.0, 'wind_direction_10m': 90, 'weather_code': 1
+}
+
+# 测试城市不在城市索引中，位置解析由测试替换，不访问地理编码API
+LOCATIONS = {
+    '批量命中': (30.0, 120.0),
+    '批量未命中甲': (31.0, 121.0),
+    '批量未命中乙': (32.0, 122.0),
+}
+
+
+class FakeUpstream:
+    """替换位置解析和上游天气API，记录每次天气API请求的坐标数量"""
+    
+    def __init__(self):
+        self.calls = []
+        self.fail = False
+    
+    def resolve_city_location(self, city):
+        if city == '批量位置失败':
+            raise requests.exceptions.ConnectionError('geocoding down')
+        if city not in LOCATIONS:
+            return None
+        return (city,) + LOCATIONS[city]
+    
+    def get_json(self, url, params):
+        count = len(params['latitude'].split(','))
+        self.calls.append(count)
+        if self.fail:
+            raise requests.exceptions.ConnectionError('weather down')
+        return [{'current': dict(CURRENT)} for _ in range(count)]
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    fake = FakeUpstream()
+    monkeypatch.setattr(views, 'resolve_city_location', fake.resolve_city_location)
+    monkeypatch.setattr(views, 'get_json', fake.get_json)
+    # 清除之前测试写入的缓存，只保留命中城市
+    db = views.weather_db
+    db.flush_writes()
+    conn = db.connect()
+    for city in LOCATIONS:
+        db.hot_cache.delete(city)
+        conn.execute('DELETE FROM weather_cache WHERE city = ?', (city,))
+    conn.commit()
+    views.weather_db.save_weather(views.build_weather_result('批量命中', CURRENT))
+    return fake
+
+
+def test_mixed_batch_uses_one_cache_query_and_one_upstream_call(client, upstream, monkeypatch):
+    queries = []
+    original = views.weather_db.get_cached_weather_batch
+    monkeypatch.setattr(views.weather_db, 'get_cached_weather_batch',
+                        lambda cities, **kwargs: queries.append(cities) or original(cities, **kwargs))
+    
+    response = client.get('/weather/batch', query_string={'cities': '批量命中,批量未命中甲,批量未命中乙'})
+    
+    assert response.status_code == 200
+    assert [result['city'] for result in response.get_json()['results']] == ['批量命中', '批量未命中甲', '批量未命中乙']
+    assert len(queries) == 1
+    # 两个未命中的城市合并为一次上游请求
+    assert upstream.calls == [2]
+
+
+def test_batch_reports_per_city_errors(client, upstream):
+    response = client.get('/weather/batch', query_string={'cities': '批量命中,批量不存在,批量位置失败'})
+    
+    results = {result['city']: result for result in response.get_json()['results']}
+    assert response.status_code == 200
+    assert 'error' not in results['批量命中']
+    assert '未找到该城市' in results['批量不存在']['error']
+    assert '获取城市位置失败' in results['批量位置失败']['error']
+    assert upstream.calls == []
+
+
+def test_batch_upstream_failure_marks_only_misses(client, upstream):
+    upstream.fail = True
+    
+    response = client.get('/weather/batch', query_string={'cities': '批量命中,批量未命中甲'})
+    
+    results = response.get_json()['results']
+    assert 'error' not in results[0]
+    assert results[1] == {'city': '批量未命中甲', 'error': '获取天气信息失败，请稍后重试'}
+    assert upstream.calls == [1]
+
+
+def test_batch_size_limit(client, upstream):
+    cities = ','.join(f'城市{i}' for i in range(views.MAX_BATCH_CITIES + 1))
+    
+    response = client.get('/weather/batch', query_string={'cities': cities})
+    
+    assert response.status_code == 400
+    assert upstream.calls == []
+    assert client.get('/weather/batch').status_code == 400
@@ -0,0 +1,32 @@
+import sqlite3
+import pytest
+from app.writer import WriteBehindQueue
+
+INSERT = 'INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)'
+DELETE = 'DELETE FROM kv WHERE key = ?'
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE kv (key TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+    return conn
+
+
+def test_write_batch_keeps_submission_order(conn):
+    writer = WriteBehindQueue(lambda: conn)
+    
+    # 插入、删除、再次插入同一个键：按SQL分组执行会先插入两次再删除，最终丢失数据
+    writer._write_batch([(INSERT, ('a', 1)), (DELETE, ('a',)), (INSERT, ('a', 2))])
+    
+    assert conn.execute('SELECT key, value FROM kv').fetchall() == [('a', 2)]
+    assert (writer.written, writer.errors) == (3, 0)
+
+
+def test_write_batch_drops_only_failing_row(conn):
+    writer = WriteBehindQueue(lambda: conn)
+    
+    writer._write_batch([(INSERT, ('a', 1)), (INSERT, ('b', None)), (INSERT, ('c', 3))])
+    
+    assert conn.execute('SELECT key, value FROM kv ORDER BY key').fetchall() == [('a', 1), ('c', 3)]
+    assert (writer.written, writer.errors) == (2, 1)
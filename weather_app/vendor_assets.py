@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# 下载首页使用的第三方前端库到 app/static/vendor/，页面不再依赖公共CDN
+#
+# 版本固定在 app/data/vendor_assets.json 中，升级时修改下载地址和SRI哈希后重新运行；已存在的文件默认跳过。
+# 未下载时首页使用清单中的CDN地址（带SRI哈希时浏览器校验内容）；清单中缺少SRI哈希的文件，
+# 下载后把计算出的哈希写回清单。
+# 模板中的URL带文件内容指纹（见app/assets.py），更新文件后浏览器缓存自动失效。
+#
+# 使用方法：
+#   python vendor_assets.py            # 下载缺少的文件
+#   python vendor_assets.py --force    # 重新下载全部文件
+import argparse
+import base64
+import hashlib
+import json
+import os
+import sys
+import requests
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(APP_DIR, 'app', 'static')
+
+# 清单与首页模板共用：static目录下的保存路径 -> 固定版本的下载地址和SRI哈希（未下载时模板直接使用该CDN地址）
+MANIFEST_PATH = os.path.join(APP_DIR, 'app', 'data', 'vendor_assets.json')
+
+
+# 清单中缺少SRI哈希的文件，下载后按该算法计算并写回清单
+DEFAULT_INTEGRITY_ALGORITHM = 'sha384'
+
+
+def integrity_of(content, algorithm):
+    """按算法（sha256/sha384/sha512）计算内容的SRI值"""
+    return f'{algorithm}-' + base64.b64encode(hashlib.new(algorithm, content).digest()).decode('ascii')
+
+
+def download(url, path, integrity=None):
+    """下载文件并校验SRI哈希，先写入临时文件再替换，避免中断后留下不完整的文件
+    
+    返回 (文件大小, SRI哈希)，清单中没有哈希时返回按默认算法计算的哈希。
+    """
+    response = requests.get(url, timeout=30)
+    response.raise_for_status()
+    if integrity:
+        actual = integrity_of(response.content, integrity.split('-', 1)[0])
+        if actual != integrity:
+            raise ValueError(f'内容与清单中的SRI哈希不一致: {actual}')
+    else:
+        integrity = integrity_of(response.content, DEFAULT_INTEGRITY_ALGORITHM)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(response.content)
+    os.replace(tmp_path, path)
+    return len(response.content), integrity
+
+
+def main():
+    parser = argparse.ArgumentParser(description='下载首页使用的第三方前端库')
+    parser.add_argument('--force', action='store_true', help='重新下载已存在的文件')
+    args = parser.parse_args()
+    
+    with open(MANIFEST_PATH, encoding='utf-8') as f:
+        manifest = json.load(f)
+    
+    failed = 0
+    recorded = 0
+    for name, entry in manifest.items():
+        path = os.path.join(STATIC_DIR, name)
+        if os.path.exists(path) and not args.force:
+            print(f"已存在，跳过: {name}")
+            continue
+        try:
+            size, integrity = download(entry['url'], path, entry.get('integrity'))
+            print(f"已下载: {name} ({size} 字节)")
+            if not entry.get('integrity'):
+                # 记录首次下载内容的哈希，之后的下载按它校验，未下载时首页的CDN地址也带上SRI校验
+                entry['integrity'] = integrity
+                recorded += 1
+                print(f"已记录SRI哈希: {name}: {integrity}")
+        except (requests.exceptions.RequestException, OSError, ValueError) as e:
+            failed += 1
+            print(f"下载失败: {name}: {e}")
+    
+    if recorded:
+        with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"已更新 {MANIFEST_PATH}，请提交清单中新记录的SRI哈希")
+    
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()